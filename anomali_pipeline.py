@@ -8,67 +8,144 @@ import os, argparse
 import numpy as np
 import pandas as pd
 from pathlib import Path
-from sklearn.ensemble import RandomForestRegressor
-from xgboost import XGBRegressor
 import joblib
 
+from data_source import DataSource, create_data_source, get_data_source
+from model_backends import BACKENDS, fit_model
+from robust_detector import mad_anomaly_flags as groupwise_mad_flags
+
 # ==== CONFIG ====
 DATE_COL  = "Donem"               # tarih (YYYY-MM, YYYY-MM-DD)
 CITY_COL  = "Sehir"               # il adı
 TARGET    = "Genel_Toplam_MWh"    # tahmin edilecek sütun
-USE_XGB   = True                  # False yaparsan RandomForest kullanır
+MODEL_BACKEND = os.getenv("PIPELINE_MODEL_BACKEND", "xgb")   # rf / xgb / hgb (--backend)
 LAGS      = [1, 2, 3, 12]
+# Şehir başına küçük veri için arka uç parametreleri (boosting'de n_estimators/max_iter üst sınırdır)
+PIPELINE_PARAMS = {
+    "xgb": dict(n_estimators=300, max_depth=5, learning_rate=0.1, subsample=0.9,
+                colsample_bytree=0.9, random_state=42, n_jobs=-1, tree_method="hist"),
+    "rf": dict(n_estimators=400, max_depth=None, random_state=42, n_jobs=-1),
+    "hgb": dict(max_iter=300, learning_rate=0.1, min_samples_leaf=5, random_state=42),
+}
 REPORTS   = Path("reports"); REPORTS.mkdir(exist_ok=True, parents=True)
 MODELS    = Path("models");  MODELS.mkdir(exist_ok=True, parents=True)
 
+# ----------------- Veri okuma -----------------
+def _input_schema(path, usecols=None):
+    """CSV başlığından okunacak kolonları ve açık dtype şemasını çıkar."""
+    header = pd.read_csv(path, nrows=0).columns
+    # "Unnamed: 0" gibi index artıklarını hiç okuma
+    cols = [c for c in header if not str(c).startswith("Unnamed")]
+    if usecols:
+        keep = {c.strip() for c in usecols} | {DATE_COL, CITY_COL, TARGET}
+        cols = [c for c in cols if c.strip() in keep]
+    dtype = {c: "float32" for c in cols if c.strip().endswith("_MWh")}
+    return cols, dtype
+
+def read_input(path, city=None, chunksize=None, usecols=None) -> pd.DataFrame:
+    """Birleşik CSV'yi açık şema ile oku.
+       chunksize verilirse dosya parça parça okunur ve --city filtresi okuma
+       sırasında uygulanır; bellekte yalnızca istenen şehrin satırları kalır."""
+    cols, dtype = _input_schema(path, usecols)
+    kw = dict(usecols=cols, parse_dates=[DATE_COL] if DATE_COL in cols else None)
+    try:
+        df = _read_typed(path, city, chunksize, dict(dtype), kw)
+    except ValueError:
+        # _MWh kolonlarında sayı olmayan değer var: to_numeric ile basic_clean halleder
+        df = _read_typed(path, city, chunksize, {}, kw)
+    df.columns = [c.strip() for c in df.columns]
+    df[CITY_COL] = df[CITY_COL].astype("category")
+    return df
+
+def _read_typed(path, city, chunksize, dtype, kw) -> pd.DataFrame:
+    if not chunksize:
+        df = pd.read_csv(path, dtype={**dtype, CITY_COL: "category"}, **kw)
+        if city is not None:
+            df = df[df[CITY_COL] == city].reset_index(drop=True)
+        return df
+
+    parts = []
+    for chunk in pd.read_csv(path, dtype={**dtype, CITY_COL: str}, chunksize=chunksize, **kw):
+        if city is not None:
+            chunk = chunk[chunk[CITY_COL] == city]
+        if len(chunk):
+            parts.append(chunk)
+    if not parts:
+        return pd.read_csv(path, dtype={**dtype, CITY_COL: str}, nrows=0, **kw)
+    return pd.concat(parts, ignore_index=True)
+
+def read_table(source: DataSource, table: str, city=None, usecols=None) -> pd.DataFrame:
+    """Birleşik tabloyu veri kaynağından (Parquet/CSV/SQLite/Supabase) aynı şema ile oku.
+       Kolon budama ve --city filtresi mümkünse kaynağa itilir."""
+    columns = sorted({c.strip() for c in usecols} | {DATE_COL, CITY_COL, TARGET}) if usecols else None
+    df = source.fetch_table(table, columns=columns, where={CITY_COL: city} if city is not None else None)
+    if df.empty:
+        raise SystemExit(f"{source!r} içinde '{table}' tablosu boş ya da yok.")
+    df = df.loc[:, [c for c in df.columns if not str(c).startswith("Unnamed")]]
+    df.columns = [c.strip() for c in df.columns]
+    for c in df.columns:
+        if c.endswith("_MWh"):
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("float32")
+    df[CITY_COL] = df[CITY_COL].astype("category")
+    return df
+
 # ----------------- Yardımcılar -----------------
+# Not: aşağıdaki adımlar çerçeveyi yerinde günceller; read_input'un döndürdüğü
+# çerçeve pipeline'a aittir, her adımda tam kopya alınmaz.
 def ensure_datetime(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df[DATE_COL] = pd.to_datetime(df[DATE_COL])
+    if not pd.api.types.is_datetime64_any_dtype(df[DATE_COL]):
+        df[DATE_COL] = pd.to_datetime(df[DATE_COL])
     return df
 
+def _sort_city_date(df: pd.DataFrame) -> pd.DataFrame:
+    keys = df[[CITY_COL, DATE_COL]]
+    if keys.empty or pd.MultiIndex.from_frame(keys).is_monotonic_increasing:
+        return df
+    return df.sort_values([CITY_COL, DATE_COL], ignore_index=True)
+
 def basic_clean(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
     df.columns = [c.strip() for c in df.columns]
     # sayısal kolonları dönüştür
     for c in df.columns:
-        if c == TARGET or c.endswith("_MWh"):
-            df[c] = pd.to_numeric(df[c], errors="coerce")
+        if (c == TARGET or c.endswith("_MWh")) and not pd.api.types.is_numeric_dtype(df[c]):
+            df[c] = pd.to_numeric(df[c], errors="coerce", downcast="float")
     # sıralama
-    df = df.sort_values([CITY_COL, DATE_COL])
-    return df
+    return _sort_city_date(df)
 
 def impute_city_month(df: pd.DataFrame) -> pd.DataFrame:
     """Eksik değerleri öncelikle şehir+ay ortalamasıyla doldur.
        Sonra şehir ortalaması, en son genel ortalama fallback."""
-    df = df.copy()
-    df["month"] = df[DATE_COL].dt.month
+    df["month"] = df[DATE_COL].dt.month.astype("int8")
 
     # sadece sayısal kolonlarda doldurma yapacağız
     num_cols = df.select_dtypes(include=[np.number]).columns.tolist()
     if TARGET not in num_cols:
         num_cols.append(TARGET)
 
+    by_city_month = df.groupby([CITY_COL, "month"], observed=True)
+    by_city = df.groupby(CITY_COL, observed=True)
     for col in num_cols:
+        if not df[col].isna().any():
+            continue
         # şehir+ay ortalaması
-        df[col] = df[col].fillna(df.groupby([CITY_COL, "month"])[col].transform("mean"))
+        df[col] = df[col].fillna(by_city_month[col].transform("mean"))
         # şehir ortalaması
-        df[col] = df[col].fillna(df.groupby(CITY_COL)[col].transform("mean"))
+        df[col] = df[col].fillna(by_city[col].transform("mean"))
         # genel ortalama
         df[col] = df[col].fillna(df[col].mean())
 
     return df
 
 def add_features(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["year"]  = df[DATE_COL].dt.year
-    df["month"] = df[DATE_COL].dt.month
+    df["year"]  = df[DATE_COL].dt.year.astype("int16")
+    df["month"] = df[DATE_COL].dt.month.astype("int8")
     # lag/rolling
-    df = df.sort_values([CITY_COL, DATE_COL])
+    df = _sort_city_date(df)
+    by_city = df.groupby(CITY_COL, observed=True)[TARGET]
     for lag in LAGS:
-        df[f"{TARGET}_lag{lag}"] = df.groupby(CITY_COL)[TARGET].shift(lag)
-    df[f"{TARGET}_roll3"]  = df.groupby(CITY_COL)[TARGET].rolling(3).mean().reset_index(0, drop=True)
-    df[f"{TARGET}_roll12"] = df.groupby(CITY_COL)[TARGET].rolling(12).mean().reset_index(0, drop=True)
+        df[f"{TARGET}_lag{lag}"] = by_city.shift(lag)
+    df[f"{TARGET}_roll3"]  = by_city.rolling(3).mean().reset_index(0, drop=True)
+    df[f"{TARGET}_roll12"] = by_city.rolling(12).mean().reset_index(0, drop=True)
     return df
 
 def feature_cols(df: pd.DataFrame):
@@ -84,26 +161,10 @@ def train_city(df: pd.DataFrame, city: str) -> str:
     X = g[feature_cols(g)]
     y = g[TARGET]
 
-    if USE_XGB:
-        model = XGBRegressor(
-            n_estimators=300,
-            max_depth=5,
-            learning_rate=0.1,
-            subsample=0.9,
-            colsample_bytree=0.9,
-            random_state=42,
-            n_jobs=-1,
-            tree_method="hist"
-        )
-    else:
-        model = RandomForestRegressor(
-            n_estimators=400,
-            random_state=42,
-            n_jobs=-1
-        )
-
-    model.fit(X, y)
-    path = MODELS / f"{'xgb' if USE_XGB else 'rf'}_{city}.pkl"
+    # Boosting arka uçları şehrin son aylarında erken durdurulur
+    time_key = g[DATE_COL].dt.year * 12 + g[DATE_COL].dt.month
+    model, _ = fit_model(MODEL_BACKEND, X, y, time_key=time_key, params=PIPELINE_PARAMS[MODEL_BACKEND])
+    path = MODELS / f"{MODEL_BACKEND}_{city}.pkl"
     joblib.dump(model, path)
     return str(path)
 
@@ -116,30 +177,52 @@ def predict_and_residuals(df: pd.DataFrame, city: str, model_path: str) -> pd.Da
     return g
 
 def mad_anomaly_flags(residuals: pd.Series, thr: float = 3.5) -> pd.Series:
-    med = np.median(residuals)
-    mad = np.median(np.abs(residuals - med))
-    if mad == 0 or np.isnan(mad):
-        return pd.Series([False] * len(residuals), index=residuals.index)
-    robust_z = 0.6745 * (residuals - med) / mad
-    return np.abs(robust_z) > thr
+    """Tek şehrin artıkları (tek grup)"""
+    return groupwise_mad_flags(residuals, thr=thr)
+
+def flag_residuals(frame: pd.DataFrame, thr: float = 3.5, by_month: bool = False) -> pd.DataFrame:
+    """Tüm şehirlerin artıkları tek geçişte: şehir (veya şehir x ay) medyan / MAD"""
+    month = frame[DATE_COL].dt.month if by_month else None
+    flags = groupwise_mad_flags(frame["residual"], city=frame[CITY_COL], month=month, thr=thr)
+    anomalies = frame.loc[flags, [CITY_COL, DATE_COL, TARGET, "yhat", "residual"]]
+    return anomalies.sort_values([CITY_COL, DATE_COL])
 
 # ----------------- Ana akış -----------------
-def run_for_city(df: pd.DataFrame, city: str, thr: float = 3.5) -> pd.DataFrame:
+def run_for_city(df: pd.DataFrame, city: str, thr: float = 3.5, by_month: bool = False) -> pd.DataFrame:
     model_path = train_city(df, city)
     g = predict_and_residuals(df, city, model_path)
-    flags = mad_anomaly_flags(g["residual"], thr=thr)
-    anomalies = g.loc[flags, [CITY_COL, DATE_COL, TARGET, "yhat", "residual"]]
-    return anomalies.sort_values(DATE_COL)
+    return flag_residuals(g, thr=thr, by_month=by_month)
 
 def main():
+    global MODEL_BACKEND
     ap = argparse.ArgumentParser()
-    ap.add_argument("--input", required=True, help="Birleşik CSV (enerji + hava + vs.)")
+    ap.add_argument("--input", help="Birleşik CSV (enerji + hava + vs.)")
+    ap.add_argument("--source", help="--input yerine veri kaynağı (ör. parquet:data/cache, sqlite:x.db; default DATA_SOURCE)")
+    ap.add_argument("--table", help="Veri kaynağındaki birleşik tablo adı (--input verilmezse zorunlu)")
     ap.add_argument("--city", help="Tek bir şehir ismi")
     ap.add_argument("--all", action="store_true", help="Tüm şehirler için çalıştır")
     ap.add_argument("--thr", type=float, default=3.5, help="MAD eşiği (default 3.5)")
+    ap.add_argument("--by-month", action="store_true", help="Medyan/MAD'i şehir x ay gruplarında hesapla")
+    ap.add_argument("--chunksize", type=int, help="CSV'yi bu kadar satırlık parçalarla oku (büyük dosyalar için)")
+    ap.add_argument("--backend", choices=BACKENDS, help=f"Model arka ucu (default {MODEL_BACKEND})")
+    ap.add_argument("--usecols", help="Sadece bu kolonları oku (virgülle ayrılmış; Donem/Sehir/hedef her zaman okunur)")
     args = ap.parse_args()
 
-    df = pd.read_csv(args.input)
+    if args.backend:
+        MODEL_BACKEND = args.backend
+
+    if not args.all and not args.city:
+        raise SystemExit("Şehir belirt veya --all kullan.")
+
+    usecols = args.usecols.split(",") if args.usecols else None
+    city = None if args.all else args.city
+    if args.input:
+        df = read_input(args.input, city=city, chunksize=args.chunksize, usecols=usecols)
+    elif args.table:
+        source = create_data_source(args.source) if args.source else get_data_source()
+        df = read_table(source, args.table, city=city, usecols=usecols)
+    else:
+        raise SystemExit("--input veya --table belirt.")
     df = ensure_datetime(df)
     df = basic_clean(df)
     df = impute_city_month(df)
@@ -148,21 +231,21 @@ def main():
     if args.all:
         cities = sorted(df[CITY_COL].dropna().unique().tolist())
     else:
-        if not args.city:
-            raise SystemExit("Şehir belirt veya --all kullan.")
         cities = [args.city]
 
-    all_out = []
+    # Model şehir başına eğitilir; MAD tespiti tüm artıklar üzerinde tek geçiştir
+    residuals = []
     for c in cities:
         try:
-            out = run_for_city(df, c, thr=args.thr)
-            print(f"[{c}] anomalies: {len(out)}")
-            all_out.append(out)
+            model_path = train_city(df, c)
+            residuals.append(predict_and_residuals(df, c, model_path))
         except Exception as e:
             print(f"[{c}] SKIP: {e}")
 
-    if all_out:
-        result = pd.concat(all_out, ignore_index=True).sort_values([CITY_COL, DATE_COL])
+    if residuals:
+        result = flag_residuals(pd.concat(residuals, ignore_index=True), thr=args.thr, by_month=args.by_month)
+        for c, n in result[CITY_COL].value_counts().reindex(cities).dropna().items():
+            print(f"[{c}] anomalies: {int(n)}")
         out_path = REPORTS / ("anomalies_all.csv" if args.all else f"anomalies_{cities[0]}.csv")
         result.to_csv(out_path, index=False)
         print(f"✔ kaydedildi -> {out_path}")
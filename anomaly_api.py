@@ -4,15 +4,20 @@
 ElektrAize Anomaly API - Tam Çalışan Versiyon
 """
 from typing import List, Optional, Dict, Any
+import time
+import logging
 import numpy as np
 import pandas as pd
-from fastapi import FastAPI, Query, HTTPException, Depends
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import FastAPI, Query, HTTPException, Depends, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
-from sklearn.ensemble import RandomForestRegressor
 from redis_manager import set_cache, get_cache
+import os
+import json
 import asyncio
+import threading
 import warnings
+from contextlib import asynccontextmanager
 warnings.filterwarnings('ignore')
 #--sena---
 from veri_cek import save_model_result
@@ -23,17 +28,75 @@ from firebase_auth import get_current_user
 from typing import Dict
 
 from veri_cek import (
-    get_train_test,         
-    get_processed_frames,   
-    DATE_COL, CITY_COL
+    DATE_COL, CITY_COL,
+    CONSUMPTION_CATEGORIES
 )
+from city_catalog import fold_city
+from online_scoring import InvalidReadingsError, OnlineScorer, UnknownCityError
+from model_registry import (
+    ModelSet, PRIMARY_CATEGORY, RELOAD_STATUS,
+    current_model_set, peek_model_set, reload_models, reload_in_background,
+    start_reload_scheduler, start_snapshot_watcher, stop_reload_scheduler, warmup_order,
+)
+from lifecycle import STARTUP_REPORT, finish_startup, phase
+from province_map import MAP_DEFAULT_TOLERANCE, MAP_TOLERANCES, map_payload, province_summary
+from robust_detector import DEFAULT_THR, mad_anomalies
+from http_cache import version_validators
+from anomaly_history import close_history, get_history
+from single_flight import SingleFlight
+from log_config import setup_logging
+from metrics import HTTP_SECONDS, CONTENT_TYPE, render, stage_timer, supabase_write
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 
 # -----------------------------------------------------------------------------
 # FastAPI kurulum
 # -----------------------------------------------------------------------------
-app = FastAPI(title="ElektrAize Anomaly API", version="3.0")
-app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_credentials=True, allow_methods=["*"], allow_headers=["*"])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Model seti ve ısınma. Tek başına çalışırken FastAPI, mount edildiğinde
+    gateway'in (main.py) lifespan'ı bunu çağırır; alt uygulamanın kendi
+    lifespan'ı Starlette tarafından çalıştırılmaz.
+    MODEL_LOAD_MODE=eager: ısınma bitene kadar bekle, lazy: arka planda.
+    """
+    if MODEL_LOAD_MODE == "eager":
+        logger.info("[STARTUP] Tüm modeller yükleniyor...")
+        await asyncio.to_thread(warmup_models)
+    else:
+        logger.info(f"[STARTUP] Model ısınması arka planda başladı -> {warmup_order()}")
+        threading.Thread(target=warmup_models, name="model-warmup", daemon=True).start()
+    start_reload_scheduler()
+    start_snapshot_watcher()
+    yield
+    with phase("model_schedulers", kind="shutdown"):
+        stop_reload_scheduler()
+    with phase("anomaly_history", kind="shutdown"):
+        close_history()
+
+app = FastAPI(title="ElektrAize Anomaly API", version="3.0", lifespan=lifespan)
+# CORS ve yanıt sıkıştırma gateway'de (main.py) bir kez uygulanır; bu uygulama oraya
+# mount edilir, burada tekrar eklemek her gövdeyi iki kez tamponlardı
+
+@app.middleware("http")
+async def observe_latency(request: Request, call_next):
+    """Uçtan uca istek süresi; etiket olarak path şablonu (/debug/city/{city_name})"""
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_SECONDS.observe(
+            time.perf_counter() - t0,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status,
+        )
 
 # -----------------------------------------------------------------------------
 # Data Modeller
@@ -51,77 +114,69 @@ class AnomalyItem(BaseModel):
     ust_limit: Optional[float] = None
     category: Optional[str] = None
 
-# Tüm tüketim kategorileri - BOŞLUKSUZ ve DOĞRU
-CONSUMPTION_CATEGORIES = {
-    "genel": "Genel_Toplam_MWh",
-    "aydinlatma": "Aydinlatma_MWh", 
-    "mesken": "Mesken_MWh",
-    "sanayi": "Sanayi_MWh",
-    "tarimsal": "Tarımsal_Sulama_MWh",
-    "ticarethane": "Ticarethane_MWh",
-    "diger": "Diger_MWh"
-}
-
-# Global model dictionary
-MODELS = {}
+class Reading(BaseModel):
+    sehir: str
+    donem: str                # "YYYY-MM" veya "YYYY-MM-DD"
+    category: str = "genel"
+    value: float
+
+class ScoreRequest(BaseModel):
+    readings: List[Reading]
+    tolerance_pct: float = 0.10
+
+# Modeller ve veri anlık görüntüsü sürümlü bir ModelSet'te tutulur (model_registry).
+# Kategori bazında tembel yükleme: pending -> loading -> ready | failed.
+# Startup bloklanmaz; arka plan ısınması kategorileri öncelik sırasıyla yükler,
+# henüz yüklenmemiş bir kategoriye gelen istek sadece o modeli yükletir.
+# MODEL_LOAD_MODE=eager eski davranıştır (startup tüm modelleri bekler).
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "lazy").lower()
+ADMIN_UIDS = {u.strip() for u in os.getenv("ADMIN_UIDS", "").split(",") if u.strip()}
+ADMIN_EMAILS = {e.strip().lower() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
 
 # -----------------------------------------------------------------------------
 # MODEL YÜKLEME - GELİŞTİRİLMİŞ
 # -----------------------------------------------------------------------------
-def load_all_models():
-    """Tüm kategoriler için model yükle - Geliştirilmiş versiyon"""
-    global MODELS
-    
-    for category_name, target_col in CONSUMPTION_CATEGORIES.items():
-        try:
-            print(f"\n[MODEL] {category_name} için model yükleniyor...")
-            print(f"[MODEL] Target column: {target_col}")
-            
-            # Veri kontrolü
-            Xtr, Xte, ytr, yte = get_train_test(target_col=target_col)
-            print(f"[MODEL] Veri boyutları - Xtr: {Xtr.shape}, Xte: {Xte.shape}")
-            
-            if len(Xtr) == 0 or len(Xte) == 0:
-                print(f"[UYARI] {category_name} için yeterli veri yok, atlanıyor...")
-                MODELS[category_name] = None
-                continue
-            
-            model = RandomForestRegressor(
-                n_estimators=100,
-                max_depth=10,
-                random_state=42,
-                n_jobs=-1
-            )
-            
-            model.fit(Xtr, ytr)
-            
-            # Model başarısını kontrol et
-            train_score = model.score(Xtr, ytr)
-            test_score = model.score(Xte, yte) if len(Xte) > 0 else 0
-            
-            MODELS[category_name] = {
-                'model': model,
-                'target_col': target_col,
-                'train_score': train_score,
-                'test_score': test_score
-            }
-            
-            print(f"[OK] {category_name} modeli yüklendi - Train R²: {train_score:.3f}, Test R²: {test_score:.3f}")
-            
-            # 🔹 Model sonucunu Supabase'e kaydet
-            try:
-                save_model_result(
-                    model_name=category_name,
-                    target=target_col,
-                    train_score=train_score,
-                    test_score=test_score
-                )
-            except Exception as e:
-                print(f"[WARN] {category_name} sonucu DB'ye kaydedilemedi: {e}")
-        
-        except Exception as e:
-            print(f"[ERROR] {category_name} modeli yüklenemedi: {str(e)}")
-            MODELS[category_name] = None
+def load_all_models() -> ModelSet:
+    """Yayındaki set için tüm kategorileri yükle"""
+    return current_model_set().load_all()
+
+def warmup_models():
+    """
+    Isınma: veri anlık görüntüsü, birincil kategori (+ skorlayıcı, şehir kataloğu,
+    harita), sonra kalan kategoriler. Her aşamanın süresi loglanır ve /health'te görünür.
+    """
+    t0 = time.perf_counter()
+    with phase("data_snapshot"):
+        ms = current_model_set()
+    order = warmup_order()
+    with phase("primary_model"):
+        ms.ensure(PRIMARY_CATEGORY)
+    logger.info(f"[WARMUP] Birincil kategori '{PRIMARY_CATEGORY}' hazır ({time.perf_counter() - t0:.1f}s)")
+    # Online skorlama önbelleğini ve şehir kataloğunu ilk istekten önce hazırla
+    try:
+        with phase("request_caches"):
+            ms.scorer()
+            ms.catalog()
+            map_payload()
+    except Exception as e:
+        logger.warning(f"[WARN] Online skorlama önbelleği / şehir kataloğu / harita kurulamadı: {e}")
+    with phase("model_warmup"):
+        for category_name in order:
+            ms.ensure(category_name)
+    loaded_count = len(ms.ready_models())
+    logger.info(f"[WARMUP] {loaded_count}/{len(CONSUMPTION_CATEGORIES)} model yüklendi ({time.perf_counter() - t0:.1f}s)")
+    finish_startup()
+
+def get_scorer() -> OnlineScorer:
+    """Yayındaki setin şehir geçmişi önbelleği"""
+    return current_model_set().scorer()
+
+def require_admin(current_user: Dict = Depends(get_current_user)) -> Dict:
+    """ADMIN_UIDS / ADMIN_EMAILS listesindeki kullanıcılar"""
+    email = (current_user.get("email") or "").lower()
+    if current_user.get("uid") not in ADMIN_UIDS and email not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Bu işlem için yönetici yetkisi gerekli")
+    return current_user
 
 # -----------------------------------------------------------------------------
 # ANOMALİ TESPİTİ - GELİŞTİRİLMİŞ
@@ -137,32 +192,106 @@ def detect_anomalies(gercek: pd.Series, baseline: pd.Series, tolerance_pct: floa
     anomalies = ((gercek < alt_limit) | (gercek > ust_limit)) & baseline.notna()
     return anomalies, alt_limit, ust_limit
 
+DETECTION_METHODS = ("band", "mad")
+
+# Eşzamanlı aynı hesaplamalar tek çalıştırmaya bağlanır (anahtar: set sürümü + normalize parametreler)
+_frame_flight = SingleFlight("anomaly_frame")
+_city_flight = SingleFlight("debug_city")
+_categories_flight = SingleFlight("categories")
+
+def _detection_params(method: str, tolerance_pct: float, mad_thr: float, by_month: bool) -> Dict:
+    """Yöntemin kullandığı parametreler (diğerleri anahtara girmez)"""
+    if method == "mad":
+        return {"mad_thr": float(mad_thr), "by_month": bool(by_month)}
+    return {"tolerance_pct": float(tolerance_pct)}
+
+def anomaly_frame(ms: ModelSet, category: str, model_info: dict, tolerance_pct: float = 0.10,
+                  method: str = "band", mad_thr: float = DEFAULT_THR, by_month: bool = False) -> pd.DataFrame:
+    """
+    Setin test dönemi için tahmin, mevsimsel baseline ve anomali bayrakları (filtre öncesi)
+    - band: gerçek değer baseline ± tolerans dışında
+    - mad : model artığının şehir (by_month: şehir x ay) robust z'si eşiği aşıyor;
+            limitler tahmin + artık medyanı ± eşik * MAD / 0.6745
+    Aynı (sürüm, kategori, yöntem, parametre) için eşzamanlı çağrılar tek hesaplamayı
+    paylaşır; dönen tablo paylaşımlıdır, çağıran yerinde değiştirmemelidir.
+    """
+    params = _detection_params(method, tolerance_pct, mad_thr, by_month)
+    key = (ms.version, category, method, tuple(sorted(params.items())))
+    return _frame_flight.do(
+        key, lambda: _compute_anomaly_frame(ms, category, model_info, tolerance_pct, method, mad_thr, by_month)
+    )
+
+def _compute_anomaly_frame(ms: ModelSet, category: str, model_info: dict, tolerance_pct: float,
+                           method: str, mad_thr: float, by_month: bool) -> pd.DataFrame:
+    target_col = model_info['target_col']
+    model = model_info['model']
+    _, df_test = ms.frames()
+    Xtr, Xte, ytr, yte = ms.train_test(target_col)
+
+    df_test = df_test.copy()
+    df_test["ay"] = pd.to_datetime(df_test[DATE_COL]).dt.month
+    df_test["baseline"] = ms.seasonal_baseline(df_test, target_col)
+
+    # Model tahminleri
+    with stage_timer("predict"):
+        yhat = model.predict(Xte)
+
+    #---------------------------SENA--------------------------------
+    # Verileri hazırla - index uyumluluğu için
+    df_test_reset = df_test.reset_index(drop=True)
+    min_len = min(len(df_test_reset), len(yte), len(yhat))
+
+    df_test_ordered = df_test_reset.head(min_len).copy()
+    yte_series = pd.Series(yte.values[:min_len])
+    yhat_series = pd.Series(yhat[:min_len])
+    baseline_series = df_test_ordered["baseline"].reset_index(drop=True)
+
+    logger.info(f"[ISLENEN] {category} - {min_len} kayıt işlendi")
+
+    # Anomali tespiti
+    with stage_timer("detect"):
+        if method == "mad":
+            # Tüm şehirler için tek groupby geçişi
+            residual = yte_series - yhat_series
+            cities = df_test_ordered[CITY_COL].reset_index(drop=True)
+            months = df_test_ordered["ay"].reset_index(drop=True) if by_month else None
+            flags_anomali, alt_limit, ust_limit = mad_anomalies(residual, cities, months, thr=mad_thr)
+            alt_limit = yhat_series + alt_limit
+            ust_limit = yhat_series + ust_limit
+        else:
+            flags_anomali, alt_limit, ust_limit = detect_anomalies(
+                yte_series, baseline_series, tolerance_pct
+            )
+
+    # Sonuçları hazırla
+    out = pd.DataFrame({
+        "sehir": df_test_ordered[CITY_COL].astype(str),
+        "donem": pd.to_datetime(df_test_ordered[DATE_COL]).dt.strftime("%Y-%m-%d"),
+        "gercek": yte_series.astype(float),
+        "tahmin": yhat_series.astype(float),
+        "residual": (yte_series - yhat_series).astype(float),
+        "anomali": flags_anomali.astype(bool),
+        "baseline": baseline_series.astype(float),
+        "dev_pct": ((yte_series - baseline_series) / baseline_series.replace(0, 1e-8)).astype(float),
+        "alt_limit": alt_limit.astype(float),
+        "ust_limit": ust_limit.astype(float),
+        "category": category
+    })
+
+    # Geçmiş deposu: sürüm + yöntem + parametre başına bir kez, arka planda yazılır
+    history = get_history()
+    if history is not None:
+        params = _detection_params(method, tolerance_pct, mad_thr, by_month)
+        history.record(category, ms.version, ms.data_version, method, params, out)
+    return out
+
 # -----------------------------------------------------------------------------
 # ENDPOINT'LER - TAMAMEN YENİLENDİ
 # -----------------------------------------------------------------------------
-@app.on_event("startup")
-async def startup_event():
-    """Uygulama başladığında tüm modelleri yükle"""
-    print("\n" + "="*60)
-    print("[STARTUP] Tüm modeller yükleniyor...")
-    print("="*60)
-    
-    load_all_models()
-    
-    loaded_count = sum(1 for m in MODELS.values() if m is not None)
-    print(f"\n[STARTUP] {loaded_count}/{len(CONSUMPTION_CATEGORIES)} model yüklendi")
-    
-    # Yüklenen modelleri göster
-    for category, model_info in MODELS.items():
-        status = "YÜKLENDİ" if model_info is not None else "YÜKLENMEDİ"
-        if model_info:
-            print(f"  ✓ {category}: R²={model_info.get('train_score', 0):.3f}")
-        else:
-            print(f"  ✗ {category}: Model yüklenemedi")
-
 @app.get("/")
 def read_root():
-    loaded_count = sum(1 for m in MODELS.values() if m is not None)
+    ms = peek_model_set()
+    loaded_count = len(ms.ready_models()) if ms else 0
     return {
         "message": "ElektrAize Multi-Category Anomaly API",
         "version": "3.0",
@@ -173,37 +302,92 @@ def read_root():
 
 @app.get("/health")
 def health():
-    loaded_count = sum(1 for m in MODELS.values() if m is not None)
-    return {
-        "status": "ok" if loaded_count > 0 else "error",
-        "loaded_models": loaded_count,
+    """Hazırlık kapısı: birincil kategori hazır olana kadar 503 döner"""
+    ms = peek_model_set()   # veri henüz çekilmediyse set yok; health çekmeyi tetiklemez
+    states = dict(ms.states) if ms else {cat: "pending" for cat in CONSUMPTION_CATEGORIES}
+    available = list(ms.ready_models()) if ms else []
+    ready = states.get(PRIMARY_CATEGORY) == "ready"
+    if ready:
+        status = "ok"
+    elif states.get(PRIMARY_CATEGORY) == "failed":
+        status = "error"
+    else:
+        status = "starting"
+    body = {
+        "status": status,
+        "ready": ready,
+        "primary_category": PRIMARY_CATEGORY,
+        "model_version": ms.version if ms else None,
+        "data_version": ms.data_version if ms else None,
+        "reload": dict(RELOAD_STATUS),
+        "startup": STARTUP_REPORT,
+        "loaded_models": len(available),
         "total_categories": len(CONSUMPTION_CATEGORIES),
-        "available_categories": [cat for cat, model in MODELS.items() if model is not None]
+        "available_categories": available,
+        "categories": states
     }
+    return body if ready else JSONResponse(body, status_code=503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint'i (aşama, tablo çekme, önbellek, Supabase ve HTTP süreleri)"""
+    return PlainTextResponse(render(), media_type=CONTENT_TYPE)
 
 @app.get("/categories")
-def get_categories():
+def get_categories(not_modified: None = Depends(version_validators)):
     """Tüm kategorileri listele"""
-    loaded_models = {cat: (model is not None) for cat, model in MODELS.items()}
+    ms = current_model_set()
+    # Tembel yüklemede yanıt kategori durumlarıyla değişir
+    key = (ms.version, tuple(sorted(ms.states.items())))
+    return _categories_flight.do(key, lambda: _categories_body(ms))
+
+def _categories_body(ms: ModelSet) -> Dict:
+    loaded_models = {cat: (model is not None) for cat, model in ms.models.items()}
+    states = dict(ms.states)
     loaded_details = {}
     
-    for cat, model_info in MODELS.items():
+    for cat, model_info in list(ms.models.items()):
         if model_info:
             loaded_details[cat] = {
                 "loaded": True,
                 "train_score": model_info.get('train_score', 0),
                 "test_score": model_info.get('test_score', 0),
-                "target_column": model_info.get('target_col', '')
+                "target_column": model_info.get('target_col', ''),
+                "backend": model_info.get('backend'),
+                "fit_seconds": getattr(model_info.get('fit_report'), 'fit_s', None),
+                "predict_seconds": getattr(model_info.get('fit_report'), 'predict_s', None)
             }
         else:
             loaded_details[cat] = {"loaded": False}
     
     return {
         "available_categories": list(CONSUMPTION_CATEGORIES.keys()),
+        "model_version": ms.version,
+        "data_version": ms.data_version,
+        "created_at": ms.created_at,
         "models_loaded": loaded_models,
+        "model_states": states,
         "details": loaded_details
     }
 
+@app.post("/admin/reload", status_code=202)
+def admin_reload(
+    wait: bool = Query(False, description="Yeniden yükleme bitene kadar bekle"),
+    force: bool = Query(False, description="Doğrulama sorunlarına rağmen yayınla"),
+    admin: Dict = Depends(require_admin)
+):
+    """Veriyi ve modelleri arka planda yeniden kur, doğrula ve atomik olarak yayınla"""
+    logger.info(f"[ADMIN] Yeniden yükleme istendi - {admin.get('email') or admin.get('uid')}")
+    if wait:
+        return reload_models(force=force)
+    started = reload_in_background(force=force)
+    return {"status": "started" if started else "in_progress", "current_version": current_model_set().version}
+
+@app.get("/admin/reload")
+def admin_reload_status(admin: Dict = Depends(require_admin)):
+    """Son yeniden yüklemenin durumu"""
+    return {**RELOAD_STATUS, "current_version": current_model_set().version}
+
 @app.get("/anomalies", response_model=List[AnomalyItem])
 def anomalies(
     category: str = Query("genel", description="Tüketim kategorisi"),
@@ -212,7 +396,11 @@ def anomalies(
     end: Optional[str] = Query(None, description="YYYY-MM-DD"),
     tolerance_pct: float = Query(0.10, description="Tolerans yüzdesi"),
     debug: bool = Query(False, description="Debug bilgilerini göster"),
-    current_user: Dict = Depends(get_current_user)  # Bu satırı ekliyoruz
+    method: str = Query("band", description="Tespit yöntemi: band (baseline ± tolerans) | mad (robust z)"),
+    mad_thr: float = Query(DEFAULT_THR, description="MAD eşiği (method=mad)"),
+    by_month: bool = Query(False, description="MAD'i şehir x ay gruplarında hesapla (method=mad)"),
+    current_user: Dict = Depends(get_current_user),  # Bu satırı ekliyoruz
+    not_modified: None = Depends(version_validators),  # ETag eşleşirse 304 (yetkilendirmeden sonra)
 ):
     """
     GELİŞTİRİLMİŞ ANOMALİ TESPİTİ
@@ -225,26 +413,14 @@ def anomalies(
         # Kategori adını temizle (baştaki/sondaki boşlukları kaldır)
         category = category.strip().lower()
         
-        print(f"\n[ANOMALI] Yeni istek - Kategori: '{category}', Şehir: {city}")
+        logger.info(f"[ANOMALI] Yeni istek - Kategori: '{category}', Şehir: {city}")
         
-         # Model kontrolü - TEMİZLENMİŞ category İLE KONTROL ET
-        if category not in MODELS or MODELS[category] is None:
-            available_cats = [cat for cat, model in MODELS.items() if model is not None]
+        method = method.strip().lower()
+        if method not in DETECTION_METHODS:
             raise HTTPException(
-                status_code=400, 
-                detail=f"'{category}' kategorisi için model yüklenmemiş. Mevcut kategoriler: {available_cats}"
+                status_code=400,
+                detail=f"'{method}' yöntemi bilinmiyor. Seçenekler: {list(DETECTION_METHODS)}"
             )
-        
-        # ... KODUN GERİ KALANI AYNEN KALACAK ...
-        model_info = MODELS[category]
-        target_col = model_info['target_col']
-        model = model_info['model']
-        
-        print(f"[MODEL] {category} modeli kullanılıyor - Target: {target_col}")
-
-        # Verileri yükle
-        df_train, df_test = get_processed_frames(target_col=target_col)
-        # ... mevcut kodun geri kalanı AYNEN kalacak ...
 
         # Model kontrolü - geliştirilmiş
         if category not in CONSUMPTION_CATEGORIES:
@@ -254,54 +430,58 @@ def anomalies(
                 detail=f"'{category}' kategorisi bulunamadı. Mevcut kategoriler: {available_cats}"
             )
         
-        if category not in MODELS or MODELS[category] is None:
-            available_cats = [cat for cat, model in MODELS.items() if model is not None]
+        # İstek boyunca tek model seti: yayın sırasında bile veri ve model aynı sürümden gelir.
+        # Model henüz yüklenmediyse şimdi yüklenir.
+        ms = current_model_set()
+        model_info = ms.ensure(category)
+        if model_info is None:
+            available_cats = list(ms.ready_models())
             raise HTTPException(
                 status_code=400, 
                 detail=f"'{category}' kategorisi için model yüklenmemiş. Mevcut kategoriler: {available_cats}"
             )
         
-        model_info = MODELS[category]
         target_col = model_info['target_col']
-        model = model_info['model']
+
+        # Şehir adını katalogdan çöz ("izmir", "IZMIR" -> "İZMİR"); yoksa trigram önerisi
+        if city:
+            catalog = ms.catalog()
+            resolved = catalog.resolve(city)
+            if resolved is None:
+                similar_cities = catalog.suggest(city)
+                logger.warning(f"[UYARI] '{city}' şehri bulunamadı! Benzer şehirler: {similar_cities}")
+                if similar_cities:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"'{city}' şehri bulunamadı. Benzer şehirler: {similar_cities}"
+                    )
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"'{city}' şehri bulunamadı. Mevcut şehirler: {catalog.test_cities[:5]}..."
+                )
+            city = resolved
         
-        print(f"[MODEL] {category} modeli kullanılıyor - Target: {target_col}")
+        logger.info(f"[MODEL] {category} modeli kullanılıyor - Target: {target_col} ({ms.version})")
 
-        # Verileri yükle
-        df_train, df_test = get_processed_frames(target_col=target_col)
-        Xtr, Xte, ytr, yte = get_train_test(target_col=target_col)
+        # Verileri yükle (setin anlık görüntüsünden; istek başına yeniden çekilmez)
+        df_train, df_test = ms.frames()
+        Xtr, Xte, ytr, yte = ms.train_test(target_col)
         
         if debug:
-            print(f"[DEBUG] Veri boyutları - Train: {df_train.shape}, Test: {df_test.shape}")
-            print(f"[DEBUG] X_train: {Xtr.shape}, X_test: {Xte.shape}, y_test: {yte.shape}")
+            logger.debug(f"[DEBUG] Veri boyutları - Train: {df_train.shape}, Test: {df_test.shape}")
+            logger.debug(f"[DEBUG] X_train: {Xtr.shape}, X_test: {Xte.shape}, y_test: {yte.shape}")
             if CITY_COL in df_test.columns:
                 cities_in_test = df_test[CITY_COL].unique()
-                print(f"[DEBUG] Test verisindeki şehir sayısı: {len(cities_in_test)}")
-                print(f"[DEBUG] İlk 10 şehir: {cities_in_test[:10]}")
+                logger.debug(f"[DEBUG] Test verisindeki şehir sayısı: {len(cities_in_test)}")
+                logger.debug(f"[DEBUG] İlk 10 şehir: {cities_in_test[:10]}")
                 if city:
                     city_data = df_test[df_test[CITY_COL] == city]
-                    print(f"[DEBUG] '{city}' şehri için kayıt sayısı: {len(city_data)}")
-
-        # Baseline hesapla
-        df_train = df_train.copy()
-        df_train["ay"] = pd.to_datetime(df_train[DATE_COL]).dt.month
-        seasonal_baseline = (
-            df_train.groupby([CITY_COL, "ay"])[target_col]
-            .mean()
-            .rename("baseline")
-            .reset_index()
-        )
-
-        # Test verisine baseline'ı ekle
-        df_test = df_test.copy()
-        df_test["ay"] = pd.to_datetime(df_test[DATE_COL]).dt.month
-        df_test = df_test.merge(seasonal_baseline, on=[CITY_COL, "ay"], how="left")
+                    logger.debug(f"[DEBUG] '{city}' şehri için kayıt sayısı: {len(city_data)}")
 
-        # Model tahminleri
-        yhat = model.predict(Xte)
+        out = anomaly_frame(ms, category, model_info, tolerance_pct, method, mad_thr, by_month)
 
         # Supabase'e kaydetmeden önce tek bir değer al
-        y_val = float(np.array(yhat).ravel()[0])
+        y_val = float(out["tahmin"].iloc[0])
 
         data = {
        "prediction": y_val,
@@ -309,126 +489,75 @@ def anomalies(
         "city": city if city else "Unknown"
        }
 
-        supabase.table("model_results").insert(data).execute()
-
-        
-        #---------------------------SENA--------------------------------
-        # Verileri hazırla - index uyumluluğu için
-        df_test_reset = df_test.reset_index(drop=True)
-        min_len = min(len(df_test_reset), len(yte), len(yhat))
-        
-        df_test_ordered = df_test_reset.head(min_len).copy()
-        yte_series = pd.Series(yte.values[:min_len])
-        yhat_series = pd.Series(yhat[:min_len])
-        baseline_series = df_test_ordered["baseline"].reset_index(drop=True)
-
-        print(f"[ISLENEN] {category} - {min_len} kayıt işlendi")
-
-        # Anomali tespiti
-        flags_anomali, alt_limit, ust_limit = detect_anomalies(
-            yte_series, baseline_series, tolerance_pct
-        )
-
-        # Sonuçları hazırla
-        out = pd.DataFrame({
-            "sehir": df_test_ordered[CITY_COL].astype(str),
-            "donem": pd.to_datetime(df_test_ordered[DATE_COL]).dt.strftime("%Y-%m-%d"),
-            "gercek": yte_series.astype(float),
-            "tahmin": yhat_series.astype(float),
-            "residual": (yte_series - yhat_series).astype(float),
-            "anomali": flags_anomali.astype(bool),
-            "baseline": baseline_series.astype(float),
-            "dev_pct": ((yte_series - baseline_series) / baseline_series.replace(0, 1e-8)).astype(float),
-            "alt_limit": alt_limit.astype(float),
-            "ust_limit": ust_limit.astype(float),
-            "category": category
-        })
+        with supabase_write("model_results"):
+            supabase.table("model_results").insert(data).execute()
 
         # Filtreleme - GELİŞTİRİLMİŞ
         original_count = len(out)
         filtered_count = original_count
         
         if city:
-            # Büyük harf tam eşleşme
-            city_mask = out["sehir"] == city
-            filtered_out = out[city_mask]
-            filtered_count = len(filtered_out)
-            
-            print(f"[FILTRE] Şehir: '{city}' -> {filtered_count} kayıt (önce: {original_count})")
-            
-            # Eğer hiç kayıt yoksa, şehir ismini kontrol et
+            # Kanonik ad ile tam eşleşme (katalogda çözüldü)
+            out = out[out["sehir"] == city]
+            filtered_count = len(out)
+            logger.info(f"[FILTRE] Şehir: '{city}' -> {filtered_count} kayıt (önce: {original_count})")
             if filtered_count == 0:
-                available_cities = sorted(out["sehir"].unique()) if original_count > 0 else []
-                similar_cities = [c for c in available_cities if city.upper() in c.upper()] if available_cities else []
-                
-                print(f"[UYARI] '{city}' şehri bulunamadı!")
-                print(f"[UYARI] Mevcut şehirler ({len(available_cities)}): {available_cities[:10]}{'...' if len(available_cities) > 10 else ''}")
-                if similar_cities:
-                    print(f"[UYARI] Benzer şehirler: {similar_cities}")
-                
-                # Benzer şehir önerisi yap
-                if similar_cities:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"'{city}' şehri bulunamadı. Benzer şehirler: {similar_cities[:3]}"
-                    )
-                else:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"'{city}' şehri bulunamadı. Mevcut şehirler: {available_cities[:5]}..."
-                    )
-            else:
-                out = filtered_out
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"'{city}' şehri için test döneminde kayıt yok."
+                )
 
         if start:
             start_date = pd.to_datetime(start).strftime("%Y-%m-%d")
             out = out[out["donem"] >= start_date]
-            print(f"[FILTRE] Başlangıç tarihi: {start} -> {len(out)} kayıt")
+            logger.info(f"[FILTRE] Başlangıç tarihi: {start} -> {len(out)} kayıt")
             
         if end:
             end_date = pd.to_datetime(end).strftime("%Y-%m-%d")
             out = out[out["donem"] <= end_date]
-            print(f"[FILTRE] Bitiş tarihi: {end} -> {len(out)} kayıt")
+            logger.info(f"[FILTRE] Bitiş tarihi: {end} -> {len(out)} kayıt")
 
         # İSTATİSTİKLER
         total_records = len(out)
         anomaly_count = out["anomali"].sum()
         anomaly_ratio = anomaly_count / total_records if total_records > 0 else 0
         
-        print("=" * 60)
-        print(f"[SONUÇ] Kategori: {category.upper()}")
-        print(f"[SONUÇ] Şehir: {city if city else 'TÜM ŞEHİRLER'}")
-        print(f"[SONUÇ] Toplam kayıt: {total_records}")
-        print(f"[SONUÇ] Anomali sayısı: {anomaly_count}")
-        print(f"[SONUÇ] Anomali oranı: %{anomaly_ratio*100:.1f}")
-        print(f"[SONUÇ] Tolerans: %{tolerance_pct*100:.1f}")
+        logger.info(f"[SONUÇ] Kategori: {category.upper()}")
+        logger.info(f"[SONUÇ] Şehir: {city if city else 'TÜM ŞEHİRLER'}")
+        logger.info(f"[SONUÇ] Toplam kayıt: {total_records}")
+        logger.info(f"[SONUÇ] Anomali sayısı: {anomaly_count}")
+        logger.info(f"[SONUÇ] Anomali oranı: %{anomaly_ratio*100:.1f}")
+        logger.info(f"[SONUÇ] Tolerans: %{tolerance_pct*100:.1f}")
         
         if total_records == 0:
-            print("[UYARI] Hiç kayıt kalmadı! Filtreleri kontrol edin.")
+            logger.warning("[UYARI] Hiç kayıt kalmadı! Filtreleri kontrol edin.")
         
-        # İlk birkaç anomaliyi göster
-        anomalies_df = out[out['anomali']]
-        if len(anomalies_df) > 0:
-            print(f"[ANOMALI] {len(anomalies_df)} anomali bulundu:")
-            for i, row in anomalies_df.head(3).iterrows():
-                print(f"  📍 {row['sehir']} - {row['donem']}: Gerçek: {row['gercek']:.0f}, Sapma: %{row['dev_pct']*100:.1f}")
+        if anomaly_count > 0:
+            logger.info(f"[ANOMALI] {anomaly_count} anomali bulundu")
+            # Örnek satırlar sadece DEBUG seviyesinde hazırlanır
+            if logger.isEnabledFor(logging.DEBUG):
+                sample = out.loc[out["anomali"], ["sehir", "donem", "gercek", "dev_pct"]].head(3)
+                logger.debug(f"[ANOMALI] Örnekler: {sample.to_dict(orient='records')}")
         else:
-            print("[UYARI] Hiç anomali bulunamadı!")
-        print("=" * 60)
+            logger.warning("[UYARI] Hiç anomali bulunamadı!")
 
         # Sonuçları döndür
-        result = [AnomalyItem(**rec) for rec in out.to_dict(orient="records")]
+        with stage_timer("serialize"):
+            # NaN limit / baseline (MAD'i 0 olan şehir, geçmişi olmayan ay) JSON'da null olsun
+            records = out.astype(object).where(out.notna(), None).to_dict(orient="records")
+            result = [AnomalyItem(**rec) for rec in records]
         
         # Debug modunda ekstra bilgi
         if debug:
             debug_info = {
                 "category": category,
                 "city": city,
-                "total_processed": min_len,
+                "total_processed": original_count,
                 "after_filters": len(out),
                 "anomalies_found": anomaly_count,
                 "anomaly_ratio": f"{anomaly_ratio*100:.1f}%",
                 "tolerance_pct": tolerance_pct,
+                "method": method,
                 "available_cities_sample": sorted(df_test[CITY_COL].unique().tolist())[:10] if CITY_COL in df_test.columns else [],
                 "date_range": {
                     "min": out["donem"].min() if len(out) > 0 else None,
@@ -437,7 +566,6 @@ def anomalies(
             }
             
             # Debug modu için özel response
-            from fastapi.responses import JSONResponse
             return JSONResponse({
                 "data": [item.dict() for item in result],
                 "debug_info": debug_info
@@ -449,110 +577,248 @@ def anomalies(
         raise
     except Exception as e:
         error_msg = f"Anomali tespiti sırasında hata: {str(e)}"
-        print(f"[ERROR] {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"[ERROR] {error_msg}")
         raise HTTPException(status_code=500, detail=error_msg)
 
+@app.post("/score", response_model=List[AnomalyItem])
+def score_readings(
+    request: ScoreRequest,
+    current_user: Dict = Depends(get_current_user)
+):
+    """
+    YENİ OKUMALARIN ANLIK SKORLANMASI
+    - Tam pipeline çalıştırılmaz; özellikler önbellekteki şehir geçmişinden kurulur
+    - Model ve mevsimsel baseline bellekte, sonuç milisaniyeler içinde döner
+    """
+    if not request.readings:
+        return []
+
+    readings = pd.DataFrame([r.dict() for r in request.readings])
+    readings["category"] = readings["category"].str.strip().str.lower()
+    ms = current_model_set()
+    for category in set(readings["category"]) & set(CONSUMPTION_CATEGORIES):
+        ms.ensure(category)
+
+    models = ms.ready_models()
+    missing = sorted(set(readings["category"]) - set(models))
+    if missing:
+        available_cats = list(models)
+        raise HTTPException(
+            status_code=400,
+            detail=f"{missing} kategorileri için model yüklenmemiş. Mevcut kategoriler: {available_cats}"
+        )
+
+    try:
+        with stage_timer("score_predict"):
+            scored = ms.scorer().score(readings, models)
+    except UnknownCityError as e:
+        raise HTTPException(status_code=400, detail=f"Şehir(ler) bulunamadı: {e.cities}")
+    except InvalidReadingsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Skorlama sırasında hata: {str(e)}")
+
+    gercek = scored["value"].astype(float)
+    tahmin = scored["tahmin"].astype(float)
+    baseline = scored["baseline"].astype(float)
+    with stage_timer("detect"):
+        flags_anomali, alt_limit, ust_limit = detect_anomalies(gercek, baseline, request.tolerance_pct)
+
+    out = pd.DataFrame({
+        "sehir": scored["sehir"],
+        "donem": scored["donem"],
+        "gercek": gercek,
+        "tahmin": tahmin,
+        "residual": gercek - tahmin,
+        "anomali": flags_anomali.astype(bool),
+        "baseline": baseline,
+        "dev_pct": (gercek - baseline) / baseline.replace(0, 1e-8),
+        "alt_limit": alt_limit,
+        "ust_limit": ust_limit,
+        "category": scored["category"],
+    })
+    # NaN baseline (şehir için o ayın geçmişi yok) JSON'da null olsun
+    with stage_timer("serialize"):
+        out = out.astype(object).where(out.notna(), None)
+        return [AnomalyItem(**rec) for rec in out.to_dict(orient="records")]
+
+def _query_dates(start: Optional[str], end: Optional[str]):
+    """start / end sorgu parametreleri -> YYYY-MM-DD; geçersiz tarih 400"""
+    try:
+        return (
+            pd.to_datetime(start).strftime("%Y-%m-%d") if start else None,
+            pd.to_datetime(end).strftime("%Y-%m-%d") if end else None,
+        )
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Tarih biçimi YYYY-MM-DD olmalı")
+
+@app.get("/map/geometry")
+def map_geometry(
+    request: Request,
+    tolerance: float = Query(MAP_DEFAULT_TOLERANCE, description=f"Sadeleştirme toleransı (derece): {MAP_TOLERANCES}"),
+):
+    """Sadeleştirilmiş il sınırları (önceden sıkıştırılmış, ETag ile)"""
+    try:
+        payload = map_payload(tolerance)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"ETag": payload.etag, "Cache-Control": "public, max-age=86400", "Vary": "Accept-Encoding"}
+    if payload.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    body, encoding = payload.encoded(request.headers.get("accept-encoding", ""))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/map/anomalies")
+def map_anomalies(
+    category: str = Query("genel", description="Tüketim kategorisi"),
+    start: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    end: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    tolerance_pct: float = Query(0.10, description="Tolerans yüzdesi"),
+    current_user: Dict = Depends(get_current_user),
+    not_modified: None = Depends(version_validators),
+):
+    """
+    HARİTA ÖZETİ
+    - İl başına kayıt / anomali sayısı, oran ve son dönemin sapması
+    - Geometri ayrı ve önbelleklenebilir: /map/geometry (properties.key ile eşleşir)
+    """
+    category = category.strip().lower()
+    if category not in CONSUMPTION_CATEGORIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"'{category}' kategorisi bulunamadı. Mevcut kategoriler: {list(CONSUMPTION_CATEGORIES)}"
+        )
+    ms = current_model_set()
+    model_info = ms.ensure(category)
+    if model_info is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"'{category}' kategorisi için model yüklenmemiş. Mevcut kategoriler: {list(ms.ready_models())}"
+        )
+
+    start, end = _query_dates(start, end)
+    out = anomaly_frame(ms, category, model_info, tolerance_pct)
+    if start:
+        out = out[out["donem"] >= start]
+    if end:
+        out = out[out["donem"] <= end]
+
+    provinces = province_summary(out)
+    total, anomalies_found = len(out), int(out["anomali"].sum())
+    return {
+        "category": category,
+        "model_version": ms.version,
+        "data_version": ms.data_version,
+        "start": out["donem"].min() if total else None,
+        "end": out["donem"].max() if total else None,
+        "tolerance_pct": tolerance_pct,
+        "total_records": total,
+        "total_anomalies": anomalies_found,
+        "anomaly_ratio": round(anomalies_found / total, 4) if total else 0.0,
+        "geometry": {"tolerance": MAP_DEFAULT_TOLERANCE, "etag": map_payload().etag},
+        "provinces": provinces,
+    }
+
 @app.get("/debug/city/{city_name}")
-def debug_city_data(city_name: str):
-    """Belirli bir şehrin verilerini kontrol et"""
+def debug_city_data(city_name: str, not_modified: None = Depends(version_validators)):
+    """Belirli bir şehrin verilerini kontrol et (şehir kataloğundan, pipeline çalıştırılmaz)"""
     try:
-        # Tüm kategorilerde bu şehri ara
-        results = {}
-        
-        for category, target_col in CONSUMPTION_CATEGORIES.items():
-            try:
-                df_train, df_test = get_processed_frames(target_col=target_col)
-                
-                # Büyük/küçük harf duyarsız arama
-                city_upper = city_name.upper()
-                
-                # Şehri bul
-                in_train = city_upper in [city.upper() for city in df_train[CITY_COL].dropna().unique()] if CITY_COL in df_train.columns else False
-                in_test = city_upper in [city.upper() for city in df_test[CITY_COL].dropna().unique()] if CITY_COL in df_test.columns else False
-                
-                # Eğer test'te varsa, veri sayılarını al
-                test_records = 0
-                train_records = 0
-                test_dates = []
-                target_values = []
-                
-                if in_test and CITY_COL in df_test.columns:
-                    test_data = df_test[df_test[CITY_COL].str.upper() == city_upper]
-                    test_records = len(test_data)
-                    if DATE_COL in test_data.columns:
-                        test_dates = test_data[DATE_COL].dt.strftime('%Y-%m-%d').unique().tolist()
-                    if target_col in test_data.columns:
-                        target_values = test_data[target_col].tolist()
-                
-                if in_train and CITY_COL in df_train.columns:
-                    train_data = df_train[df_train[CITY_COL].str.upper() == city_upper]
-                    train_records = len(train_data)
-                
-                results[category] = {
-                    "in_train": in_train,
-                    "in_test": in_test,
-                    "test_records": test_records,
-                    "train_records": train_records,
-                    "test_dates": test_dates[:5],  # İlk 5 tarih
-                    "target_values_sample": target_values[:5]  # İlk 5 değer
-                }
-                    
-            except Exception as e:
-                results[category] = {"error": str(e)}
-        
-        # Tüm kategorilerde toplam
-        total_test_records = sum(r["test_records"] for r in results.values() if isinstance(r, dict) and "test_records" in r)
-        total_train_records = sum(r["train_records"] for r in results.values() if isinstance(r, dict) and "train_records" in r)
-        
-        return {
-            "searched_city": city_name,
-            "city_upper": city_name.upper(),
-            "summary": {
-                "total_test_records": total_test_records,
-                "total_train_records": total_train_records,
-                "categories_with_data": [cat for cat, res in results.items() if isinstance(res, dict) and res.get("test_records", 0) > 0]
-            },
-            "results": results
-        }
-        
+        ms = current_model_set()
+        # Anahtar katlanmış ad: "izmir" / "İZMİR" / "IZMIR" tek hesaplamayı paylaşır;
+        # yanıttaki searched_city her çağıranın yazdığı ad olarak kalır
+        report = _city_flight.do((ms.data_version, fold_city(city_name)),
+                                 lambda: ms.catalog().city_report(city_name))
+        return {**report, "searched_city": city_name}
     except Exception as e:
         return {"error": str(e)}
 
 @app.get("/debug/all_cities")
-def debug_all_cities():
+def debug_all_cities(not_modified: None = Depends(version_validators)):
     """Tüm şehirleri ve kayıt sayılarını listele"""
     try:
-        df_train, df_test = get_processed_frames(target_col="Genel_Toplam_MWh")
-        
-        # Test verisindeki şehirler ve kayıt sayıları
-        test_city_counts = df_test[CITY_COL].value_counts().to_dict()
-        train_city_counts = df_train[CITY_COL].value_counts().to_dict()
-        
-        # Tüm şehirleri büyük harf yaparak birleştir
-        all_cities = sorted(set(df_test[CITY_COL].dropna().unique()))
-        
-        city_details = {}
-        for city in all_cities:
-            city_details[city] = {
-                "test_records": test_city_counts.get(city, 0),
-                "train_records": train_city_counts.get(city, 0),
-                "in_both": city in test_city_counts and city in train_city_counts
-            }
-        
-        return {
-            "total_cities": len(all_cities),
-            "cities": all_cities,
-            "city_details": city_details,
-            "summary": {
-                "cities_with_0_test_records": [city for city, details in city_details.items() if details["test_records"] == 0],
-                "cities_with_1_plus_test_records": [city for city, details in city_details.items() if details["test_records"] > 0],
-                "max_records_city": max(city_details.items(), key=lambda x: x[1]["test_records"]) if city_details else None
-            }
-        }
+        return current_model_set().catalog().all_cities()
     except Exception as e:
         return {"error": str(e)}
+
+# -----------------------------------------------------------------------------
+# GEÇMİŞ - anomaly_history deposundan, modeller yeniden çalıştırılmaz
+# -----------------------------------------------------------------------------
+def _history_or_503():
+    history = get_history()
+    if history is None:
+        raise HTTPException(status_code=503, detail="Anomali geçmişi kapalı (ANOMALY_HISTORY_DB)")
+    return history
+
+def _history_city(city: Optional[str]) -> Optional[str]:
+    """Yayındaki setin kataloğuyla kanonik ad; set yoksa olduğu gibi"""
+    if not city:
+        return None
+    ms = peek_model_set()
+    resolved = ms.catalog().resolve(city) if ms is not None else None
+    return resolved or city.strip().upper()
+
+@app.get("/history/runs")
+def history_runs(
+    category: Optional[str] = Query(None, description="Tüketim kategorisi"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: Dict = Depends(get_current_user),
+):
+    """Kaydedilmiş anomali tabloları (model sürümü, yöntem, parametre, özet)"""
+    history = _history_or_503()
+    runs = history.runs(category.strip().lower() if category else None, limit)
+    for run in runs:
+        run["params"] = json.loads(run["params"])
+    return runs
+
+@app.get("/history/anomalies")
+def history_anomalies(
+    category: str = Query("genel", description="Tüketim kategorisi"),
+    city: Optional[str] = Query(None, description="Şehir adı"),
+    start: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    end: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    method: Optional[str] = Query(None, description="band | mad (run_id yoksa en son run'ın yöntemi)"),
+    run_id: Optional[int] = Query(None, description="Belirli bir run; verilmezse en son run"),
+    all_runs: bool = Query(False, description="Tüm model sürümlerini döndür (karşılaştırma)"),
+    only_anomalies: bool = Query(False, description="Sadece anomali satırları"),
+    limit: int = Query(10000, ge=1, le=100000),
+    current_user: Dict = Depends(get_current_user),
+):
+    """
+    GEÇMİŞ ANOMALİLER
+    - Varsayılan: kategorinin en son kaydedilmiş run'ı
+    - all_runs=true: aynı (şehir, dönem) için tüm model sürümleri yan yana
+    """
+    history = _history_or_503()
+    category = category.strip().lower()
+    start, end = _query_dates(start, end)
+    if run_id is None and not all_runs:
+        latest = history.latest_run(category, method.strip().lower() if method else None)
+        if latest is None:
+            raise HTTPException(status_code=404, detail=f"'{category}' için kayıtlı anomali geçmişi yok")
+        run_id = latest["run_id"]
+    rows = history.rows(category, _history_city(city), start, end, run_id, only_anomalies, limit)
+    rows["anomali"] = rows["anomali"].astype(bool)
+    rows["params"] = rows["params"].map(json.loads)
+    return rows.astype(object).where(rows.notna(), None).to_dict(orient="records")
+
+@app.get("/history/trend")
+def history_trend(
+    category: str = Query("genel", description="Tüketim kategorisi"),
+    city: Optional[str] = Query(None, description="Şehir adı (verilmezse tüm şehirler)"),
+    start: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    end: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    method: Optional[str] = Query(None, description="band | mad"),
+    current_user: Dict = Depends(get_current_user),
+):
+    """Dönem x run: kayıt, anomali sayısı / oranı ve ortalama sapma"""
+    history = _history_or_503()
+    start, end = _query_dates(start, end)
+    trend = history.trend(category.strip().lower(), _history_city(city), start, end,
+                          method.strip().lower() if method else None)
+    trend["params"] = trend["params"].map(json.loads)
+    return trend.astype(object).where(trend.notna(), None).to_dict(orient="records")
 #------SENA------
 @app.get("/cache-test")
 async def cache_test():
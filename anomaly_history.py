@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+anomaly_history.py - Hesaplanan anomali tablolarının gömülü SQLite geçmişi
+- Her (kategori, model sürümü, yöntem, parametre) için hesaplanan tablo bir kez
+  "run" olarak yazılır; aynı sürümle tekrar hesaplanırsa yazılmaz
+- Satırlar (category, sehir, donem) indeksli; trend / karşılaştırma sorguları
+  modelleri yeniden çalıştırmadan indeks taramasıyla yanıtlanır
+- Yazma tek bir arka plan thread'inde yapılır (istek yolu sadece kuyruğa bırakır),
+  okumalar thread başına açılan bağlantılarla WAL modunda eşzamanlı çalışır
+
+Varsayılan olarak kapalıdır; açmak için ANOMALY_HISTORY_DB ile mutlak (ya da çalışma
+dizinine göre) bir dosya yolu verilir, örn. ANOMALY_HISTORY_DB=/var/lib/elektraize/anomaly_history.db
+"""
+
+import os
+import json
+import queue
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ANOMALY_HISTORY_DB = os.getenv("ANOMALY_HISTORY_DB", "")     # boş = kapalı
+
+_ROW_COLUMNS = ["sehir", "donem", "gercek", "tahmin", "residual", "anomali",
+                "baseline", "dev_pct", "alt_limit", "ust_limit"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id        INTEGER PRIMARY KEY,
+    category      TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    data_version  TEXT,
+    method        TEXT NOT NULL,
+    params        TEXT NOT NULL,
+    created_at    TEXT NOT NULL,
+    n_rows        INTEGER NOT NULL,
+    n_anomalies   INTEGER NOT NULL,
+    UNIQUE (category, model_version, method, params)
+);
+CREATE TABLE IF NOT EXISTS anomalies (
+    run_id        INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    category      TEXT NOT NULL,
+    sehir         TEXT NOT NULL,
+    donem         TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    gercek REAL, tahmin REAL, residual REAL, anomali INTEGER,
+    baseline REAL, dev_pct REAL, alt_limit REAL, ust_limit REAL
+);
+CREATE INDEX IF NOT EXISTS ix_anomalies_category_sehir_donem ON anomalies (category, sehir, donem);
+CREATE INDEX IF NOT EXISTS ix_anomalies_run ON anomalies (run_id);
+CREATE INDEX IF NOT EXISTS ix_runs_category ON runs (category, method, created_at);
+"""
+
+
+def _params_key(params: Dict) -> str:
+    return json.dumps(params, sort_keys=True)
+
+
+class AnomalyHistory:
+    """SQLite dosyası üzerinde run / satır deposu"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._recorded = set()          # bu süreçte yazılmış / kuyruğa alınmış run anahtarları
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # ----------------- Yazma -----------------
+    def record(self, category: str, model_version: str, data_version: Optional[str],
+               method: str, params: Dict, frame: pd.DataFrame) -> bool:
+        """Run'ı yazma kuyruğuna al; bu sürüm/parametre zaten kayıtlıysa False"""
+        key = (category, model_version, method, _params_key(params))
+        with self._lock:
+            if key in self._recorded:
+                return False
+            self._recorded.add(key)
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="anomaly-history-writer", daemon=True)
+                self._writer.start()
+        rows = frame[_ROW_COLUMNS].copy()
+        self._queue.put((key, data_version, rows))
+        return True
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(conn, *item)
+            except Exception as e:
+                logger.warning(f"[HISTORY] Run yazılamadı {item[0] if item else ''}: {e}")
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, key, data_version, rows: pd.DataFrame):
+        category, model_version, method, params = key
+        with conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO runs (category, model_version, data_version, method, params, "
+                "created_at, n_rows, n_anomalies) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (category, model_version, data_version, method, params,
+                 datetime.now().isoformat(timespec="seconds"), len(rows), int(rows["anomali"].sum())),
+            )
+            if cur.rowcount == 0:       # başka bir işçi aynı run'ı yazmış
+                return
+            run_id = cur.lastrowid
+            values = rows.astype(object).where(rows.notna(), None)
+            values["anomali"] = rows["anomali"].astype(int)
+            conn.executemany(
+                "INSERT INTO anomalies (run_id, category, model_version, sehir, donem, gercek, tahmin, residual, "
+                "anomali, baseline, dev_pct, alt_limit, ust_limit) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((run_id, category, model_version, *row) for row in values.itertuples(index=False, name=None)),
+            )
+        logger.info(f"[HISTORY] {category}/{method} {model_version}: {len(rows)} satır kaydedildi")
+
+    def flush(self):
+        """Kuyruktaki yazmaların bitmesini bekle"""
+        self._queue.join()
+
+    def close(self):
+        with self._lock:
+            writer = self._writer
+            self._writer = None
+        if writer is not None and writer.is_alive():
+            self._queue.put(None)
+            writer.join(timeout=30)
+
+    # ----------------- Okuma -----------------
+    def runs(self, category: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        sql = "SELECT * FROM runs" + (" WHERE category = ?" if category else "") + " ORDER BY run_id DESC LIMIT ?"
+        args = ((category,) if category else ()) + (limit,)
+        return [dict(r) for r in self._reader().execute(sql, args)]
+
+    def latest_run(self, category: str, method: Optional[str] = None) -> Optional[Dict]:
+        sql = "SELECT * FROM runs WHERE category = ?" + (" AND method = ?" if method else "") + \
+              " ORDER BY run_id DESC LIMIT 1"
+        row = self._reader().execute(sql, (category, method) if method else (category,)).fetchone()
+        return dict(row) if row else None
+
+    def rows(self, category: str, city: Optional[str] = None, start: Optional[str] = None,
+             end: Optional[str] = None, run_id: Optional[int] = None, only_anomalies: bool = False,
+             limit: int = 10000) -> pd.DataFrame:
+        """(category, sehir, donem) indeksiyle satırlar; run_id verilmezse tüm run'lar"""
+        where, args = ["a.category = ?"], [category]
+        if city:
+            where.append("a.sehir = ?")
+            args.append(city)
+        if start:
+            where.append("a.donem >= ?")
+            args.append(start)
+        if end:
+            where.append("a.donem <= ?")
+            args.append(end)
+        if run_id is not None:
+            where.append("a.run_id = ?")
+            args.append(run_id)
+        if only_anomalies:
+            where.append("a.anomali = 1")
+        sql = (
+            "SELECT a.*, r.method, r.params FROM anomalies a JOIN runs r USING (run_id) "
+            f"WHERE {' AND '.join(where)} ORDER BY a.sehir, a.donem, a.run_id LIMIT ?"
+        )
+        return pd.read_sql_query(sql, self._reader(), params=args + [limit])
+
+    def trend(self, category: str, city: Optional[str] = None, start: Optional[str] = None,
+              end: Optional[str] = None, method: Optional[str] = None) -> pd.DataFrame:
+        """Dönem x model sürümü: kayıt / anomali sayısı, oran ve ortalama sapma"""
+        where, args = ["a.category = ?"], [category]
+        for clause, value in (("a.sehir = ?", city), ("a.donem >= ?", start),
+                              ("a.donem <= ?", end), ("r.method = ?", method)):
+            if value:
+                where.append(clause)
+                args.append(value)
+        sql = (
+            "SELECT a.donem, a.model_version, r.method, r.params, COUNT(*) AS records, "
+            "SUM(a.anomali) AS anomalies, AVG(a.anomali) AS anomaly_ratio, AVG(a.dev_pct) AS mean_dev_pct "
+            "FROM anomalies a JOIN runs r USING (run_id) "
+            f"WHERE {' AND '.join(where)} "
+            "GROUP BY a.donem, a.run_id ORDER BY a.donem, a.run_id"
+        )
+        return pd.read_sql_query(sql, self._reader(), params=args)
+
+
+_history: Optional[AnomalyHistory] = None
+_history_lock = threading.Lock()
+
+
+def get_history() -> Optional[AnomalyHistory]:
+    """Yapılandırılmış depo; ANOMALY_HISTORY_DB boşsa None"""
+    global _history
+    if not ANOMALY_HISTORY_DB:
+        return None
+    if _history is None:
+        with _history_lock:
+            if _history is None:
+                _history = AnomalyHistory(ANOMALY_HISTORY_DB)
+    return _history
+
+
+def close_history():
+    if _history is not None:
+        _history.close()
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+backtest.py - Kategori modelleri için paralel rolling-origin backtest
+- Aylık kesim noktaları: her fold'da model kesimden önceki tüm aylarla eğitilir
+  (genişleyen pencere), sonraki --horizon ay üzerinde ölçülür
+- Özellik matrisleri kategori başına bir kez üretilir ve
+  BACKTEST_CACHE_DIR/<veri sürümü>/<özellik şeması>/ altına .npy olarak yazılır; aynı
+  veri ve aynı özellik koduyla sonraki çalıştırmalar yeniden kurmaz. Özellik şeması
+  FEATURE_SCHEMA_VERSION ile özellik fonksiyonlarının kaynak kodunun özetidir.
+  İşçiler matrisleri mmap ile bağlar, fold'lar zaman sıralı matrisin dilimleridir
+  (fold başına kopya / yeniden özellik üretimi yok)
+- (kategori, arka uç, fold) işleri ProcessPoolExecutor'da paralel koşar;
+  birden fazla işçide rf / xgb n_jobs=1 ile çalışır (çekirdek aşımı olmasın)
+- Fold başına MAE, RMSE, MAPE, R², fit / predict süreleri raporlanır
+
+Not: finalize_xy'nin eksik değer doldurması tüm train ortalamasıyla yapılır;
+backtest bu matrisleri olduğu gibi kullanır (API modelleriyle aynı özellikler).
+
+Kullanım:
+    python backtest.py --backends rf,hgb --folds 6 --horizon 1 --workers 4
+    python backtest.py --categories genel,mesken --output reports/backtest.csv
+"""
+
+import os
+import json
+import time
+import logging
+import hashlib
+import inspect
+import argparse
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+import consumption_cube
+import veri_cek
+from veri_cek import CONSUMPTION_CATEGORIES, DATE_COL, FEATURE_SCHEMA_VERSION, LAGS, finalize_xy, month_key
+from model_backends import BACKENDS, fit_model
+
+logger = logging.getLogger(__name__)
+
+BACKTEST_CACHE_DIR = Path(os.getenv("BACKTEST_CACHE_DIR", "cache/backtest"))
+BACKTEST_WORKERS = int(os.getenv("BACKTEST_WORKERS", str(os.cpu_count() or 1)))
+DEFAULT_FOLDS = 6
+DEFAULT_HORIZON = 1
+MIN_TRAIN_MONTHS = 12
+
+
+@dataclass
+class FoldResult:
+    category: str
+    backend: str
+    fold: int
+    cutoff: str            # test döneminin ilk ayı (YYYY-MM)
+    train_rows: int
+    test_rows: int
+    mae: float
+    rmse: float
+    mape: float
+    r2: float
+    fit_s: float
+    predict_s: float
+    n_estimators: int
+
+
+# ----------------- Matris önbelleği -----------------
+def _month_label(code: int) -> str:
+    return f"{code // 12:04d}-{code % 12 + 1:02d}"
+
+
+def feature_schema() -> str:
+    """Özellik kodunun sürümü: sabit + özellik fonksiyonlarının kaynağı (kod değişince önbellek ayrışır)"""
+    parts = [str(FEATURE_SCHEMA_VERSION), repr(LAGS), repr(sorted(CONSUMPTION_CATEGORIES.items()))]
+    for fn in (veri_cek.impute_city_month, veri_cek.add_time_features, veri_cek._target_cube, veri_cek.finalize_xy):
+        parts.append(inspect.getsource(fn))
+    parts.append(inspect.getsource(consumption_cube))
+    digest = hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()[:12]
+    return f"v{FEATURE_SCHEMA_VERSION}-{digest}"
+
+
+def cache_matrices(df_train: pd.DataFrame, df_test: pd.DataFrame, categories: Sequence[str],
+                   cache_dir: Path = BACKTEST_CACHE_DIR, data_version: Optional[str] = None) -> Path:
+    """
+    Kategori başına train + test satırlarını zaman sırasıyla tek matrise yaz:
+    <kök>/<veri sürümü>/<özellik şeması>/<kategori>/{X,y,month}.npy + columns.json. Varsa dokunmaz.
+    """
+    if data_version is None:
+        from model_registry import data_fingerprint
+        data_version = data_fingerprint(df_train, df_test)
+    root = Path(cache_dir) / data_version / feature_schema()
+    months = np.concatenate([month_key(df_train[DATE_COL]).to_numpy(), month_key(df_test[DATE_COL]).to_numpy()])
+    order = np.argsort(months, kind="stable")
+
+    for category in categories:
+        folder = root / category
+        if (folder / "columns.json").exists():
+            logger.info(f"[BACKTEST] {category}: önbellekteki matrisler kullanılıyor ({folder})")
+            continue
+        Xtr, Xte, ytr, yte = finalize_xy(df_train, df_test, CONSUMPTION_CATEGORIES[category])
+        X = np.concatenate([Xtr.to_numpy(dtype=np.float32), Xte.to_numpy(dtype=np.float32)])[order]
+        y = np.concatenate([ytr.to_numpy(dtype=np.float64), yte.to_numpy(dtype=np.float64)])[order]
+        folder.mkdir(parents=True, exist_ok=True)
+        np.save(folder / "X.npy", np.ascontiguousarray(X))
+        np.save(folder / "y.npy", y)
+        np.save(folder / "month.npy", months[order].astype(np.int32))
+        # columns.json en son yazılır: varlığı önbelleğin tamamlandığını gösterir
+        (folder / "columns.json").write_text(json.dumps(list(Xtr.columns)), encoding="utf-8")
+        logger.info(f"[BACKTEST] {category}: {X.shape} matris önbelleğe yazıldı")
+    return root
+
+
+_MATRICES: Dict[str, tuple] = {}
+
+
+def _load_matrices(folder: str):
+    """İşçi süreci başına bir kez mmap ile bağla"""
+    matrices = _MATRICES.get(folder)
+    if matrices is None:
+        path = Path(folder)
+        matrices = _MATRICES[folder] = (
+            np.load(path / "X.npy", mmap_mode="r"),
+            np.load(path / "y.npy", mmap_mode="r"),
+            np.load(path / "month.npy"),
+            json.loads((path / "columns.json").read_text(encoding="utf-8")),
+        )
+    return matrices
+
+
+# ----------------- Fold'lar -----------------
+def monthly_cutoffs(months: np.ndarray, folds: int = DEFAULT_FOLDS, horizon: int = DEFAULT_HORIZON,
+                    min_train_months: int = MIN_TRAIN_MONTHS) -> List[int]:
+    """Son ayları örten, horizon aralıklı en fazla `folds` kesim (month_key kodu)"""
+    periods = np.unique(months)
+    if len(periods) == 0:
+        return []
+    last = int(periods[-1])
+    earliest = int(periods[0]) + min_train_months
+    cutoffs = [last - horizon + 1 - i * horizon for i in range(folds)]
+    return sorted(c for c in cutoffs if c >= earliest)
+
+
+def _mape(y: np.ndarray, yhat: np.ndarray) -> float:
+    nonzero = y != 0
+    return float(np.mean(np.abs((y[nonzero] - yhat[nonzero]) / y[nonzero]))) if nonzero.any() else float("nan")
+
+
+def run_fold(folder: str, category: str, backend: str, fold: int, cutoff: int, horizon: int,
+             params: Optional[dict] = None) -> FoldResult:
+    """Tek fold: kesimden önceki satırlarla eğit, [kesim, kesim + horizon) üzerinde ölç"""
+    X, y, months, columns = _load_matrices(folder)
+    n_train = int(np.searchsorted(months, cutoff, side="left"))
+    n_end = int(np.searchsorted(months, cutoff + horizon, side="left"))
+
+    # Zaman sıralı matrisin dilimleri (mmap görünümü)
+    X_fit = pd.DataFrame(X[:n_train], columns=columns, copy=False)
+    X_eval = pd.DataFrame(X[n_train:n_end], columns=columns, copy=False)
+    y_fit, y_eval = pd.Series(y[:n_train]), np.asarray(y[n_train:n_end])
+
+    t0 = time.perf_counter()
+    model, n_estimators = fit_model(backend, X_fit, y_fit, time_key=months[:n_train], params=params)
+    fit_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    yhat = model.predict(X_eval)
+    predict_s = time.perf_counter() - t0
+
+    return FoldResult(
+        category=category, backend=backend, fold=fold, cutoff=_month_label(cutoff),
+        train_rows=n_train, test_rows=len(y_eval),
+        mae=float(mean_absolute_error(y_eval, yhat)),
+        rmse=float(np.sqrt(mean_squared_error(y_eval, yhat))),
+        mape=_mape(y_eval, yhat),
+        r2=float(r2_score(y_eval, yhat)) if len(y_eval) > 1 else float("nan"),
+        fit_s=fit_s, predict_s=predict_s, n_estimators=n_estimators,
+    )
+
+
+def _run_fold_task(task: dict) -> dict:
+    return asdict(run_fold(**task))
+
+
+def available_backends(backends: Sequence[str]) -> List[str]:
+    """xgboost kurulu değilse xgb atlanır"""
+    result = []
+    for backend in backends:
+        if backend == "xgb" and importlib.util.find_spec("xgboost") is None:
+            logger.warning("[BACKTEST] xgboost kurulu değil, xgb atlanıyor")
+            continue
+        result.append(backend)
+    return result
+
+
+def run_backtest(df_train: pd.DataFrame, df_test: pd.DataFrame, categories: Optional[Sequence[str]] = None,
+                 backends: Sequence[str] = BACKENDS, folds: int = DEFAULT_FOLDS, horizon: int = DEFAULT_HORIZON,
+                 workers: int = BACKTEST_WORKERS, cache_dir: Path = BACKTEST_CACHE_DIR,
+                 data_version: Optional[str] = None) -> pd.DataFrame:
+    """Tüm (kategori, arka uç, fold) işlerini çalıştır; fold başına bir satır"""
+    categories = list(categories or CONSUMPTION_CATEGORIES)
+    backends = available_backends([b.lower() for b in backends])
+    root = cache_matrices(df_train, df_test, categories, cache_dir, data_version)
+
+    # Paralel işçilerde model içi paralellik kapatılır
+    params = {"rf": {"n_jobs": 1}, "xgb": {"n_jobs": 1}} if workers > 1 else {}
+    tasks = []
+    for category in categories:
+        folder = str(root / category)
+        _, _, months, _ = _load_matrices(folder)
+        cutoffs = monthly_cutoffs(months, folds, horizon)
+        if not cutoffs:
+            logger.warning(f"[BACKTEST] {category}: kesim için yeterli ay yok ({len(np.unique(months))} ay)")
+        for backend in backends:
+            for fold, cutoff in enumerate(cutoffs):
+                tasks.append(dict(folder=folder, category=category, backend=backend, fold=fold,
+                                  cutoff=cutoff, horizon=horizon, params=params.get(backend)))
+
+    t0 = time.perf_counter()
+    rows = []
+    if workers <= 1 or len(tasks) <= 1:
+        rows = [_run_fold_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_run_fold_task, task): task for task in tasks}
+            for future in as_completed(futures):
+                task = futures[future]
+                try:
+                    rows.append(future.result())
+                except Exception as e:
+                    logger.error(f"[BACKTEST] {task['category']}/{task['backend']} fold {task['fold']} hata: {e}")
+    logger.info(f"[BACKTEST] {len(rows)}/{len(tasks)} fold {time.perf_counter() - t0:.1f} s ({workers} işçi)")
+
+    columns = list(FoldResult.__dataclass_fields__)
+    return pd.DataFrame(rows, columns=columns).sort_values(["category", "backend", "fold"], ignore_index=True)
+
+
+def summarize(results: pd.DataFrame) -> pd.DataFrame:
+    """Kategori x arka uç: ortalama hata metrikleri, toplam süreler"""
+    if results.empty:
+        return results
+    return results.groupby(["category", "backend"], sort=True).agg(
+        folds=("fold", "size"),
+        mae=("mae", "mean"),
+        rmse=("rmse", "mean"),
+        mape=("mape", "mean"),
+        r2=("r2", "mean"),
+        fit_s=("fit_s", "sum"),
+        predict_s=("predict_s", "sum"),
+    ).reset_index()
+
+
+# ===================== CLI =====================
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from veri_cek import get_processed_frames
+
+    ap = argparse.ArgumentParser(description="Kategori modelleri için rolling-origin backtest")
+    ap.add_argument("--backends", default=",".join(BACKENDS), help="Virgülle ayrılmış: rf,xgb,hgb")
+    ap.add_argument("--categories", help="Virgülle ayrılmış kategori adları (default: hepsi)")
+    ap.add_argument("--folds", type=int, default=DEFAULT_FOLDS, help="Kesim (fold) sayısı")
+    ap.add_argument("--horizon", type=int, default=DEFAULT_HORIZON, help="Fold başına test ayı sayısı")
+    ap.add_argument("--workers", type=int, default=BACKTEST_WORKERS, help="Süreç havuzu boyutu")
+    ap.add_argument("--output", help="Fold sonuçlarını bu CSV'ye yaz")
+    args = ap.parse_args()
+
+    categories = args.categories.split(",") if args.categories else None
+    unknown = [c for c in categories or [] if c not in CONSUMPTION_CATEGORIES]
+    if unknown:
+        raise SystemExit(f"Bilinmeyen kategori: {unknown}. Seçenekler: {list(CONSUMPTION_CATEGORIES)}")
+
+    df_train, df_test = get_processed_frames()
+    results = run_backtest(df_train, df_test, categories, args.backends.split(","),
+                           args.folds, args.horizon, args.workers)
+
+    fmt = lambda v: f"{v:.3f}"
+    print(results.to_string(index=False, float_format=fmt))
+    print()
+    print(summarize(results).to_string(index=False, float_format=fmt))
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        results.to_csv(args.output, index=False)
+        print(f"✔ kaydedildi -> {args.output}")
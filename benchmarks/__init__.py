@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Çevrimdışı performans ölçüm paketi (sentetik veri + aşama zamanlamaları)"""
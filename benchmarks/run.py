@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks/run.py - Çevrimdışı uçtan uca performans ölçümü
+Supabase yerine sentetik 81 il verisi kullanılır; ağ erişimi gerekmez.
+Sentetik tablolar bellekten (varsayılan) veya --source-format ile geçici bir
+CSV/Parquet/SQLite kaynağından okunur.
+
+Ölçülenler:
+- veri_cek aşamaları (fetch, merge, compact, impute, features, finalize_xy) + tepe bellek
+- load_all_models (7 kategori)
+- detect_anomalies
+- /anomalies handler'ı (HTTP katmanı dahil, TestClient ile)
+
+Kullanım:
+    python -m benchmarks.run --years 4 --save benchmarks/results/baseline.json
+    python -m benchmarks.run --years 4 --compare benchmarks/results/baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+import veri_cek
+from data_source import DataSource, MemorySource, create_data_source, set_data_source
+from profiling import StageProfiler
+from benchmarks.synthetic import generate
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+# ----------------- Yardımcılar -----------------
+def _summary(samples: List[float], **extra) -> Dict:
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "max_s": max(samples),
+        "runs": len(samples),
+        **extra,
+    }
+
+
+def _time(fn: Callable, repeat: int) -> Dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return _summary(samples)
+
+
+@contextmanager
+def offline_tables(dfs: Dict[str, pd.DataFrame], fmt: str = "memory"):
+    """Sentetik tabloları varsayılan veri kaynağı yap (memory / csv / parquet / sqlite)"""
+    tables = {veri_cek.TABLES[nick]: df for nick, df in dfs.items()}
+    with tempfile.TemporaryDirectory(prefix="elektraize-bench-") as tmp:
+        if fmt == "memory":
+            source: DataSource = MemorySource(tables)
+        else:
+            path = Path(tmp) / ("bench.db" if fmt == "sqlite" else "tables")
+            source = create_data_source(f"{fmt}:{path}")
+            for name, df in tables.items():
+                source.write_table(name, df)
+        set_data_source(source)
+        try:
+            yield source
+        finally:
+            set_data_source(None)
+
+
+class _NullTable:
+    """Supabase yazımlarını ağa gitmeden yutan kayıtçı"""
+
+    def __init__(self):
+        self.writes = 0
+
+    def table(self, *_):
+        return self
+
+    def insert(self, *_):
+        self.writes += 1
+        return self
+
+    def execute(self):
+        return None
+
+
+def _import_api():
+    # anomaly_api import anında Supabase istemcisi kurar; bağlantı açılmaz
+    os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("SUPABASE_KEY", "offline-benchmark")
+    import anomaly_api
+    import model_registry
+    from firebase_auth import get_current_user
+
+    anomaly_api.supabase = _NullTable()
+    model_registry.save_model_result = lambda **_: None
+    anomaly_api.app.dependency_overrides[get_current_user] = lambda: {"uid": "benchmark"}
+    return anomaly_api
+
+
+# ----------------- Ölçümler -----------------
+def bench_pipeline(repeat: int) -> Dict[str, Dict]:
+    stages: Dict[str, List] = {}
+    for _ in range(repeat):
+        profiler = StageProfiler()
+        try:
+            veri_cek.get_processed_data(return_frames=False, profiler=profiler)
+        finally:
+            profiler.stop()
+        for st in profiler.stages:
+            stages.setdefault(st.name, []).append(st)
+    return {
+        f"veri_cek.{name}": _summary(
+            [st.seconds for st in runs],
+            peak_mb=max(st.peak_mb for st in runs),
+        )
+        for name, runs in stages.items()
+    }
+
+
+def bench_api(api, repeat: int, model_repeat: int, category: str) -> Dict[str, Dict]:
+    from fastapi.testclient import TestClient
+
+    from model_registry import ModelSet, publish
+
+    # Her tekrar yeni bir veri anlık görüntüsü + 7 model kurar ve yayınlar
+    results = {"load_all_models": _time(lambda: publish(ModelSet.build().load_all()), model_repeat)}
+
+    df_train, df_test = veri_cek.get_processed_frames()
+    target = veri_cek.CONSUMPTION_CATEGORIES[category]
+    df_train = df_train.assign(ay=df_train[veri_cek.DATE_COL].dt.month)
+    baseline = df_train.groupby([veri_cek.CITY_COL, "ay"], observed=True)[target].transform("mean")
+    gercek = df_train[target]
+    results["detect_anomalies"] = _time(lambda: api.detect_anomalies(gercek, baseline, 0.10), max(repeat, 20))
+
+    client = TestClient(api.app)   # lifespan tetiklenmez; modeller yukarıda yüklendi
+
+    def call():
+        r = client.get("/anomalies", params={"category": category})
+        r.raise_for_status()
+
+    results["/anomalies"] = _time(call, repeat)
+    return results
+
+
+def run(args) -> Dict:
+    dfs = generate(years=args.years, test_years=args.test_years, n_cities=args.cities, seed=args.seed)
+    meta = {
+        "years": args.years,
+        "test_years": args.test_years,
+        "cities": dfs["train"][veri_cek.CITY_COL].nunique(),
+        "train_rows": len(dfs["train"]),
+        "test_rows": len(dfs["test"]),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "source": args.source_format,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    results: Dict[str, Dict] = {}
+    with offline_tables(dfs, args.source_format):
+        results.update(bench_pipeline(args.repeat))
+        if not args.skip_api:
+            results.update(bench_api(_import_api(), args.repeat, args.model_repeat, args.category))
+    return {"meta": meta, "results": results}
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Baseline'a göre yavaşlayan ölçümleri yazdır ve adlarını döndür"""
+    regressions = []
+    print(f"\n{'ölçüm':<28}{'baseline':>12}{'şimdi':>12}{'oran':>8}")
+    for name, cur in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            print(f"{name:<28}{'-':>12}{cur['median_s'] * 1000:>10.1f}ms{'yeni':>8}")
+            continue
+        ratio = cur["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        mark = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            mark = "  ✗"
+        print(f"{name:<28}{base['median_s'] * 1000:>10.1f}ms{cur['median_s'] * 1000:>10.1f}ms{ratio:>7.2f}x{mark}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="ElektrAize çevrimdışı benchmark")
+    ap.add_argument("--years", type=int, default=4, help="Toplam yıl sayısı (default 4)")
+    ap.add_argument("--test-years", type=int, default=2, help="Test tablosuna düşen son yıllar")
+    ap.add_argument("--cities", type=int, help="İl sayısı (default 81)")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeat", type=int, default=3, help="Hızlı ölçümlerin tekrar sayısı")
+    ap.add_argument("--model-repeat", type=int, default=1, help="load_all_models tekrar sayısı")
+    ap.add_argument("--category", default="genel", help="/anomalies için kategori")
+    ap.add_argument("--source-format", default="memory", choices=["memory", "csv", "parquet", "sqlite"],
+                    help="Sentetik tabloların okunacağı kaynak türü")
+    ap.add_argument("--skip-api", action="store_true", help="Sadece veri_cek aşamalarını ölç")
+    ap.add_argument("--save", help="Sonuçları bu JSON dosyasına yaz")
+    ap.add_argument("--compare", help="Bu baseline JSON'una göre karşılaştır")
+    ap.add_argument("--tolerance", type=float, default=0.20, help="İzin verilen yavaşlama oranı (default 0.20)")
+    args = ap.parse_args()
+
+    current = run(args)
+    for name, res in current["results"].items():
+        peak = f"  peak {res['peak_mb']:.1f} MB" if "peak_mb" in res else ""
+        print(f"[BENCH] {name:<28} {res['median_s'] * 1000:10.1f} ms (n={res['runs']}){peak}")
+
+    if args.save:
+        path = Path(args.save)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(current, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"✔ kaydedildi -> {path}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            print(f"\n✗ Yavaşlayan ölçümler: {regressions}")
+            sys.exit(1)
+        print("\n✔ Regresyon yok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+benchmarks/synthetic.py - Sentetik Türkiye il verisi üreticisi
+- 81 il x yapılandırılabilir yıl x tüm CONSUMPTION_CATEGORIES kolonları
+- weather (aylık), nufus (yıllık), hizmet (aylık) yardımcı tabloları
+- veri_cek.TABLES anahtarlarıyla aynı sözlüğü döndürür (fetch_tables yerine geçer)
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from veri_cek import DATE_COL, CITY_COL, TARGET, CONSUMPTION_CATEGORIES
+
+# API'nin beklediği biçim: BÜYÜK HARF, İngilizce karakterler
+PROVINCES = [
+    "ADANA", "ADIYAMAN", "AFYONKARAHISAR", "AGRI", "AMASYA", "ANKARA", "ANTALYA",
+    "ARTVIN", "AYDIN", "BALIKESIR", "BILECIK", "BINGOL", "BITLIS", "BOLU", "BURDUR",
+    "BURSA", "CANAKKALE", "CANKIRI", "CORUM", "DENIZLI", "DIYARBAKIR", "EDIRNE",
+    "ELAZIG", "ERZINCAN", "ERZURUM", "ESKISEHIR", "GAZIANTEP", "GIRESUN", "GUMUSHANE",
+    "HAKKARI", "HATAY", "ISPARTA", "MERSIN", "ISTANBUL", "IZMIR", "KARS", "KASTAMONU",
+    "KAYSERI", "KIRKLARELI", "KIRSEHIR", "KOCAELI", "KONYA", "KUTAHYA", "MALATYA",
+    "MANISA", "KAHRAMANMARAS", "MARDIN", "MUGLA", "MUS", "NEVSEHIR", "NIGDE", "ORDU",
+    "RIZE", "SAKARYA", "SAMSUN", "SIIRT", "SINOP", "SIVAS", "TEKIRDAG", "TOKAT",
+    "TRABZON", "TUNCELI", "SANLIURFA", "USAK", "VAN", "YOZGAT", "ZONGULDAK", "AKSARAY",
+    "BAYBURT", "KARAMAN", "KIRIKKALE", "BATMAN", "SIRNAK", "BARTIN", "ARDAHAN", "IGDIR",
+    "YALOVA", "KARABUK", "KILIS", "OSMANIYE", "DUZCE",
+]
+
+# Genel tüketimin kategori payları (tarımsal sulama yazın artar)
+_SHARES = {
+    "Mesken_MWh": 0.30,
+    "Sanayi_MWh": 0.40,
+    "Ticarethane_MWh": 0.15,
+    "Aydinlatma_MWh": 0.03,
+    "Tarımsal_Sulama_MWh": 0.05,
+    "Diger_MWh": 0.07,
+}
+
+
+def generate(years: int = 4, start_year: int = 2022, test_years: int = 2,
+             n_cities: Optional[int] = None, missing_pct: float = 0.02,
+             anomaly_pct: float = 0.01, seed: int = 42) -> Dict[str, pd.DataFrame]:
+    """
+    Supabase tablolarının sentetik karşılıklarını üret.
+    Son test_years yıl test tablosuna, öncekiler train tablosuna düşer.
+    Tarihler Supabase JSON'undaki gibi 'YYYY-MM-DD' string'idir.
+    """
+    rng = np.random.default_rng(seed)
+    cities = PROVINCES[:n_cities] if n_cities else PROVINCES
+    dates = pd.date_range(f"{start_year}-01-01", periods=years * 12, freq="MS")
+    n_c, n_d = len(cities), len(dates)
+
+    city = np.repeat(np.array(cities, dtype=object), n_d)
+    date = np.tile(dates, n_c)
+    month = np.tile(dates.month.to_numpy(), n_c)
+    t = np.tile(np.arange(n_d), n_c)
+
+    # Şehir ölçeği (log-normal), mevsimsellik, hafif trend ve gürültü
+    scale = np.repeat(rng.lognormal(mean=12.5, sigma=0.8, size=n_c), n_d)
+    season = 1 + 0.18 * np.cos(2 * np.pi * (month - 1) / 12) + 0.08 * np.cos(2 * np.pi * (month - 7) / 6)
+    trend = 1 + 0.02 * t / 12
+    genel = scale * season * trend * rng.normal(1, 0.04, size=len(city))
+
+    # Enjekte edilmiş anomaliler (±%30-60)
+    spikes = rng.random(len(city)) < anomaly_pct
+    genel[spikes] *= 1 + rng.choice([-1, 1], spikes.sum()) * rng.uniform(0.3, 0.6, spikes.sum())
+
+    energy = pd.DataFrame({DATE_COL: pd.DatetimeIndex(date).strftime("%Y-%m-%d"), CITY_COL: city, TARGET: genel})
+    summer = 1 + 1.5 * np.isin(month, [6, 7, 8])
+    for col in CONSUMPTION_CATEGORIES.values():
+        if col == TARGET:
+            continue
+        share = _SHARES.get(col, 0.05) * (summer if col == "Tarımsal_Sulama_MWh" else 1)
+        energy[col] = genel * share * rng.normal(1, 0.05, size=len(city))
+
+    # Eksik ölçümler
+    for col in CONSUMPTION_CATEGORIES.values():
+        energy.loc[rng.random(len(energy)) < missing_pct, col] = np.nan
+
+    split = pd.Timestamp(f"{start_year + years - test_years}-01-01")
+    is_test = pd.DatetimeIndex(date) >= split
+
+    lat = np.repeat(rng.uniform(36, 42, size=n_c), n_d)
+    weather = pd.DataFrame({
+        DATE_COL: energy[DATE_COL],
+        CITY_COL: city,
+        "Ortalama_Sicaklik": 14 - (lat - 36) - 10 * np.cos(2 * np.pi * (month - 1) / 12) + rng.normal(0, 1.5, len(city)),
+        "Toplam_Yagis": rng.gamma(2.0, 30 * (1 + 0.5 * np.cos(2 * np.pi * (month - 1) / 12))),
+        "Nem_oran": np.clip(rng.normal(62, 10, len(city)), 20, 100),
+    })
+
+    hizmet = pd.DataFrame({
+        DATE_COL: energy[DATE_COL],
+        CITY_COL: city,
+        "Abone_sayi": np.round(scale / 4 * trend * rng.normal(1, 0.01, len(city))),
+        "Kesinti_oran": np.clip(rng.normal(0.02, 0.01, len(city)), 0, None),
+    })
+
+    yrs = np.arange(start_year, start_year + years)
+    base_pop = rng.lognormal(mean=13.3, sigma=0.7, size=n_c)
+    nufus = pd.DataFrame({
+        DATE_COL: np.tile([f"{y}-01-01" for y in yrs], n_c),
+        CITY_COL: np.repeat(np.array(cities, dtype=object), len(yrs)),
+        "Nufus_sayi": np.round(np.repeat(base_pop, len(yrs)) * np.tile(1.01 ** (yrs - start_year), n_c)),
+    })
+
+    return {
+        "genel": energy.copy(),
+        "weather": weather,
+        "nufus": nufus,
+        "hizmet": hizmet,
+        "train": energy[~is_test].reset_index(drop=True),
+        "test": energy[is_test].reset_index(drop=True),
+    }
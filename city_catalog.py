@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+city_catalog.py - Veri sürümü başına bir kez kurulan şehir kataloğu
+- Şehir başına train/test kayıt sayıları, kategori başına tarih kapsamı ve
+  örnek değerler (debug uç noktaları pipeline'ı yeniden çalıştırmaz)
+- Türkçe duyarlı büyük harf / aksan katlama: "izmir", "İZMİR", "IZMIR" aynı şehir
+- Trigram indeksiyle bulanık şehir önerisi ("ISTANBUL" -> "İSTANBUL", "Kahramanmars")
+Sorgular ön-hesaplanmış sözlüklerden yanıtlanır (mikrosaniyeler).
+"""
+
+import logging
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from veri_cek import DATE_COL, CITY_COL
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE = 5           # debug çıktısındaki ilk N tarih / değer
+_MIN_SIMILARITY = 0.3  # trigram Dice benzerliği alt sınırı
+_CACHE_SIZE = 2        # aynı anda tutulan veri sürümü sayısı (yayındaki + önceki)
+
+# Önce küçük Türkçe harfler: "i".upper() -> "I" olur ama "İ" ayrıca katlanmalı
+_FOLD = str.maketrans({
+    "ı": "i", "İ": "i", "I": "i",
+    "ş": "s", "Ş": "s", "ğ": "g", "Ğ": "g",
+    "ü": "u", "Ü": "u", "ö": "o", "Ö": "o",
+    "ç": "c", "Ç": "c", "â": "a", "Â": "a", "î": "i", "Î": "i", "û": "u", "Û": "u",
+})
+
+
+def fold_city(name) -> str:
+    """Karşılaştırma anahtarı: Türkçe harfler ASCII'ye, boşluk/tire sadeleşir, BÜYÜK HARF"""
+    text = str(name).strip().translate(_FOLD).lower()
+    return " ".join(text.replace("-", " ").replace("_", " ").split()).upper()
+
+
+def _trigrams(key: str) -> Counter:
+    padded = f"  {key} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class CityCatalog:
+    """İşlenmiş train/test çerçevelerinden kurulan salt-okunur şehir indeksi"""
+
+    def __init__(self, df_train: pd.DataFrame, df_test: pd.DataFrame, target_cols: Dict[str, str],
+                 data_version: Optional[str] = None):
+        self.data_version = data_version
+        train_counts = df_train[CITY_COL].astype(str).value_counts()
+        test_counts = df_test[CITY_COL].astype(str).value_counts()
+
+        self.cities: List[str] = sorted(set(train_counts.index) | set(test_counts.index))
+        self.test_cities: List[str] = sorted(test_counts.index)
+        self.train_records = {c: int(train_counts.get(c, 0)) for c in self.cities}
+        self.test_records = {c: int(test_counts.get(c, 0)) for c in self.cities}
+
+        # Katlanmış anahtar -> kanonik ad (çakışmada ilk gelen kazanır, loglanır)
+        self.by_key: Dict[str, str] = {}
+        for city in self.cities:
+            key = fold_city(city)
+            if key in self.by_key and self.by_key[key] != city:
+                logger.warning(f"[KATALOG] '{city}' ve '{self.by_key[key]}' aynı anahtara katlanıyor: {key}")
+                continue
+            self.by_key[key] = city
+
+        # Trigram -> şehir listesi (ters indeks)
+        self._grams = {key: _trigrams(key) for key in self.by_key}
+        self._index: Dict[str, List[str]] = {}
+        for key, grams in self._grams.items():
+            for gram in grams:
+                self._index.setdefault(gram, []).append(key)
+
+        self.coverage = {cat: self._coverage(df_train, df_test, col) for cat, col in target_cols.items()}
+        self._all_cities = self._build_all_cities()
+        logger.info(f"[KATALOG] {len(self.cities)} şehir, {len(self._index)} trigram ({data_version})")
+
+    # ----------------- Kurulum -----------------
+    @staticmethod
+    def _coverage(df_train: pd.DataFrame, df_test: pd.DataFrame, target_col: str) -> Dict[str, dict]:
+        """Şehir başına: hedefi dolu satırların tarih aralığı, kayıt sayısı ve ilk örnekler"""
+        out: Dict[str, dict] = {}
+        for split, df in (("train", df_train), ("test", df_test)):
+            if target_col not in df.columns or CITY_COL not in df.columns:
+                continue
+            sub = df.loc[df[target_col].notna(), [CITY_COL, DATE_COL, target_col]]
+            sub = sub.assign(**{CITY_COL: sub[CITY_COL].astype(str)}).sort_values([CITY_COL, DATE_COL], kind="stable")
+            grouped = sub.groupby(CITY_COL, sort=False, observed=True)
+            span = grouped[DATE_COL].agg(["min", "max", "size"])
+            head = grouped.head(_SAMPLE)
+            dates = head[DATE_COL].dt.strftime("%Y-%m-%d").groupby(head[CITY_COL], observed=True).agg(list)
+            values = head[target_col].astype(float).groupby(head[CITY_COL], observed=True).agg(list)
+            for city, row in span.iterrows():
+                entry = out.setdefault(city, {})
+                entry[f"{split}_records"] = int(row["size"])
+                entry[f"{split}_first"] = row["min"].strftime("%Y-%m-%d")
+                entry[f"{split}_last"] = row["max"].strftime("%Y-%m-%d")
+                if split == "test":
+                    entry["test_dates"] = dates.get(city, [])
+                    entry["target_values_sample"] = values.get(city, [])
+        return out
+
+    def _build_all_cities(self) -> Dict:
+        details = {
+            city: {
+                "test_records": self.test_records[city],
+                "train_records": self.train_records[city],
+                "in_both": self.test_records[city] > 0 and self.train_records[city] > 0,
+            }
+            for city in self.test_cities
+        }
+        return {
+            "total_cities": len(self.test_cities),
+            "cities": self.test_cities,
+            "city_details": details,
+            "summary": {
+                "cities_with_0_test_records": [c for c, d in details.items() if d["test_records"] == 0],
+                "cities_with_1_plus_test_records": [c for c, d in details.items() if d["test_records"] > 0],
+                "max_records_city": max(details.items(), key=lambda x: x[1]["test_records"]) if details else None,
+            },
+        }
+
+    # ----------------- Sorgular -----------------
+    def resolve(self, name: str) -> Optional[str]:
+        """Kullanıcının yazdığı adı veri setindeki kanonik şehir adına çevir"""
+        if name in self.train_records:
+            return name
+        return self.by_key.get(fold_city(name))
+
+    def suggest(self, name: str, limit: int = 3) -> List[str]:
+        """Önce katlanmış alt dizi eşleşmeleri, sonra trigram benzerliğine göre öneriler"""
+        key = fold_city(name)
+        if not key:
+            return []
+        substring = sorted(k for k in self.by_key if key in k)
+        grams = _trigrams(key)
+        total = sum(grams.values())
+        shared: Counter = Counter()
+        for gram, n in grams.items():
+            for candidate in self._index.get(gram, ()):
+                shared[candidate] += min(n, self._grams[candidate][gram])
+        scored = sorted(
+            ((2 * common / (total + sum(self._grams[k].values())), k) for k, common in shared.items()),
+            key=lambda x: (-x[0], x[1]),
+        )
+        ranked = substring + [k for score, k in scored if score >= _MIN_SIMILARITY and k not in substring]
+        return [self.by_key[k] for k in ranked[:limit]]
+
+    def city_report(self, name: str) -> Dict:
+        """/debug/city yanıtı: kategori başına kayıt sayıları ve tarih kapsamı"""
+        city = self.resolve(name)
+        results = {}
+        for category, coverage in self.coverage.items():
+            entry = coverage.get(city, {}) if city else {}
+            results[category] = {
+                "in_train": entry.get("train_records", 0) > 0,
+                "in_test": entry.get("test_records", 0) > 0,
+                "test_records": entry.get("test_records", 0),
+                "train_records": entry.get("train_records", 0),
+                "train_range": [entry["train_first"], entry["train_last"]] if "train_first" in entry else None,
+                "test_range": [entry["test_first"], entry["test_last"]] if "test_first" in entry else None,
+                "test_dates": entry.get("test_dates", []),
+                "target_values_sample": entry.get("target_values_sample", []),
+            }
+        return {
+            "searched_city": name,
+            "city_upper": fold_city(name),
+            "resolved_city": city,
+            "suggestions": [] if city else self.suggest(name),
+            "summary": {
+                "total_test_records": sum(r["test_records"] for r in results.values()),
+                "total_train_records": sum(r["train_records"] for r in results.values()),
+                "categories_with_data": [cat for cat, r in results.items() if r["test_records"] > 0],
+            },
+            "results": results,
+        }
+
+    def all_cities(self) -> Dict:
+        """/debug/all_cities yanıtı (kurulumda hazırlanır)"""
+        return self._all_cities
+
+
+# Aynı veri sürümüyle kurulan yeni model setleri (ör. force reload) kataloğu yeniden kurmaz
+_catalogs: "OrderedDict[str, CityCatalog]" = OrderedDict()
+_catalogs_lock = threading.Lock()
+
+
+def catalog_for(df_train: pd.DataFrame, df_test: pd.DataFrame, target_cols: Dict[str, str],
+                data_version: str) -> CityCatalog:
+    with _catalogs_lock:
+        catalog = _catalogs.get(data_version)
+        if catalog is None:
+            catalog = _catalogs[data_version] = CityCatalog(df_train, df_test, target_cols, data_version)
+            while len(_catalogs) > _CACHE_SIZE:
+                _catalogs.popitem(last=False)
+        else:
+            _catalogs.move_to_end(data_version)
+        return catalog
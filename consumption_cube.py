@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+consumption_cube.py - Tüketimin yoğun şehir x ay x kategori küpü
+- values[şehir, ay, kategori]: tamsayı şehir kodu (Sehir kategorik kodu) ve
+  ay kodu (veri_cek.month_key - ilk ay) ile indekslenen float64 dizi
+- mask[şehir, ay]: çerçevede satırı olan hücreler; satırı olmayan hücreler NaN
+- Lag O(1) görünüm (view), rolling pencereler sliding_window_view
+  üzerinde, baseline'lar ay eksenini (yıl, 12) olarak yeniden şekillendirerek
+  tek vektörel indirgeme ile hesaplanır
+- imputed(): veri_cek.impute_city_month'un küp üzerindeki karşılığı (pipeline bunu kullanır)
+- take() / to_frame() sonuçları mevcut uzun formatlı çerçevelere geri taşır
+
+Not: Küpte lag takvim ayıdır; çerçevedeki groupby.shift ise satır sayar.
+Şehirlerin ayları boşluksuzsa (is_contiguous) ikisi birebir aynıdır.
+
+Kullanım:
+    cube = ConsumptionCube.from_frame(df_train)
+    lag12 = cube.lag(12, "Genel_Toplam_MWh")          # (şehir, ay)
+    df_train["lag12"] = cube.take(lag12)               # çerçeve satır sırasıyla
+"""
+
+import logging
+from typing import Dict, Iterable, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from veri_cek import DATE_COL, CITY_COL, CONSUMPTION_CATEGORIES, month_key, _to_datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _month_dates(codes: np.ndarray) -> pd.DatetimeIndex:
+    """month_key kodlarını ayın ilk gününe çevir"""
+    codes = np.asarray(codes, dtype=np.int64)
+    return pd.to_datetime({"year": codes // 12, "month": codes % 12 + 1, "day": 1})
+
+
+class ConsumptionCube:
+    """Şehir x ay x kategori yoğun küp; çerçeve satırlarının küp konumlarını da tutar"""
+
+    def __init__(self, values: np.ndarray, mask: np.ndarray, cities: pd.Index, first_month: int,
+                 categories: Sequence[str], row_city: Optional[np.ndarray] = None,
+                 row_month: Optional[np.ndarray] = None):
+        self.values = values
+        self.mask = mask
+        self.cities = cities
+        self.first_month = int(first_month)
+        self.categories = list(categories)
+        self._category_pos = {name: i for i, name in enumerate(self.categories)}
+        # Kaynak çerçevenin satır sırası (take için)
+        self.row_city = row_city
+        self.row_month = row_month
+
+    # ----------------- Kurulum -----------------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, categories: Optional[Iterable[str]] = None) -> "ConsumptionCube":
+        """
+        İşlenmiş uzun çerçeveden küp kur. Aynı (şehir, ay) için birden fazla satır
+        varsa ValueError (küp hücresi tek değer tutar).
+        """
+        if categories is None:
+            categories = [c for c in CONSUMPTION_CATEGORIES.values() if c in df.columns]
+        categories = list(categories)
+
+        cities = df[CITY_COL]
+        if not isinstance(cities.dtype, pd.CategoricalDtype):
+            cities = cities.astype("category")
+        city_codes = cities.cat.codes.to_numpy().astype(np.int64)
+        months = month_key(_to_datetime(df[[DATE_COL]])[DATE_COL]).to_numpy().astype(np.int64)
+        valid = (city_codes >= 0) & (months >= 0)
+        if not valid.all():
+            raise ValueError(f"{int((~valid).sum())} satırda şehir veya dönem eksik")
+
+        first_month = int(months.min()) if len(months) else 0
+        n_cities = len(cities.cat.categories)
+        n_months = int(months.max()) - first_month + 1 if len(months) else 0
+        row_month = months - first_month
+
+        flat = city_codes * max(n_months, 1) + row_month
+        if np.unique(flat).size != flat.size:
+            raise ValueError("Aynı şehir ve dönem için birden fazla satır var")
+
+        values = np.full((n_cities, n_months, len(categories)), np.nan)
+        if categories:
+            values[city_codes, row_month] = df[categories].to_numpy(dtype=np.float64)
+        mask = np.zeros((n_cities, n_months), dtype=bool)
+        mask[city_codes, row_month] = True
+        return cls(values, mask, pd.Index(cities.cat.categories), first_month, categories,
+                   row_city=city_codes, row_month=row_month)
+
+    # ----------------- Yardımcılar -----------------
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def month_codes(self) -> np.ndarray:
+        return np.arange(self.first_month, self.first_month + self.values.shape[1])
+
+    def category(self, name: str) -> np.ndarray:
+        """Tek kategorinin (şehir, ay) görünümü (kopya değil)"""
+        return self.values[:, :, self._category_pos[name]]
+
+    def _array(self, category: Optional[str]) -> np.ndarray:
+        return self.values if category is None else self.category(category)
+
+    def city_positions(self, names: Iterable[str]) -> np.ndarray:
+        """Şehir adlarının küp kodları (bilinmeyen -1)"""
+        return self.cities.get_indexer(list(names))
+
+    def is_contiguous(self) -> bool:
+        """Her şehrin satırları ilk ve son ayı arasında boşluksuz mu"""
+        present = self.mask.any(axis=1)
+        first = np.argmax(self.mask, axis=1)
+        last = self.mask.shape[1] - 1 - np.argmax(self.mask[:, ::-1], axis=1)
+        spans = np.where(present, last - first + 1, 0)
+        return bool((self.mask.sum(axis=1) == spans).all())
+
+    # ----------------- Zaman işlemleri -----------------
+    def lag(self, k: int, category: Optional[str] = None) -> np.ndarray:
+        """k ay önceki değer; ilk k ay NaN. Sonuç küple aynı şekilde"""
+        arr = self._array(category)
+        out = np.full(arr.shape, np.nan)
+        if k < arr.shape[1]:
+            out[:, k:] = self.lag_view(k, category)
+        return out
+
+    def lag_view(self, k: int, category: Optional[str] = None) -> np.ndarray:
+        """lag(k)'nın geçerli kısmı: out[:, k:] ile hizalı O(1) görünüm"""
+        arr = self._array(category)
+        return arr[:, : arr.shape[1] - k]
+
+    def rolling_mean(self, window: int, category: Optional[str] = None, min_periods: int = 1) -> np.ndarray:
+        """
+        Son window ayın ortalaması (mevcut ay dahil). NaN hücreler atlanır;
+        en az min_periods değer yoksa NaN (pandas rolling(window, min_periods)).
+        """
+        arr = self._array(category)
+        pad = [(0, 0)] * arr.ndim
+        pad[1] = (window - 1, 0)
+        windows = sliding_window_view(np.pad(arr, pad, constant_values=np.nan), window, axis=1)
+        counts = np.count_nonzero(~np.isnan(windows), axis=-1)
+        sums = np.nansum(windows, axis=-1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts >= max(min_periods, 1), sums / counts, np.nan)
+
+    def _by_calendar_month(self, arr: np.ndarray) -> np.ndarray:
+        """Ay eksenini (yıl, takvim ayı) olarak yeniden şekillendir: (şehir, yıl, 12, ...)"""
+        lead = self.first_month % 12
+        n_months = arr.shape[1]
+        trail = (-(lead + n_months)) % 12
+        pad = [(0, 0)] * arr.ndim
+        pad[1] = (lead, trail)
+        padded = np.pad(arr, pad, constant_values=np.nan)
+        return padded.reshape(arr.shape[0], -1, 12, *arr.shape[2:])
+
+    def seasonal_baseline(self, category: Optional[str] = None) -> np.ndarray:
+        """Şehir x takvim ayı ortalaması: (şehir, 12[, kategori]); [.., ay-1, ..] ile okunur"""
+        by_month = self._by_calendar_month(self._array(category))
+        counts = np.count_nonzero(~np.isnan(by_month), axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, np.nansum(by_month, axis=1) / counts, np.nan)
+
+    def city_mean(self, category: Optional[str] = None) -> np.ndarray:
+        """Şehir ortalaması: (şehir[, kategori])"""
+        arr = self._array(category)
+        counts = np.count_nonzero(~np.isnan(arr), axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, np.nansum(arr, axis=1) / counts, np.nan)
+
+    def expand_calendar(self, per_month: np.ndarray) -> np.ndarray:
+        """(şehir, 12, ...) takvim ayı değerlerini küpün ay eksenine yay"""
+        calendar = (self.month_codes % 12)
+        return per_month[:, calendar]
+
+    def overall_mean(self, category: Optional[str] = None) -> np.ndarray:
+        """Tüm hücrelerin ortalaması: skaler ya da (kategori,)"""
+        arr = self._array(category)
+        counts = np.count_nonzero(~np.isnan(arr), axis=(0, 1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, np.nansum(arr, axis=(0, 1)) / counts, np.nan)
+
+    def imputed(self) -> "ConsumptionCube":
+        """
+        veri_cek.impute_city_month ile aynı sıra: şehir x ay ortalaması,
+        sonra şehir ortalaması, sonra genel ortalama. Her adım öncekinin doldurduğu
+        değerleri de ortalamaya katar (groupby yolu gibi). Sadece satırı olan hücreler doldurulur.
+        """
+        values = self.values.copy()
+        holes = np.isnan(values) & self.mask[:, :, None]
+        stages = (lambda cube: cube.expand_calendar(cube.seasonal_baseline()),
+                  lambda cube: cube.city_mean()[:, None, :],
+                  lambda cube: cube.overall_mean())
+        for stage in stages:
+            if not holes.any():
+                break
+            current = ConsumptionCube(values, self.mask, self.cities, self.first_month, self.categories)
+            values = np.where(holes, np.broadcast_to(stage(current), values.shape), values)
+            holes = np.isnan(values) & self.mask[:, :, None]
+        return ConsumptionCube(values, self.mask, self.cities, self.first_month, self.categories,
+                               self.row_city, self.row_month)
+
+    # ----------------- Çerçeveye dönüş -----------------
+    def take(self, arr: np.ndarray) -> np.ndarray:
+        """(şehir, ay[, ...]) diziyi kaynak çerçevenin satır sırasına hizala"""
+        if self.row_city is None:
+            raise ValueError("Bu küp kaynak çerçeve sırasını tutmuyor; to_frame() kullanın")
+        return arr[self.row_city, self.row_month]
+
+    def to_frame(self, features: Optional[Dict[str, np.ndarray]] = None,
+                 dtype: Union[type, np.dtype] = np.float32) -> pd.DataFrame:
+        """
+        Satırı olan hücrelerden (şehir, dönem) sıralı uzun çerçeve:
+        Sehir (kategorik), Donem, kategori kolonları ve features'taki (şehir, ay) diziler
+        """
+        city_idx, month_idx = np.nonzero(self.mask)
+        frame = pd.DataFrame({
+            CITY_COL: pd.Categorical.from_codes(city_idx, categories=self.cities),
+            DATE_COL: _month_dates(self.first_month + month_idx).to_numpy(),
+        })
+        for j, name in enumerate(self.categories):
+            frame[name] = self.values[city_idx, month_idx, j].astype(dtype)
+        for name, arr in (features or {}).items():
+            frame[name] = np.asarray(arr)[city_idx, month_idx].astype(dtype)
+        return frame
+
+    def __repr__(self):
+        return (f"ConsumptionCube({len(self.cities)} şehir x {self.values.shape[1]} ay x "
+                f"{len(self.categories)} kategori, dolu %{100 * self.mask.mean() if self.mask.size else 0:.0f})")
@@ -0,0 +1,357 @@
+# -*- coding: utf-8 -*-
+"""
+data_source.py - Tak-çıkar veri kaynağı katmanı
+- Supabase (uzak), Parquet / CSV dizini ve SQLite dosyası aynı arayüzün arkasında
+- Kaynak DATA_SOURCE ortam değişkeniyle seçilir:
+      DATA_SOURCE=supabase                      (varsayılan)
+      DATA_SOURCE=parquet:data/cache
+      DATA_SOURCE=csv:data/cache
+      DATA_SOURCE=sqlite:data/elektraize.db
+- Kolon budama (columns) ve eşitlik filtresi (where) mümkünse kaynağa itilir
+
+Supabase tablolarını yerel bir kaynağa kopyalamak için:
+    python data_source.py --export parquet:data/cache
+"""
+
+import os
+import sqlite3
+import logging
+import argparse
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from metrics import FETCH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SUPABASE_PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", "1000"))
+SUPABASE_TIMEOUT_S = float(os.getenv("SUPABASE_TIMEOUT_S", "120"))
+# Sayfalama için sıralama anahtarı, tablo başına o tabloda bulunan kolonlardan seçilir:
+# birincil anahtar varsa o; yoksa SUPABASE_ORDER_COLUMNS'tan tabloda olanlar;
+# hiçbiri yoksa dönen tüm kolonlar
+SUPABASE_PRIMARY_KEY = os.getenv("SUPABASE_PRIMARY_KEY", "id")
+SUPABASE_ORDER_COLUMNS = [c.strip() for c in os.getenv("SUPABASE_ORDER_COLUMNS", "Sehir,Donem").split(",") if c.strip()]
+
+
+class DataSource(ABC):
+    """Tablo okuyan tüm kaynakların ortak arayüzü"""
+
+    kind = "base"
+
+    @abstractmethod
+    def fetch_table(self, table_name: str, columns: Optional[Sequence[str]] = None,
+                    where: Optional[Dict[str, object]] = None) -> pd.DataFrame:
+        """Tek bir tabloyu oku. Tablo yoksa / okunamazsa boş DataFrame döner."""
+
+    def write_table(self, table_name: str, df: pd.DataFrame):
+        raise NotImplementedError(f"{self.kind} kaynağı yazmayı desteklemiyor")
+
+    def fetch_tables(self, tables: Dict[str, str]) -> Dict[str, pd.DataFrame]:
+        """{takma_ad: tablo_adı} sözlüğündeki tüm tabloları oku"""
+        dfs = {}
+        for nick, table in tables.items():
+            try:
+                with FETCH_SECONDS.time(source=self.kind, table=table):
+                    df = self.fetch_table(table)
+                logger.info(f"[OK] {self.kind}:{table} -> {df.shape}")
+            except Exception as e:
+                logger.warning(f"[WARN] {self.kind}:{table} çekilemedi: {e}")
+                df = pd.DataFrame()
+            dfs[nick] = df
+        return dfs
+
+    def __repr__(self):
+        return f"<{type(self).__name__}>"
+
+
+def _apply_where(df: pd.DataFrame, where: Optional[Dict[str, object]]) -> pd.DataFrame:
+    if not where or df.empty:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for col, value in where.items():
+        mask &= df[col] == value
+    return df[mask].reset_index(drop=True)
+
+
+# ===================== SUPABASE =====================
+class SupabaseManager:
+    """Supabase bağlantı yöneticisi (uygulamadaki tek Supabase istemcisi; supabase_init de bunu kullanır)"""
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        """Bağlantıyı başlat"""
+        from supabase import create_client
+        from supabase.lib.client_options import SyncClientOptions
+        from http_client import client_for
+
+        env_path = Path(__file__).resolve().parent / ".env"
+        load_dotenv(dotenv_path=env_path)
+
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+
+        if not url or not key:
+            raise EnvironmentError("SUPABASE_URL veya SUPABASE_KEY eksik.")
+
+        # PostgREST çağrıları paylaşılan keep-alive / HTTP/2 havuzundan geçer
+        options = SyncClientOptions(httpx_client=client_for(url, read_timeout=SUPABASE_TIMEOUT_S))
+        self.client = create_client(url, key, options=options)
+        logger.info("Supabase bağlantısı başarılı.")
+
+
+    def fetch_table(self, table_name: str) -> pd.DataFrame:
+        """Tek bir tablo çek"""
+        try:
+            return SupabaseSource().fetch_table(table_name)
+        except Exception as e:
+            logger.error(f"{table_name} çekilemedi: {e}")
+            return pd.DataFrame()
+
+
+class SupabaseSource(DataSource):
+    """Supabase REST üzerinden okuma (sayfalı; varsayılan 1000 satır sınırına takılmaz)
+
+    Tek sayfaya sığmayan tablolar .range() ile sayfalanırken sabit bir sıralamayla
+    okunur; sırasız sorguda Postgres sayfalar arasında satır tekrarlayıp atlayabilir.
+    Sıralama kolonları tablonun gerçekten sahip olduğu kolonlardan seçilir
+    (Sehir'i olmayan tabloya .order("Sehir") gönderilmez); table_order ile tablo
+    başına açıkça verilebilir.
+    """
+
+    kind = "supabase"
+
+    def __init__(self, page_size: int = SUPABASE_PAGE_SIZE,
+                 order_by: Sequence[str] = tuple(SUPABASE_ORDER_COLUMNS),
+                 primary_key: Optional[str] = SUPABASE_PRIMARY_KEY,
+                 table_order: Optional[Dict[str, Sequence[str]]] = None):
+        self.page_size = page_size
+        self.order_by = list(order_by)
+        self.primary_key = primary_key
+        self.table_order = {name: list(cols) for name, cols in (table_order or {}).items()}
+
+    def order_columns(self, table_name: str, available: Iterable[str]) -> List[str]:
+        """Tablonun (ilk sayfada dönen) kolonlarına göre sıralama anahtarı"""
+        if table_name in self.table_order:
+            return self.table_order[table_name]
+        available = list(available)
+        if self.primary_key and self.primary_key in available:
+            return [self.primary_key]
+        present = [c for c in self.order_by if c in available]
+        return present or available
+
+    def fetch_table(self, table_name, columns=None, where=None):
+        client = SupabaseManager().client
+        select = ",".join(columns) if columns else "*"
+
+        def page(start: int, order: Sequence[str]) -> List[dict]:
+            query = client.table(table_name).select(select)
+            for col, value in (where or {}).items():
+                query = query.eq(col, value)
+            for col in order:
+                query = query.order(col)
+            return query.range(start, start + self.page_size - 1).execute().data or []
+
+        # İlk sayfa tek sorgudur (tutarlı); tabloya sığıyorsa sıralamaya gerek yok,
+        # sığmıyorsa dönen kolonlardan anahtar seçilip baştan sıralı sayfalanır
+        explicit = self.table_order.get(table_name, [])
+        first = page(0, explicit)
+        if len(first) < self.page_size:
+            return pd.DataFrame(first) if first else pd.DataFrame()
+        order = self.order_columns(table_name, first[0].keys())
+        logger.debug(f"[SUPABASE] {table_name} sayfalama sırası: {order}")
+
+        # Açık sıralamayla alınan ilk sayfa geçerlidir; aksi halde baştan okunur
+        rows, start = (list(first), self.page_size) if order == explicit else ([], 0)
+        while True:
+            chunk = page(start, order)
+            rows.extend(chunk)
+            if len(chunk) < self.page_size:
+                break
+            start += self.page_size
+        return pd.DataFrame(rows) if rows else pd.DataFrame()
+
+
+# ===================== YEREL KAYNAKLAR =====================
+class _DirectorySource(DataSource):
+    """Her tablonun <dizin>/<tablo>.<uzantı> dosyası olduğu kaynaklar"""
+
+    suffix = ""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def path(self, table_name: str) -> Path:
+        return self.root / f"{table_name}{self.suffix}"
+
+    def fetch_table(self, table_name, columns=None, where=None):
+        path = self.path(table_name)
+        if not path.exists():
+            logger.warning(f"[WARN] {path} bulunamadı")
+            return pd.DataFrame()
+        return self._read(path, columns, where)
+
+    def _read(self, path, columns, where) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.root}>"
+
+
+class ParquetSource(_DirectorySource):
+    """Yerel Parquet dizini (pyarrow gerekir); kolon ve filtre okuma sırasında uygulanır"""
+
+    kind = "parquet"
+    suffix = ".parquet"
+
+    def _read(self, path, columns, where):
+        filters = [(col, "==", value) for col, value in where.items()] if where else None
+        return pd.read_parquet(path, columns=list(columns) if columns else None, filters=filters)
+
+    def write_table(self, table_name, df):
+        self.root.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(self.path(table_name), index=False)
+
+
+class CsvSource(_DirectorySource):
+    """Yerel CSV dizini"""
+
+    kind = "csv"
+    suffix = ".csv"
+
+    def _read(self, path, columns, where):
+        df = pd.read_csv(path, usecols=list(columns) if columns else None)
+        return _apply_where(df, where)
+
+    def write_table(self, table_name, df):
+        self.root.mkdir(parents=True, exist_ok=True)
+        df.to_csv(self.path(table_name), index=False)
+
+
+class SqliteSource(DataSource):
+    """Tek bir SQLite dosyası; her tablo aynı adlı SQL tablosu"""
+
+    kind = "sqlite"
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def fetch_table(self, table_name, columns=None, where=None):
+        if not self.path.exists():
+            logger.warning(f"[WARN] {self.path} bulunamadı")
+            return pd.DataFrame()
+        select = ", ".join(f'"{c}"' for c in columns) if columns else "*"
+        sql = f'SELECT {select} FROM "{table_name}"'
+        params = []
+        if where:
+            sql += " WHERE " + " AND ".join(f'"{col}" = ?' for col in where)
+            params = list(where.values())
+        with self._connect() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,)
+            ).fetchone()
+            if not exists:
+                return pd.DataFrame()
+            return pd.read_sql_query(sql, conn, params=params)
+
+    def write_table(self, table_name, df):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            df.to_sql(table_name, conn, if_exists="replace", index=False)
+
+    def __repr__(self):
+        return f"<SqliteSource {self.path}>"
+
+
+class MemorySource(DataSource):
+    """Bellekteki tablolar (benchmark ve çevrimdışı denemeler için); her okuma kopya döner"""
+
+    kind = "memory"
+
+    def __init__(self, tables: Dict[str, pd.DataFrame]):
+        self.tables = tables
+
+    def fetch_table(self, table_name, columns=None, where=None):
+        df = self.tables.get(table_name)
+        if df is None:
+            return pd.DataFrame()
+        df = df[list(columns)] if columns else df.copy()
+        return _apply_where(df, where)
+
+    def write_table(self, table_name, df):
+        self.tables[table_name] = df.copy()
+
+
+# ===================== SEÇİM =====================
+_SOURCES = {
+    "supabase": lambda arg: SupabaseSource(),
+    "parquet": ParquetSource,
+    "csv": CsvSource,
+    "sqlite": SqliteSource,
+}
+
+_default: Optional[DataSource] = None
+
+
+def create_data_source(spec: str) -> DataSource:
+    """'tür' veya 'tür:yol' biçimindeki tanımdan kaynak oluştur"""
+    kind, _, arg = spec.strip().partition(":")
+    kind = kind.lower()
+    if kind not in _SOURCES:
+        raise ValueError(f"Bilinmeyen veri kaynağı '{kind}'. Seçenekler: {sorted(_SOURCES)}")
+    if kind != "supabase" and not arg:
+        raise ValueError(f"'{kind}' kaynağı için yol gerekli (ör. {kind}:data/cache)")
+    return _SOURCES[kind](arg)
+
+
+def get_data_source() -> DataSource:
+    """Süreç genelindeki varsayılan kaynak (DATA_SOURCE ortam değişkeni)"""
+    global _default
+    if _default is None:
+        load_dotenv(dotenv_path=Path(__file__).resolve().parent / ".env")
+        _default = create_data_source(os.getenv("DATA_SOURCE", "supabase"))
+        logger.info(f"Veri kaynağı: {_default!r}")
+    return _default
+
+
+def set_data_source(source: Optional[DataSource]):
+    """Varsayılan kaynağı değiştir (None: bir sonraki çağrıda yeniden yapılandır)"""
+    global _default
+    _default = source
+
+
+def export_tables(tables: Iterable[str], target: DataSource, source: Optional[DataSource] = None):
+    """Tabloları (varsayılan: Supabase) yerel hedef kaynağa kopyala"""
+    source = source or SupabaseSource()
+    for table in tables:
+        df = source.fetch_table(table)
+        target.write_table(table, df)
+        logger.info(f"[EXPORT] {table} -> {target!r} {df.shape}")
+
+
+# ===================== CLI =====================
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--export", required=True, help="Hedef kaynak, ör. parquet:data/cache veya sqlite:data/elektraize.db")
+    ap.add_argument("--tables", help="Virgülle ayrılmış tablo adları (default: veri_cek.TABLES)")
+    args = ap.parse_args()
+
+    if args.tables:
+        names = args.tables.split(",")
+    else:
+        from veri_cek import TABLES
+        names = list(TABLES.values())
+    export_tables(names, create_data_source(args.export))
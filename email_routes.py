@@ -1,24 +1,20 @@
 # firebase_routes.py (veya mevcut routes dosyan)
-import os, requests
+import os
 from fastapi import APIRouter, HTTPException
 
+from email_service import UpstreamError, request_verification
+
 router = APIRouter()
 API_KEY = os.getenv("FIREBASE_WEB_API_KEY")  # .env'de bu isimle dursun
 
 @router.post("/send-verification")
-def send_verification(id_token: str):
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:sendOobCode?key={API_KEY}"
-    payload = {"requestType": "VERIFY_EMAIL", "idToken": id_token}
-    r = requests.post(url, json=payload, timeout=10)
-
-    # Hataları gizleme! Google’ın mesajını aynen döndürelim:
-    if not r.ok:
-        try:
-            msg = r.json().get("error", {}).get("message", "UNKNOWN_ERROR")
-        except Exception:
-            msg = r.text
-        raise HTTPException(status_code=400, detail=msg)
+async def send_verification(id_token: str):
+    # Async yol: eşzamanlılık sınırı, devre kesici ve kullanıcı (doğrulanmış uid) başına tekilleştirme email_service'te
+    try:
+        data, duplicate = await request_verification(id_token, api_key=API_KEY)
+    except UpstreamError as e:
+        # Hataları gizleme! Google’ın mesajını aynen döndürelim:
+        raise HTTPException(status_code=400, detail=e.message)
 
     # Başarı
-    data = r.json()  # {"email": "..."} döner
-    return {"status": "ok", "email": data.get("email")}
+    return {"status": "ok", "email": data.get("email"), "deduplicated": duplicate}
@@ -1,34 +1,239 @@
 import os
-import requests
+import time
+import asyncio
+import logging
+from typing import Dict, Optional, Tuple
+
+import httpx
 from fastapi import HTTPException
 from dotenv import load_dotenv
+from firebase_admin import auth
+from firebase_admin.exceptions import FirebaseError
+
+from http_client import async_client_for
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 FIREBASE_API_KEY = os.getenv("FIREBASE_API_KEY")
+# Testlerde yerel sahte sunucuya yönlendirilir (identity_stub.py)
+IDENTITY_TOOLKIT_URL = os.getenv("IDENTITY_TOOLKIT_URL", "https://identitytoolkit.googleapis.com").rstrip("/")
 
-def send_verification_email(id_token: str):
-    if not FIREBASE_API_KEY:
-        raise HTTPException(status_code=500, detail="Firebase API key not configured")
-    
-    url = f"https://identitytoolkit.googleapis.com/v1/accounts:sendOobCode?key={FIREBASE_API_KEY}"
-    payload = {
-        "requestType": "VERIFY_EMAIL",
-        "idToken": id_token
-    }
-    
+# Doğrulama e-postası yolu API'nin geri kalanından yalıtılır:
+# - aynı anda en fazla EMAIL_MAX_CONCURRENCY upstream çağrısı, sırada en fazla EMAIL_QUEUE_TIMEOUT_S beklenir
+# - art arda EMAIL_BREAKER_FAILURES upstream hatasında devre EMAIL_BREAKER_RESET_S boyunca açılır (hızlı 503)
+# - token sunucuda doğrulanır; aynı kullanıcının (uid) eşzamanlı istekleri tek çağrıya bağlanır,
+#   başarılı gönderim EMAIL_DEDUP_WINDOW_S boyunca tekrarlanmaz (token yenilense de)
+EMAIL_MAX_CONCURRENCY = int(os.getenv("EMAIL_MAX_CONCURRENCY", "4"))
+EMAIL_QUEUE_TIMEOUT_S = float(os.getenv("EMAIL_QUEUE_TIMEOUT_S", "2"))
+EMAIL_UPSTREAM_TIMEOUT_S = float(os.getenv("EMAIL_UPSTREAM_TIMEOUT_S", "10"))
+EMAIL_BREAKER_FAILURES = int(os.getenv("EMAIL_BREAKER_FAILURES", "5"))
+EMAIL_BREAKER_RESET_S = float(os.getenv("EMAIL_BREAKER_RESET_S", "30"))
+EMAIL_DEDUP_WINDOW_S = float(os.getenv("EMAIL_DEDUP_WINDOW_S", "60"))
+
+
+class UpstreamError(Exception):
+    """Identity Toolkit isteği reddetti (4xx); devre kesiciyi tetiklemez"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class CircuitBreaker:
+    """closed -> (art arda hata) open -> (bekleme sonrası) half_open -> tek deneme"""
+
+    def __init__(self, failure_threshold: int = EMAIL_BREAKER_FAILURES, reset_after_s: float = EMAIL_BREAKER_RESET_S):
+        self.failure_threshold = failure_threshold
+        self.reset_after_s = reset_after_s
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_after_s else "open"
+
+    def retry_after(self) -> int:
+        if self.opened_at is None:
+            return 0
+        return max(1, int(self.reset_after_s - (time.monotonic() - self.opened_at) + 0.999))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def cancel_probe(self):
+        """İzin verilen deneme sonuçlanmadan bittiyse (sıra zaman aşımı, iptal)"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"[EMAIL] {self.failures} ardışık upstream hatası, devre {self.reset_after_s:.0f} s açık")
+            self.opened_at = time.monotonic()
+
+
+_semaphore: Optional[asyncio.Semaphore] = None
+breaker = CircuitBreaker()
+_in_flight: Dict[str, asyncio.Future] = {}
+_recent: Dict[str, Tuple[float, dict]] = {}
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # Olay döngüsü içinde oluşturulur (import anında döngü olmayabilir)
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(EMAIL_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def _dedup_key(id_token: str) -> str:
+    """
+    Sunucuda doğrulanmış uid (imza, süre, proje kontrolü firebase_admin'de).
+    Doğrulanmamış JWT gövdesindeki uid kullanılmaz: sahte bir token başka kullanıcının
+    önbellekteki yanıtını alabilirdi. Token yenilense de aynı kullanıcı aynı anahtarı alır.
+    """
     try:
-        response = requests.post(url, json=payload, timeout=30)
-        if response.status_code == 200:
-            return {"message": "Verification email sent successfully"}
-        else:
-            error_data = response.json()
-            print(f"Firebase error: {error_data}")
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Failed to send verification email: {error_data.get('error', {}).get('message', 'Unknown error')}"
-            )
-    except requests.exceptions.Timeout:
+        # verify_id_token senkron (sertifikalar gerekince HTTP ile çekilir); döngüyü bloklamasın
+        decoded = await asyncio.to_thread(auth.verify_id_token, id_token)
+    except auth.CertificateFetchError as e:
+        logger.warning(f"[EMAIL] Token doğrulama sertifikaları alınamadı: {e}")
+        raise HTTPException(status_code=503, detail="Token verification unavailable", headers={"Retry-After": "5"})
+    except (ValueError, FirebaseError) as e:
+        raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
+    return "uid:" + decoded["uid"]
+
+
+async def _post_send_oob(id_token: str, api_key: str) -> dict:
+    """Tek upstream çağrısı: semafor + devre kesici altında"""
+    # half_open'da izin verilen tek deneme bu çağrıysa, iptal / beklenmeyen çıkışta
+    # serbest bırakılmalı; yoksa devre yeniden başlatmaya kadar kapalı kalır
+    probe = breaker.state == "half_open"
+    if not breaker.allow():
+        raise HTTPException(
+            status_code=503,
+            detail="Email service temporarily unavailable",
+            headers={"Retry-After": str(breaker.retry_after())},
+        )
+    try:
+        return await _guarded_post(id_token, api_key)
+    finally:
+        if probe:
+            # record_success / record_failure bayrağı zaten indirmiştir; burada yalnızca
+            # sonucu kaydedilmeden çıkan (CancelledError, sıra zaman aşımı) deneme kapanır
+            breaker.cancel_probe()
+
+
+async def _guarded_post(id_token: str, api_key: str) -> dict:
+    try:
+        await asyncio.wait_for(_get_semaphore().acquire(), timeout=EMAIL_QUEUE_TIMEOUT_S)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Too many pending verification requests", headers={"Retry-After": "1"})
+
+    url = f"{IDENTITY_TOOLKIT_URL}/v1/accounts:sendOobCode"
+    try:
+        # httpx zaman aşımı işlem başınadır; wait_for toplam süreyi de sınırlar
+        response = await asyncio.wait_for(
+            async_client_for(url).post(
+                url,
+                params={"key": api_key},
+                json={"requestType": "VERIFY_EMAIL", "idToken": id_token},
+                timeout=EMAIL_UPSTREAM_TIMEOUT_S,
+            ),
+            timeout=EMAIL_UPSTREAM_TIMEOUT_S,
+        )
+    except (httpx.TimeoutException, asyncio.TimeoutError):
+        breaker.record_failure()
         raise HTTPException(status_code=408, detail="Request timeout")
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Network error: {str(e)}")
\ No newline at end of file
+    except httpx.HTTPError as e:
+        breaker.record_failure()
+        raise HTTPException(status_code=500, detail=f"Network error: {str(e)}")
+    finally:
+        _get_semaphore().release()
+
+    if response.status_code >= 500:
+        breaker.record_failure()
+        raise HTTPException(status_code=502, detail=f"Identity service error ({response.status_code})")
+    breaker.record_success()
+    if not response.is_success:
+        try:
+            message = response.json().get("error", {}).get("message", "UNKNOWN_ERROR")
+        except ValueError:
+            message = response.text
+        logger.warning(f"[EMAIL] Firebase error: {message}")
+        raise UpstreamError(message, response.status_code)
+    return response.json()
+
+
+async def request_verification(id_token: str, api_key: Optional[str] = None) -> Tuple[dict, bool]:
+    """
+    Doğrulama e-postası iste; (upstream yanıtı, tekrar_mı) döndürür.
+    Token önce doğrulanır (geçersizse 401, upstream'e gidilmez). Aynı kullanıcının
+    devam eden isteği varsa onun sonucu beklenir, pencere içindeki başarılı gönderim
+    tekrarlanmaz. Önbellekteki yanıt yalnızca aynı uid'e doğrulanan çağırana döner.
+    """
+    api_key = api_key or FIREBASE_API_KEY
+    if not api_key:
+        raise HTTPException(status_code=500, detail="Firebase API key not configured")
+
+    key = await _dedup_key(id_token)
+    now = time.monotonic()
+    recent = _recent.get(key)
+    if recent is not None and now - recent[0] < EMAIL_DEDUP_WINDOW_S:
+        return recent[1], True
+
+    pending = _in_flight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending), True
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[key] = future
+    try:
+        data = await _post_send_oob(id_token, api_key)
+        _recent[key] = (time.monotonic(), data)
+        _prune_recent()
+        future.set_result(data)
+        return data, False
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()   # bekleyen yoksa "never retrieved" uyarısı çıkmasın
+        raise
+    finally:
+        _in_flight.pop(key, None)
+
+
+def _prune_recent():
+    cutoff = time.monotonic() - EMAIL_DEDUP_WINDOW_S
+    for key in [k for k, (ts, _) in _recent.items() if ts < cutoff]:
+        _recent.pop(key, None)
+
+
+async def send_verification_email(id_token: str):
+    """Olay döngüsünü bloklamadan doğrulama e-postası gönder"""
+    try:
+        data, duplicate = await request_verification(id_token)
+    except UpstreamError as e:
+        raise HTTPException(status_code=400, detail=f"Failed to send verification email: {e.message}")
+    if duplicate:
+        return {"message": "Verification email already sent", "deduplicated": True}
+    return {"message": "Verification email sent successfully"}
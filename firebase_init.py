@@ -2,15 +2,24 @@ import os
 import firebase_admin
 from firebase_admin import credentials, firestore
 
-# Firebase config dosyasının yolu
-CRED_PATH = r"C:\Users\Sena Ceylan\OneDrive\Desktop\ElektrAize\firebase_config.json"
+# Firebase config dosyasının yolu (FIREBASE_CREDENTIALS ile değiştirilebilir)
+CRED_PATH = os.getenv("FIREBASE_CREDENTIALS", r"C:\Users\Sena Ceylan\OneDrive\Desktop\ElektrAize\firebase_config.json")
+
+_db = None
 
 def initialize_firebase():
+    """Firebase uygulamasını bir kez başlat ve Firestore istemcisini döndür"""
+    global _db
     if not firebase_admin._apps:
         # firebase_config.json dosyasını doğrudan kullan
         cred = credentials.Certificate(CRED_PATH)
         firebase_admin.initialize_app(cred)
-    return firestore.client()
+    if _db is None:
+        _db = firestore.client()
+    return _db
 
-# Firestore client başlat
-db = initialize_firebase()
+def __getattr__(name):
+    # Firestore client ilk erişimde başlar (gateway lifespan'ı bunu açıkça yapar)
+    if name == "db":
+        return initialize_firebase()
+    raise AttributeError(name)
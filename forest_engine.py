@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+forest_engine.py - RandomForest modelleri için düzleştirilmiş dizi tabanlı çıkarım
+- Eğitilmiş ağaçlar tek bir düğüm dizisine açılır: feature, threshold (float32),
+  çocuk indeksi (kardeşler yan yana) ve yaprak değerleri
+- Tahmin, tüm ağaçlar ve satır partisi için aynı anda vektörel yürütülür
+- Derlenmiş model tek bir dosyaya yazılır ve np.memmap ile kopyasız açılır
+
+Eşik değerleri float32'ye "aşağı" yuvarlanır: sklearn X'i float32'ye çevirip
+float64 eşikle karşılaştırdığı için (x <= t) ile (x <= büyük_float32_<=_t)
+her float32 x için aynı sonucu verir; dallanma sklearn ile birebir aynıdır.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"EAFOREST1\n"
+_ALIGN = 64
+_BATCH_ROWS = 4096
+
+# Dosyadaki dizi sırası ve tipleri
+_ARRAYS = {
+    "feature": np.int32,
+    "threshold": np.float32,
+    "child": np.int32,
+    "value": np.float64,
+    "missing_left": np.bool_,
+    "roots": np.int32,
+}
+
+
+def _float32_floor(threshold: np.ndarray) -> np.ndarray:
+    """Her float64 eşik için ona eşit ya da ondan küçük en büyük float32"""
+    thr = threshold.astype(np.float32)
+    up = thr.astype(np.float64) > threshold
+    thr[up] = np.nextafter(thr[up], np.float32(-np.inf))
+    return thr
+
+
+def _sibling_order(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Düğümleri genişlik öncelikli sırala; her iç düğümün sağ çocuğu = sol çocuk + 1"""
+    order = [0]
+    for node in order:
+        if left[node] >= 0:
+            order.append(left[node])
+            order.append(right[node])
+    return np.asarray(order, dtype=np.int64)
+
+
+class CompiledForest:
+    """
+    Düzleştirilmiş orman. Kardeş düğümler yan yanadır (sağ = sol + 1), böylece
+    her adımda tek bir "child" dizisi okunur: child + (sağa_git). Yaprakların
+    child'ı kendisidir ve eşiği +inf'tir; satır max_depth adımda dallanmasız
+    olarak yaprağa ulaşır ve orada kalır.
+    """
+
+    def __init__(self, feature, threshold, child, value, missing_left, roots,
+                 max_depth: int, feature_names: Optional[List[str]] = None):
+        self.feature = feature
+        self.threshold = threshold
+        self.child = child
+        self.value = value
+        self.missing_left = missing_left
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.n_features_in_ = (
+            len(self.feature_names) if self.feature_names is not None else int(feature.max(initial=-1)) + 1
+        )
+
+    # ----------------- Derleme -----------------
+    @classmethod
+    def from_sklearn(cls, model, feature_names: Optional[Sequence[str]] = None) -> "CompiledForest":
+        """Eğitilmiş RandomForestRegressor / ExtraTreesRegressor / DecisionTreeRegressor'ı derle"""
+        estimators = getattr(model, "estimators_", None) or [model]
+        trees = [est.tree_ for est in estimators]
+        if any(t.n_outputs != 1 for t in trees):
+            raise ValueError("Sadece tek çıktılı regresyon ağaçları derlenebilir")
+
+        feature, threshold, child, value, missing_left, roots = [], [], [], [], [], []
+        offset = 0
+        for t in trees:
+            order = _sibling_order(t.children_left, t.children_right)
+            new_id = np.empty(t.node_count, dtype=np.int64)
+            new_id[order] = np.arange(t.node_count) + offset
+            leaf = t.children_left[order] < 0
+            ml = getattr(t, "missing_go_to_left", None)
+            ml = np.zeros(t.node_count, dtype=bool) if ml is None else ml[order].astype(bool)
+
+            feature.append(np.where(leaf, 0, t.feature[order]))
+            threshold.append(np.where(leaf, np.float32(np.inf), _float32_floor(t.threshold[order])))
+            child.append(np.where(leaf, new_id[order], new_id[np.maximum(t.children_left[order], 0)]))
+            value.append(t.value[order, 0, 0])
+            missing_left.append(ml | leaf)
+            roots.append(offset)
+            offset += t.node_count
+
+        if feature_names is None and hasattr(model, "feature_names_in_"):
+            feature_names = list(model.feature_names_in_)
+        return cls(
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold).astype(np.float32),
+            child=np.concatenate(child).astype(np.int32),
+            value=np.concatenate(value).astype(np.float64),
+            missing_left=np.concatenate(missing_left),
+            roots=np.asarray(roots, dtype=np.int32),
+            max_depth=max(t.max_depth for t in trees),
+            feature_names=feature_names,
+        )
+
+    # ----------------- Çıkarım -----------------
+    def _as_matrix(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            # Kolonlar zaten doğru sıradaysa seçim yapma (mmap'li matris kopyalanmaz)
+            if self.feature_names is not None and list(X.columns) != self.feature_names:
+                X = X[self.feature_names]
+            X = X.to_numpy(dtype=np.float32)
+        return np.asarray(X, dtype=np.float32)
+
+    def predict(self, X) -> np.ndarray:
+        """Ağaç ortalaması; sklearn predict ile aynı (toplama sırası farkı ~1e-12)"""
+        X = self._as_matrix(X)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X {self.n_features_in_} özellik içermeli, gelen: {X.shape}")
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), _BATCH_ROWS):
+            out[start:start + _BATCH_ROWS] = self._predict_batch(X[start:start + _BATCH_ROWS])
+        return out
+
+    def _predict_batch(self, X: np.ndarray) -> np.ndarray:
+        n = len(X)
+        if n == 0:
+            return np.empty(0)
+        flat = X.ravel()
+        row_base = (np.arange(n, dtype=np.int64) * X.shape[1])[None, :]
+        nodes = np.repeat(self.roots[:, None], n, axis=1)       # (ağaç, satır)
+        has_missing = bool(np.isnan(flat).any())
+        for _ in range(self.max_depth):
+            x = flat[row_base + self.feature[nodes]]
+            go_right = x > self.threshold[nodes]
+            if has_missing:
+                go_right |= np.isnan(x) & ~self.missing_left[nodes]
+            nodes = self.child[nodes] + go_right
+        return self.value[nodes].mean(axis=0)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in _ARRAYS)
+
+    # ----------------- Saklama -----------------
+    def save(self, path) -> Path:
+        """Tek dosya: sihirli satır + JSON başlık + 64 bayt hizalı ham diziler"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {name: np.ascontiguousarray(getattr(self, name), dtype=dt) for name, dt in _ARRAYS.items()}
+
+        layout, offset = {}, 0
+        for name, arr in arrays.items():
+            layout[name] = {"offset": offset, "count": int(arr.size)}
+            offset += -(-arr.nbytes // _ALIGN) * _ALIGN
+        header = json.dumps({
+            "max_depth": self.max_depth,
+            "feature_names": self.feature_names,
+            "arrays": layout,
+        }).encode("utf-8")
+        data_start = -(-(len(_MAGIC) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            for name, arr in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(arr.tobytes())
+        tmp.replace(path)
+        logger.info(f"[FOREST] {len(self.roots)} ağaç, {len(self.feature)} düğüm -> {path} ({self.nbytes / 1024:.0f} KB)")
+        return path
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> "CompiledForest":
+        """mmap=True: diziler salt-okunur np.memmap (sayfa önbelleği işçiler arasında paylaşılır)"""
+        path = Path(path)
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} derlenmiş orman dosyası değil")
+            header_len = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        data_start = -(-(len(_MAGIC) + 8 + header_len) // _ALIGN) * _ALIGN
+
+        arrays = {}
+        raw = None if mmap else path.read_bytes()
+        for name, dt in _ARRAYS.items():
+            spec = header["arrays"][name]
+            start = data_start + spec["offset"]
+            if mmap:
+                arrays[name] = (np.memmap(path, dtype=dt, mode="r", offset=start, shape=(spec["count"],))
+                                if spec["count"] else np.empty(0, dtype=dt))
+            else:
+                arrays[name] = np.frombuffer(raw, dtype=dt, count=spec["count"], offset=start).copy()
+        return cls(max_depth=header["max_depth"], feature_names=header["feature_names"], **arrays)
+
+    def __repr__(self):
+        return f"<CompiledForest trees={len(self.roots)} nodes={len(self.feature)} depth={self.max_depth}>"
+
+
+def compile_forest(model, feature_names: Optional[Sequence[str]] = None) -> Optional[CompiledForest]:
+    """Model sklearn ağaç topluluğuysa derle, değilse None (ör. XGBoost)"""
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None and not hasattr(model, "tree_"):
+        return None
+    if estimators is not None and not all(hasattr(est, "tree_") for est in estimators):
+        return None
+    return CompiledForest.from_sklearn(model, feature_names)
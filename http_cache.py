@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+http_cache.py - Koşullu HTTP önbellekleme ve yanıt sıkıştırma
+- version_validators: ETag / Last-Modified yayındaki model setinin sürümünden
+  (veri + model) ve isteğin path + sorgu parametrelerinden türetilir. Eşleşen
+  If-None-Match (veya If-Modified-Since) handler çalışmadan 304 döndürür;
+  auth dependency'sinden sonra eklendiği için yetkisiz istek 304 alamaz.
+- CompressionMiddleware: Accept-Encoding'e göre brotli (kuruluysa) veya gzip,
+  HTTP_COMPRESS_MIN_BYTES altındaki ve zaten kodlanmış yanıtlar sıkıştırılmaz
+Gateway (main.py) ve mount edilen alt uygulama aynı middleware'i kullanır;
+iç içe durumda yanıt bir kez sıkıştırılır (Content-Encoding varsa geçilir).
+"""
+
+import os
+import gzip
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Set, Tuple
+
+from fastapi import HTTPException, Request, Response
+
+try:
+    import brotli    # opsiyonel bağımlılık
+except ImportError:
+    brotli = None
+
+HTTP_COMPRESS_MIN_BYTES = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))
+HTTP_GZIP_LEVEL = int(os.getenv("HTTP_GZIP_LEVEL", "6"))
+HTTP_BROTLI_QUALITY = int(os.getenv("HTTP_BROTLI_QUALITY", "4"))
+_COMPRESSIBLE = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+# ----------------- Doğrulayıcılar -----------------
+def _http_date(value: str) -> Optional[str]:
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match karşılaştırması zayıftır (W/ öneki yok sayılır)"""
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any(t.strip().removeprefix("W/") == bare for t in header.split(","))
+
+
+def request_validators(request: Request) -> Optional[Tuple[str, Optional[str], bool]]:
+    """(ETag, Last-Modified, set_tamamlandı_mı) - yayında set yoksa None"""
+    from model_registry import peek_model_set
+
+    ms = peek_model_set()
+    if ms is None:
+        return None
+    # Tembel yüklemede /categories gibi yanıtlar kategori durumuyla değişir
+    states = "".join(state[0] for _, state in sorted(ms.states.items()))
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}|{states}".encode("utf-8")).hexdigest()[:12]
+    settled = all(state in ("ready", "failed") for state in ms.states.values())
+    return f'W/"{ms.version}-{digest}"', _http_date(ms.created_at), settled
+
+
+def version_validators(request: Request, response: Response):
+    """
+    Route dependency: doğrulayıcıları yanıta ekle, istemcinin kopyası güncelse 304.
+    Handler'ın kendi döndürdüğü Response nesnelerine (ör. JSONResponse) başlık eklenmez.
+    """
+    validators = request_validators(request)
+    if validators is None:
+        return
+    etag, last_modified, settled = validators
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        not_modified = settled and last_modified is not None and _not_modified_since(
+            request.headers.get("if-modified-since"), last_modified
+        )
+    if not_modified:
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+
+def _not_modified_since(header: Optional[str], last_modified: str) -> bool:
+    if not header:
+        return False
+    try:
+        return parsedate_to_datetime(header) >= parsedate_to_datetime(last_modified)
+    except (TypeError, ValueError):
+        return False
+
+
+# ----------------- Sıkıştırma -----------------
+def accepted_encodings(accept_encoding: Optional[str]) -> Set[str]:
+    """Accept-Encoding'de kabul edilen kodlamalar (q=0 ile reddedilenler atlanır,
+    q dışındaki parametreler yok sayılır)"""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, *params = part.split(";")
+        q = 1.0
+        try:
+            for param in params:
+                key, _, value = param.partition("=")
+                if key.strip().lower() == "q":
+                    q = float(value.strip())
+        except ValueError:
+            continue
+        if q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Accept-Encoding'den kullanılacak kodlama"""
+    accepted = accepted_encodings(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    return "gzip" if "gzip" in accepted else None
+
+
+class CompressionMiddleware:
+    """
+    Saf ASGI middleware (BaseHTTPMiddleware değil): yanıt gövdesi tamponlanır,
+    eşik üzerindeyse tek seferde sıkıştırılır. API yanıtları sonlu JSON
+    olduğundan akış yanıtları da tamponlanır.
+    """
+
+    def __init__(self, app, minimum_size: int = HTTP_COMPRESS_MIN_BYTES,
+                 gzip_level: int = HTTP_GZIP_LEVEL, brotli_quality: int = HTTP_BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        encoding = _choose_encoding(headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        chunks = []
+
+        async def wrapped_send(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._send_response(start, b"".join(chunks), encoding, send)
+
+        await self.app(scope, receive, wrapped_send)
+
+    async def _send_response(self, start, body: bytes, encoding: str, send):
+        raw_headers = list(start.get("headers", []))
+        names = {k.lower(): v for k, v in raw_headers}
+        content_type = names.get(b"content-type", b"").decode("latin-1")
+        compress = (
+            start["status"] not in (204, 304)
+            and len(body) >= self.minimum_size
+            and b"content-encoding" not in names
+            and content_type.startswith(_COMPRESSIBLE)
+        )
+        if compress:
+            if encoding == "br":
+                body = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                body = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+            raw_headers = [(k, v) for k, v in raw_headers if k.lower() not in (b"content-length", b"vary")]
+            vary = names.get(b"vary", b"")
+            if b"accept-encoding" not in vary.lower():
+                vary = (vary + b", " if vary else b"") + b"Accept-Encoding"
+            raw_headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"vary", vary),
+            ]
+        await send({**start, "headers": raw_headers})
+        await send({"type": "http.response.body", "body": body})
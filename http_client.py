@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+http_client.py - Dış HTTP çağrıları için paylaşılan bağlantı havuzları
+- Host başına tek httpx.Client / httpx.AsyncClient: keep-alive, (h2 kuruluysa)
+  HTTP/2, host başına bağlantı sınırı ve zaman aşımları tek yerden ayarlanır
+- Supabase (PostgREST) istemcisi ve Firebase Identity Toolkit REST çağrıları
+  aynı havuzları kullanır; TLS el sıkışması her istekte tekrarlanmaz
+- close_clients() / aclose_clients() kapanışta havuzları boşaltır
+
+Ayarlar (ortam değişkenleri):
+    HTTP_MAX_CONNECTIONS (20)   host başına eşzamanlı bağlantı
+    HTTP_MAX_KEEPALIVE   (10)   host başına boşta tutulan bağlantı
+    HTTP_KEEPALIVE_EXPIRY (30)  boşta bağlantının ömrü (s)
+    HTTP_CONNECT_TIMEOUT (5), HTTP_READ_TIMEOUT (30), HTTP_POOL_TIMEOUT (5)
+    HTTP_HTTP2 (1)              0 ise HTTP/1.1
+"""
+
+import os
+import logging
+import threading
+from typing import Dict
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "1") not in ("0", "false", "no")
+
+_clients: Dict[str, httpx.Client] = {}
+_async_clients: Dict[str, httpx.AsyncClient] = {}
+_lock = threading.Lock()
+
+
+def _http2_available() -> bool:
+    if not HTTP_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401  (httpx[http2])
+        return True
+    except ImportError:
+        return False
+
+
+def _host_key(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}" if parts.netloc else url
+
+
+def _options(read_timeout: float) -> dict:
+    return dict(
+        http2=_http2_available(),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(read_timeout, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT),
+    )
+
+
+def client_for(url: str, read_timeout: float = HTTP_READ_TIMEOUT) -> httpx.Client:
+    """URL'nin host'u için paylaşılan senkron istemci (ilk çağrıda kurulur)"""
+    key = _host_key(url)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = httpx.Client(**_options(read_timeout))
+                logger.info(f"[HTTP] {key} için havuz açıldı (http2={_http2_available()})")
+    return client
+
+
+def async_client_for(url: str, read_timeout: float = HTTP_READ_TIMEOUT) -> httpx.AsyncClient:
+    """URL'nin host'u için paylaşılan async istemci (uvicorn olay döngüsünde kullanılır)"""
+    key = _host_key(url)
+    client = _async_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(key)
+            if client is None:
+                client = _async_clients[key] = httpx.AsyncClient(**_options(read_timeout))
+                logger.info(f"[HTTP] {key} için async havuz açıldı")
+    return client
+
+
+def close_clients():
+    """Senkron havuzları kapat"""
+    with _lock:
+        clients = list(_clients.values())
+        _clients.clear()
+    for client in clients:
+        client.close()
+
+
+async def aclose_clients():
+    """Tüm havuzları kapat (async kapanış kancasından)"""
+    with _lock:
+        clients = list(_async_clients.values())
+        _async_clients.clear()
+    for client in clients:
+        await client.aclose()
+    close_clients()
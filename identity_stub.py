@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+identity_stub.py - Firebase Identity Toolkit için yerel sahte sunucu (test / yük denemesi)
+accounts:sendOobCode uç noktasını taklit eder; gecikme ve hata modu çalışırken değiştirilebilir.
+
+    uvicorn identity_stub:app --port 9099
+    IDENTITY_TOOLKIT_URL=http://127.0.0.1:9099 FIREBASE_API_KEY=test uvicorn main:app
+
+Modlar (POST /_config?mode=...&delay_s=...):
+    ok       200 {"email": ...}
+    invalid  400 INVALID_ID_TOKEN
+    error    503 (devre kesiciyi tetikler)
+    hang     delay_s kadar bekleyip 200 (zaman aşımı denemesi)
+"""
+
+import os
+import asyncio
+from collections import Counter
+
+from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Identity Toolkit stub")
+
+STATE = {
+    "mode": os.getenv("STUB_MODE", "ok"),
+    "delay_s": float(os.getenv("STUB_DELAY_S", "0")),
+}
+CALLS: Counter = Counter()
+
+
+@app.post("/v1/accounts:sendOobCode")
+async def send_oob_code(payload: dict, key: str = Query(None)):
+    CALLS["total"] += 1
+    CALLS[payload.get("idToken", "")[:64]] += 1
+    if STATE["delay_s"]:
+        await asyncio.sleep(STATE["delay_s"])
+    if not key:
+        return JSONResponse({"error": {"code": 400, "message": "API key not valid"}}, status_code=400)
+    mode = STATE["mode"]
+    if mode == "invalid":
+        return JSONResponse({"error": {"code": 400, "message": "INVALID_ID_TOKEN"}}, status_code=400)
+    if mode == "error":
+        return JSONResponse({"error": {"code": 503, "message": "UNAVAILABLE"}}, status_code=503)
+    return {"kind": "identitytoolkit#GetOobConfirmationCodeResponse", "email": "user@example.com"}
+
+
+@app.post("/_config")
+def configure(mode: str = Query(None), delay_s: float = Query(None)):
+    if mode is not None:
+        STATE["mode"] = mode
+    if delay_s is not None:
+        STATE["delay_s"] = delay_s
+    return STATE
+
+
+@app.get("/_calls")
+def calls():
+    return dict(CALLS)
+
+
+@app.post("/_reset")
+def reset():
+    CALLS.clear()
+    STATE.update(mode="ok", delay_s=0.0)
+    return STATE
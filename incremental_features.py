@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+incremental_features.py - Yeni gelen aylar için artımlı özellik üretimi
+- Her şehir için son 12 ay halka tampon (ring buffer) olarak tutulur
+- lag1/2/3/12 ve roll3/roll12 sadece eklenen satırlar için hesaplanır
+- Durum çalıştırmalar arasında .npz dosyasında saklanır
+
+Kullanım:
+    python incremental_features.py --seed gecmis.csv                # durumu geçmişten kur
+    python incremental_features.py --input yeni_ay.csv --output ozellikler.csv
+"""
+
+import os
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from veri_cek import DATE_COL, CITY_COL, TARGET, LAGS, FLOAT_DTYPE, month_key, _to_datetime
+
+logger = logging.getLogger(__name__)
+
+ROLL_WINDOWS = [3, 12]
+WINDOW = max(max(LAGS), max(ROLL_WINDOWS))
+STATE_PATH = Path(os.getenv("FEATURE_STATE_PATH", "state/feature_state.npz"))
+
+
+class FeatureState:
+    """
+    Şehir başına son WINDOW hedef değerini tutan kompakt durum.
+
+    buffer[i, head[i]] bir sonraki yazılacak yuvadır; (head + j) % WINDOW sırası
+    en eskiden en yeniye değerleri verir. Henüz dolmamış yuvalar NaN'dır, bu da
+    add_time_features'taki shift/rolling(min_periods=1) davranışıyla aynıdır.
+    """
+
+    def __init__(self, target: str = TARGET, window: int = WINDOW):
+        self.target = target
+        self.window = window
+        self.cities: Dict[str, int] = {}
+        self.buffer = np.full((0, window), np.nan)
+        self.head = np.zeros(0, dtype=np.int32)
+        self.last_month = np.zeros(0, dtype=np.int32)   # veri_cek.month_key kodu
+
+    # ----------------- Kurulum / saklama -----------------
+    @classmethod
+    def from_history(cls, df: pd.DataFrame, target: str = TARGET, window: int = WINDOW) -> "FeatureState":
+        """Tüm geçmişten durumu kur (bir kerelik O(geçmiş) maliyet)"""
+        state = cls(target=target, window=window)
+        state.append(df, features=False)
+        return state
+
+    def save(self, path: Path = STATE_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        names = sorted(self.cities, key=self.cities.get)
+        np.savez(
+            path,
+            target=np.array(self.target),
+            cities=np.array(names, dtype=str),
+            buffer=self.buffer,
+            head=self.head,
+            last_month=self.last_month,
+        )
+        logger.info(f"[STATE] {len(names)} şehir durumu kaydedildi -> {path}")
+
+    @classmethod
+    def load(cls, path: Path = STATE_PATH) -> "FeatureState":
+        with np.load(Path(path), allow_pickle=False) as data:
+            state = cls(target=str(data["target"]), window=data["buffer"].shape[1])
+            state.cities = {name: i for i, name in enumerate(data["cities"].tolist())}
+            state.buffer = data["buffer"].copy()
+            state.head = data["head"].copy()
+            state.last_month = data["last_month"].copy()
+        return state
+
+    # ----------------- Artımlı hesap -----------------
+    def _rows(self, names) -> np.ndarray:
+        return np.array([self.cities.get(name, -1) for name in names], dtype=np.intp)
+
+    def lookup(self, names, months) -> np.ndarray:
+        """
+        (şehir, ay) değerleri; months şehir başına 2B olabilir (satır x ay).
+        Tamponun kapsadığı [last_month - window + 1, last_month] dışı ve bilinmeyen şehir -> NaN.
+        """
+        rows = self._rows(names)
+        months = np.asarray(months, dtype=np.int64)
+        shape = months.shape
+        months = months.reshape(len(rows), -1)
+        out = np.full(months.shape, np.nan)
+        known = rows >= 0
+        if known.any():
+            r = rows[known]
+            idx = months[known] - (self.last_month[r, None].astype(np.int64) - self.window + 1)
+            inside = (idx >= 0) & (idx < self.window)
+            ring = (self.head[r, None] + np.clip(idx, 0, self.window - 1)) % self.window
+            vals = np.take_along_axis(self.buffer[r], ring, axis=1)
+            out[known] = np.where(inside, vals, np.nan)
+        return out.reshape(shape)
+
+    def covers(self, names, months) -> np.ndarray:
+        """Ayın lag/rolling geçmişinin tamamı tamponda mı (tampondan eski ay -> False)"""
+        rows = self._rows(names)
+        earliest = np.asarray(months, dtype=np.int64) - max(max(LAGS), max(ROLL_WINDOWS) - 1)
+        first = self.last_month[np.maximum(rows, 0)].astype(np.int64) - self.window + 1
+        return (rows >= 0) & (earliest >= first)
+
+    def peek(self, names, months, batch: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+             ) -> Dict[str, np.ndarray]:
+        """
+        Durumu değiştirmeden, her (şehir, ay) için lag/rolling özellikleri.
+        Lag k, ayın month_key'inden k önceki takvim ayıdır (kaydırma satır saymaz):
+        atlanan aylar NaN, geçmiş bir ay tamponun içindeyse yeniden hesaplanabilir.
+        batch: (şehirler, aylar, değerler) - aynı istekteki okumalar; tampondaki
+        değerin yerine geçer (ayın kendi okuması ve partideki önceki aylar dahil).
+        """
+        names = np.asarray(names, dtype=object)
+        months = np.asarray(months, dtype=np.int64)
+        back = np.arange(max(max(LAGS), max(ROLL_WINDOWS) - 1) + 1)
+        need = months[:, None] - back
+        seq = self.lookup(names, need)
+
+        if batch is not None and len(batch[0]):
+            b_names, b_months, b_values = batch
+            b_rows = self._rows(b_names).astype(np.int64)
+            keys = pd.Index(b_rows * 100_000 + np.asarray(b_months, dtype=np.int64))
+            wanted = self._rows(names).astype(np.int64)[:, None] * 100_000 + need
+            hit = keys.get_indexer(wanted.ravel()).reshape(need.shape)
+            seq = np.where(hit >= 0, np.asarray(b_values, dtype=np.float64)[np.maximum(hit, 0)], seq)
+
+        out = {"current": seq[:, 0]}
+        out.update({f"{self.target}_lag{lag}": seq[:, lag] for lag in LAGS})
+        with np.errstate(invalid="ignore"):
+            for w in ROLL_WINDOWS:
+                window = seq[:, :w]
+                out[f"{self.target}_roll{w}"] = np.nansum(window, axis=1) / np.sum(~np.isnan(window), axis=1)
+        return out
+
+    def _city_rows(self, names: np.ndarray) -> np.ndarray:
+        """Şehir adlarını tampon satırlarına çevir; yeni şehirler için yer aç"""
+        new = [name for name in pd.unique(names) if name not in self.cities]
+        if new:
+            start = len(self.cities)
+            self.cities.update({name: start + i for i, name in enumerate(new)})
+            self.buffer = np.vstack([self.buffer, np.full((len(new), self.window), np.nan)])
+            self.head = np.concatenate([self.head, np.zeros(len(new), dtype=np.int32)])
+            self.last_month = np.concatenate([self.last_month, np.full(len(new), -1, dtype=np.int32)])
+        return np.array([self.cities[name] for name in names], dtype=np.intp)
+
+    def append(self, rows: pd.DataFrame, features: bool = True) -> pd.DataFrame:
+        """
+        Yeni satırları duruma ekle; features=True ise bu satırlar için
+        zaman/lag/rolling özelliklerini hesaplayıp döndür.
+        Satırlar ay koduna göre yerleşir: atlanan aylar NaN kalır, lag takvim ayıdır.
+        Şehrin son ayından eski / aynı aylar ve partide tekrar eden aylar atlanır.
+        Maliyet O(yeni satır x WINDOW); geçmiş yeniden sıralanmaz.
+        Çağıranın rows çerçevesi değişmez; sonuç yeni bir çerçevedir.
+        """
+        if rows.empty:
+            return rows.copy()
+
+        rows = _to_datetime(rows.copy(deep=False)).sort_values([CITY_COL, DATE_COL], ignore_index=True)
+        names = rows[CITY_COL].astype(str).to_numpy()
+        months = month_key(rows[DATE_COL]).to_numpy().astype(np.int64)
+        city_rows = self._city_rows(names)
+
+        # Daha önce işlenmiş aylar ve partide aynı (şehir, ay) tekrarları eklenmez
+        fresh = months > self.last_month[city_rows]
+        repeated = np.r_[(city_rows[1:] == city_rows[:-1]) & (months[1:] == months[:-1]), False]
+        keep_rows = fresh & ~repeated
+        if not keep_rows.all():
+            if (~fresh).any():
+                logger.warning(f"[STATE] {int((~fresh).sum())} satır zaten işlenmiş aylara ait, atlandı")
+            if (fresh & repeated).any():
+                logger.warning(f"[STATE] {int((fresh & repeated).sum())} tekrarlanan (şehir, ay) satırı atlandı (sonuncusu kullanıldı)")
+            rows = rows[keep_rows].reset_index(drop=True)
+            names, months, city_rows = names[keep_rows], months[keep_rows], city_rows[keep_rows]
+            if rows.empty:
+                return rows
+
+        values = pd.to_numeric(rows[self.target], errors="coerce").to_numpy(dtype=np.float64)
+
+        starts = np.r_[0, np.flatnonzero(city_rows[1:] != city_rows[:-1]) + 1]
+        run_len = np.diff(np.r_[starts, len(city_rows)])
+        batch = city_rows[starts]
+        slot = np.repeat(np.arange(len(batch)), run_len)
+
+        # Şehrin tampondaki son ayı; yeni şehirde partinin ilk ayından bir önceki ay
+        last = self.last_month[batch].astype(np.int64)
+        new_city = last < 0
+        last[new_city] = months[starts[new_city]] - 1
+        span = months[starts + run_len - 1] - last
+
+        # [eski tampon (kronolojik) | last+1 ... yeni son ay] matrisi; sütun = ay ofseti
+        width = self.window + int(span.max())
+        order = (self.head[batch, None] + np.arange(self.window)) % self.window
+        hist = np.full((len(batch), width), np.nan)
+        hist[:, :self.window] = np.take_along_axis(self.buffer[batch], order, axis=1)
+        col = self.window - 1 + (months - last[slot])
+        hist[slot, col] = values
+
+        if features:
+            rows["year"] = rows[DATE_COL].dt.year.astype("int16")
+            rows["month"] = rows[DATE_COL].dt.month.astype("int8")
+            rows["quarter"] = rows[DATE_COL].dt.quarter.astype("int8")
+            for lag in LAGS:
+                rows[f"{self.target}_lag{lag}"] = hist[slot, col - lag].astype(FLOAT_DTYPE)
+            for w in ROLL_WINDOWS:
+                window = hist[slot[:, None], col[:, None] - np.arange(w)[::-1]]
+                with np.errstate(invalid="ignore"):
+                    counts = np.sum(~np.isnan(window), axis=1)
+                    roll = np.nansum(window, axis=1) / counts
+                rows[f"{self.target}_roll{w}"] = roll.astype(FLOAT_DTYPE)
+
+        # Tampon: şehrin yeni son ayında biten window ay (atlanan aylar NaN)
+        tail = span[:, None] + np.arange(self.window)
+        self.buffer[batch] = np.take_along_axis(hist, tail, axis=1)
+        self.head[batch] = 0
+        self.last_month[batch] = months[starts + run_len - 1]
+        return rows
+
+
+def append_time_features(rows: pd.DataFrame, state_path: Path = STATE_PATH,
+                         state: Optional[FeatureState] = None) -> pd.DataFrame:
+    """Yeni ay(lar) için özellikleri üret ve güncellenmiş durumu kaydet"""
+    if state is None:
+        if not Path(state_path).exists():
+            raise FileNotFoundError(
+                f"Özellik durumu bulunamadı: {state_path}. Önce --seed ile geçmişten kurun."
+            )
+        state = FeatureState.load(state_path)
+    out = state.append(rows)
+    state.save(state_path)
+    return out
+
+
+# ===================== CLI =====================
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seed", help="Durumu bu geçmiş CSV'den kur (Donem, Sehir, hedef)")
+    ap.add_argument("--input", help="Yeni gelen ay(lar)ın CSV'si")
+    ap.add_argument("--output", help="Özellikli satırların yazılacağı CSV")
+    ap.add_argument("--state", default=str(STATE_PATH), help="Durum dosyası (.npz)")
+    ap.add_argument("--target", default=TARGET, help="Hedef kolon")
+    args = ap.parse_args()
+
+    if args.seed:
+        FeatureState.from_history(pd.read_csv(args.seed), target=args.target).save(args.state)
+    if args.input:
+        result = append_time_features(pd.read_csv(args.input), state_path=args.state)
+        print(f"✔ {len(result)} yeni satır için özellik üretildi")
+        if args.output:
+            result.to_csv(args.output, index=False)
+            print(f"✔ kaydedildi -> {args.output}")
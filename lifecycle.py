@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+lifecycle.py - Başlatma / kapanış aşamalarının ölçümü
+- phase("ad"): aşamanın süresini loglar, STAGE_SECONDS'a (startup_<ad>) yazar
+  ve STARTUP_REPORT'a ekler; /health yanıtında gösterilir
+- Aşamalar gateway lifespan'ında (main.py) ve anomaly_api.lifespan'ında çağrılır
+"""
+
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+STARTUP_REPORT: Dict = {"phases": [], "total_s": None}
+_started: Optional[float] = None
+
+
+def begin_startup():
+    """Başlatma saatini sıfırla (gateway lifespan'ının ilk satırı)"""
+    global _started
+    _started = time.perf_counter()
+
+
+@contextmanager
+def phase(name: str, kind: str = "startup"):
+    """Tek aşama; hata da süresiyle birlikte kaydedilip yeniden fırlatılır"""
+    global _started
+    t0 = time.perf_counter()
+    if _started is None:
+        _started = t0
+    status = "ok"
+    try:
+        yield
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, stage=f"{kind}_{name}")
+        phases: List[Dict] = STARTUP_REPORT.setdefault("phases" if kind == "startup" else kind, [])
+        phases.append({"name": name, "seconds": round(elapsed, 3), "status": status})
+        log = logger.info if status == "ok" else logger.error
+        log(f"[{kind.upper()}] {name}: {elapsed * 1000:.0f} ms ({status})")
+
+
+def finish_startup():
+    """Tüm başlatma aşamaları bitti (lazy modda ısınma thread'inin sonunda)"""
+    STARTUP_REPORT["total_s"] = round(time.perf_counter() - (_started or time.perf_counter()), 3)
+    summary = ", ".join(f"{p['name']} {p['seconds']:.2f}s" for p in STARTUP_REPORT["phases"])
+    logger.info(f"[STARTUP] Tamamlandı: {STARTUP_REPORT['total_s']:.2f}s ({summary})")
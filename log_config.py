@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+log_config.py - Seviyeli, yapılandırılmış ve bloklamayan loglama
+- Uygulama thread'leri kayıtları sadece bir kuyruğa bırakır (QueueHandler)
+- Biçimlendirme ve yazma ayrı bir dinleyici thread'inde yapılır (QueueListener)
+- LOG_LEVEL (INFO), LOG_FORMAT (json | text) ortam değişkenleriyle ayarlanır
+"""
+
+import os
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Optional
+
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Her kaydı tek satır JSON olarak yazar; extra={...} alanları da eklenir"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """Kök logger'ı kuyruk tabanlı hale getir (tekrar çağrılırsa bir şey yapmaz)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+
+    stream = logging.StreamHandler()
+    if fmt == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(name)s - %(message)s'))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Kuyrukta bekleyen kayıtları yaz ve dinleyiciyi durdur"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,19 +1,47 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 
 from firebase_auth import get_current_user
+from http_cache import CompressionMiddleware
+from http_client import aclose_clients
 from email_service import send_verification_email
+from firebase_init import initialize_firebase
+from redis_manager import close_connection as close_redis
+from lifecycle import STARTUP_REPORT, begin_startup, phase
+from log_config import stop_logging
 
-# Firebase initialization
-from firebase_init import db
+# anomaly_api kendi FastAPI uygulamasıdır; gateway rotalarından sonra köke mount edilir.
+# Mount edilen uygulamanın lifespan'ı Starlette tarafından çalıştırılmaz,
+# bu yüzden model yükleme / ısınma aşağıdaki tek lifespan'dan yönetilir.
+import anomaly_api
+
+logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("🚀 ElektrAize API starting...")
-    yield
-    print("🛑 ElektrAize API shutting down...")
+    """
+    Tek başlatma yolu: Firebase -> veri anlık görüntüsü -> modeller / ısınma
+    (anomaly_api.lifespan) -> kapanışta zamanlayıcılar, HTTP havuzları, Redis, loglar.
+    Aşama süreleri loglanır ve /health altında "startup" olarak döner.
+    """
+    begin_startup()
+    logger.info("🚀 ElektrAize API starting...")
+    with phase("firebase"):
+        await asyncio.to_thread(initialize_firebase)
+    async with anomaly_api.lifespan(anomaly_api.app):
+        yield
+    logger.info("🛑 ElektrAize API shutting down...")
+    # Paylaşılan HTTP havuzlarını boşalt (Supabase / Firebase REST)
+    with phase("http_pools", kind="shutdown"):
+        await aclose_clients()
+    with phase("redis", kind="shutdown"):
+        await close_redis()
+    # Kuyrukta bekleyen log kayıtlarını en son yaz
+    stop_logging()
 
 app = FastAPI(
     title="ElektrAize Energy Analytics",
@@ -31,6 +59,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Yanıt sıkıştırma; CORS ile birlikte mount edilen anomaly_api için de tek katman
+app.add_middleware(CompressionMiddleware)
+
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
@@ -67,12 +98,18 @@ def root():
         "service": "ElektrAize Gateway",
         "docs": "/docs",
         "health": "/health",
+        "ready": "/ready",
         "me": "/me",
     }
 
 @app.get("/health")
 def health():
-    return {"status": "healthy", "service": "ElektrAize Gateway"}
+    return {"status": "healthy", "service": "ElektrAize Gateway", "startup": STARTUP_REPORT}
+
+@app.get("/ready")
+def ready():
+    """Hazırlık kapısı: anomali servisinin birincil modeli hazır olana kadar 503"""
+    return anomaly_api.health()
 
 @app.get("/me")
 def get_me(user=Depends(get_current_user)):
@@ -87,12 +124,17 @@ def protected_test(user=Depends(get_current_user)):
     return {"message": "This is a protected endpoint", "uid": user["uid"]}
 
 @app.post("/send-verification")
-def send_verification(id_token: str):
+async def send_verification(id_token: str):
     """
     Send verification email to user via Firebase.
     id_token should be provided from frontend.
+    Runs on the event loop (no threadpool worker is held while Firebase responds).
     """
-    return send_verification_email(id_token)
+    return await send_verification_email(id_token)
+
+# Anomali servisi (/anomalies, /categories, /map/...) köke mount; yukarıdaki
+# gateway rotaları (/, /health, /ready, /me, ...) önce eşleşir
+app.mount("/", anomaly_api.app)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+metrics.py - Prometheus formatında süreç içi metrikler
+- Etiketli histogram ve sayaçlar (ek bağımlılık yok)
+- render() -> /metrics endpoint'inin döndürdüğü text exposition (0.0.4)
+- Aşama süreleri: stage_timer("merge"), FETCH_SECONDS.time(table="weather") ...
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}_total{_label_str(self.labelnames, key)} {value}" for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # etiket -> [kova sayaçları..., toplam, adet]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = self.header()
+        for key, series in items:
+            labels = _label_str(self.labelnames, key)
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _label_str(self.labelnames, key, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _label_str(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {series[-1]}")
+            lines.append(f"{self.name}_sum{labels} {series[-2]}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+def render() -> str:
+    """Kayıtlı tüm metrikleri Prometheus text formatında döndür"""
+    lines: List[str] = []
+    for metric in _REGISTRY:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+# ===================== UYGULAMA METRİKLERİ =====================
+STAGE_SECONDS = Histogram(
+    "elektraize_stage_duration_seconds",
+    "Pipeline ve istek aşamalarının süresi",
+    ["stage"],
+)
+FETCH_SECONDS = Histogram(
+    "elektraize_table_fetch_duration_seconds",
+    "Veri kaynağından tablo başına okuma süresi",
+    ["source", "table"],
+)
+SUPABASE_WRITE_SECONDS = Histogram(
+    "elektraize_supabase_write_duration_seconds",
+    "Supabase insert süresi",
+    ["table"],
+)
+SUPABASE_WRITE_ERRORS = Counter(
+    "elektraize_supabase_write_errors",
+    "Başarısız Supabase insert sayısı",
+    ["table"],
+)
+CACHE_REQUESTS = Counter(
+    "elektraize_cache_requests",
+    "Önbellek isabet / ıska sayısı",
+    ["cache", "result"],
+)
+HTTP_SECONDS = Histogram(
+    "elektraize_http_request_duration_seconds",
+    "HTTP isteklerinin uçtan uca süresi",
+    ["method", "route", "status"],
+)
+SINGLE_FLIGHT_CALLS = Counter(
+    "elektraize_single_flight_calls",
+    "Birleştirilen hesaplamalar: leader (hesaplayan) / shared (sonucu bekleyen)",
+    ["flight", "role"],
+)
+
+
+def stage_timer(stage: str):
+    """with stage_timer("predict"): ... -> elektraize_stage_duration_seconds{stage="predict"}"""
+    return STAGE_SECONDS.time(stage=stage)
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+@contextmanager
+def supabase_write(table: str):
+    """Supabase yazımını süre ve hata sayacıyla sar"""
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        SUPABASE_WRITE_ERRORS.inc(table=table)
+        raise
+    finally:
+        SUPABASE_WRITE_SECONDS.observe(time.perf_counter() - t0, table=table)
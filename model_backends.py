@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+model_backends.py - Yapılandırılabilir regresyon model arka uçları
+- rf  : RandomForestRegressor (mevcut varsayılan, erken durdurma yok)
+- xgb : XGBoost tree_method="hist" (xgboost kuruluysa)
+- hgb : sklearn HistGradientBoostingRegressor
+Boosting arka uçları zamana göre ayrılan doğrulama dilimi (son aylar) üzerinde
+erken durdurulur; bulunan tur sayısıyla tüm eğitim verisine yeniden fit edilir.
+Arka uç MODEL_BACKEND ortam değişkeniyle seçilir.
+
+Kategorilere göre karşılaştırma:
+    python model_backends.py --backends rf,xgb,hgb
+"""
+
+import os
+import time
+import logging
+import argparse
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import r2_score
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("rf", "xgb", "hgb")
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "rf").lower()
+VALIDATION_FRACTION = float(os.getenv("MODEL_VALIDATION_FRACTION", "0.2"))
+EARLY_STOPPING_ROUNDS = int(os.getenv("MODEL_EARLY_STOPPING_ROUNDS", "50"))
+
+# API modelleri için varsayılan hiperparametreler
+DEFAULT_PARAMS: Dict[str, dict] = {
+    "rf": dict(n_estimators=100, max_depth=10, random_state=42, n_jobs=-1),
+    "xgb": dict(n_estimators=1000, max_depth=6, learning_rate=0.05, subsample=0.9,
+                colsample_bytree=0.9, tree_method="hist", random_state=42, n_jobs=-1),
+    "hgb": dict(max_iter=1000, learning_rate=0.05, max_leaf_nodes=31, random_state=42),
+}
+
+
+@dataclass
+class FitReport:
+    backend: str
+    fit_s: float
+    predict_s: float
+    train_r2: float
+    test_r2: float
+    n_estimators: int      # rf: ağaç sayısı, boosting: erken durdurma sonrası tur sayısı
+
+
+def _check_backend(backend: str) -> str:
+    backend = backend.lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"Bilinmeyen model arka ucu '{backend}'. Seçenekler: {list(BACKENDS)}")
+    return backend
+
+
+def time_validation_mask(X: pd.DataFrame, time_key=None, fraction: float = VALIDATION_FRACTION) -> Optional[np.ndarray]:
+    """
+    Son dönemleri doğrulama dilimi olarak işaretle (True = doğrulama).
+    time_key verilmezse X'teki year/month kolonları, o da yoksa satır sırası kullanılır.
+    Bölünecek kadar dönem yoksa None döner.
+    """
+    if time_key is not None:
+        key = np.asarray(time_key)
+    elif {"year", "month"} <= set(X.columns):
+        key = X["year"].to_numpy(dtype=np.int64) * 12 + X["month"].to_numpy(dtype=np.int64)
+    else:
+        key = np.arange(len(X))
+
+    periods = np.unique(key)
+    n_val = int(np.ceil(len(periods) * fraction))
+    if len(periods) < 2 or n_val == 0 or n_val >= len(periods):
+        return None
+    return key >= periods[-n_val]
+
+
+def _fill_empty_columns(X: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tamamen NaN kolonları 0 yap (HistGradientBoosting binning'i boş kolonda hata verir).
+    Tek değerli kolonda bölünme olmadığı için tahminde bu kolon kullanılmaz.
+    """
+    empty = X.columns[X.isna().all().to_numpy()]
+    return X.fillna({col: 0 for col in empty}) if len(empty) else X
+
+
+def make_model(backend: str, params: Optional[dict] = None):
+    backend = _check_backend(backend)
+    params = {**DEFAULT_PARAMS[backend], **(params or {})}
+    if backend == "rf":
+        return RandomForestRegressor(**params)
+    if backend == "hgb":
+        return HistGradientBoostingRegressor(**params)
+    from xgboost import XGBRegressor    # opsiyonel bağımlılık
+    return XGBRegressor(**params)
+
+
+def fit_model(backend: str, X: pd.DataFrame, y: pd.Series, time_key=None,
+              params: Optional[dict] = None, refit: bool = True) -> Tuple[object, int]:
+    """
+    Modeli eğit; (model, tur/ağaç sayısı) döndür.
+    Boosting arka uçlarında son dönemler üzerinde erken durdurma yapılır,
+    refit=True ise bulunan tur sayısıyla tüm veriye yeniden fit edilir.
+    """
+    backend = _check_backend(backend)
+    params = {**DEFAULT_PARAMS[backend], **(params or {})}
+    val = None if backend == "rf" else time_validation_mask(X, time_key)
+
+    if val is None:
+        if backend == "hgb":
+            params["early_stopping"] = False
+            X = _fill_empty_columns(X)
+        model = make_model(backend, params).fit(X, y)
+        n_iter = {"rf": "n_estimators", "xgb": "n_estimators", "hgb": "max_iter"}[backend]
+        return model, int(getattr(model, "n_iter_", params[n_iter]))
+
+    X_fit, y_fit, X_val, y_val = X[~val], y[~val], X[val], y[val]
+    if backend == "xgb":
+        model = make_model(backend, {**params, "early_stopping_rounds": EARLY_STOPPING_ROUNDS})
+        model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+        best = int(model.best_iteration) + 1
+        if refit:
+            model = make_model(backend, {**params, "n_estimators": best}).fit(X, y)
+    else:
+        model = make_model(backend, {**params, "early_stopping": True,
+                                     "n_iter_no_change": EARLY_STOPPING_ROUNDS})
+        model.fit(_fill_empty_columns(X_fit), y_fit, X_val=X_val, y_val=y_val)
+        best = int(model.n_iter_)
+        if refit:
+            model = make_model(backend, {**params, "max_iter": best, "early_stopping": False})
+            model.fit(_fill_empty_columns(X), y)
+    logger.info(f"[MODEL] {backend}: erken durdurma -> {best} tur (doğrulama: {int(val.sum())} satır)")
+    return model, best
+
+
+def train_and_evaluate(backend: str, Xtr: pd.DataFrame, ytr: pd.Series,
+                       Xte: pd.DataFrame, yte: pd.Series,
+                       params: Optional[dict] = None) -> Tuple[object, FitReport]:
+    """Eğit, test setinde tahmin süresini ve R²'yi ölç"""
+    t0 = time.perf_counter()
+    model, n_estimators = fit_model(backend, Xtr, ytr, params=params)
+    fit_s = time.perf_counter() - t0
+
+    train_r2 = float(r2_score(ytr, model.predict(Xtr)))
+    t0 = time.perf_counter()
+    yhat = model.predict(Xte)
+    predict_s = time.perf_counter() - t0
+    test_r2 = float(r2_score(yte, yhat)) if len(Xte) > 0 else 0.0
+
+    return model, FitReport(backend, fit_s, predict_s, train_r2, test_r2, n_estimators)
+
+
+# ===================== CLI =====================
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from veri_cek import CONSUMPTION_CATEGORIES, get_train_test
+
+    ap = argparse.ArgumentParser(description="Model arka uçlarını kategori bazında karşılaştır")
+    ap.add_argument("--backends", default=",".join(BACKENDS), help="Virgülle ayrılmış: rf,xgb,hgb")
+    ap.add_argument("--categories", help="Virgülle ayrılmış kategori adları (default: hepsi)")
+    args = ap.parse_args()
+
+    categories = args.categories.split(",") if args.categories else list(CONSUMPTION_CATEGORIES)
+    rows = []
+    for category in categories:
+        Xtr, Xte, ytr, yte = get_train_test(target_col=CONSUMPTION_CATEGORIES[category])
+        for backend in args.backends.split(","):
+            _, report = train_and_evaluate(backend, Xtr, ytr, Xte, yte)
+            rows.append({"category": category, **asdict(report)})
+
+    print(pd.DataFrame(rows).to_string(index=False, float_format=lambda v: f"{v:.3f}"))
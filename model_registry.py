@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+"""
+model_registry.py - Sürümlü model seti ve kesintisiz yeniden yükleme
+- ModelSet: tek bir veri anlık görüntüsü (işlenmiş train/test çerçeveleri) ve
+  o veriyle eğitilmiş kategori modelleri; kategoriler tembel yüklenir
+- reload_models(): yeni seti istek yolunun dışında kurar, doğrular ve atomik
+  olarak yayınlar. İstekler seti başta bir kez alır (current_model_set()),
+  böylece yayın sırasında devam eden istekler eski sürümle tamamlanır.
+- MODEL_RELOAD_INTERVAL_S > 0 ise yeniden yükleme periyodik olarak da çalışır
+- SHARED_MODEL_DIR verilirse set mmap dosyalarıyla işçiler arasında paylaşılır
+  (shared_snapshot); işçiler kurmak yerine yayındaki sürüme bağlanır
+"""
+
+import os
+import time
+import hashlib
+import shutil
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+from veri_cek import CITY_COL, CONSUMPTION_CATEGORIES, DATE_COL, finalize_xy, get_processed_frames, save_model_result
+from forest_engine import CompiledForest, compile_forest
+from model_backends import MODEL_BACKEND, train_and_evaluate
+from online_scoring import OnlineScorer
+from city_catalog import CityCatalog, catalog_for
+from consumption_cube import ConsumptionCube
+from metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Ağaç modelleri düzleştirilmiş dizilere derlenir (FOREST_ENGINE=sklearn ile kapatılır).
+# COMPILED_MODEL_DIR verilirse derlenmiş model diske yazılıp mmap ile açılır.
+FOREST_ENGINE = os.getenv("FOREST_ENGINE", "compiled").lower()
+COMPILED_MODEL_DIR = os.getenv("COMPILED_MODEL_DIR")
+
+PRIMARY_CATEGORY = os.getenv("PRIMARY_CATEGORY", "genel")
+MODEL_WARMUP_ORDER = os.getenv("MODEL_WARMUP_ORDER", "genel,mesken,sanayi,ticarethane,tarimsal,aydinlatma,diger")
+
+# Yeni set, test R²'si eski setten bu kadardan fazla düşen kategori içeriyorsa yayınlanmaz
+RELOAD_MAX_R2_DROP = float(os.getenv("RELOAD_MAX_R2_DROP", "0.2"))
+MODEL_RELOAD_INTERVAL_S = float(os.getenv("MODEL_RELOAD_INTERVAL_S", "0"))
+
+# İşçiler arası paylaşım (boşsa her süreç kendi setini kurar)
+SHARED_MODEL_DIR = os.getenv("SHARED_MODEL_DIR")
+SHARED_POLL_S = float(os.getenv("SHARED_POLL_S", "30"))
+
+
+def compile_model(category_name: str, model, feature_cols: List[str], version: str = "default"):
+    """Ormanı CompiledForest'a çevir; derlenemezse / kapalıysa modeli aynen döndür"""
+    if FOREST_ENGINE != "compiled":
+        return model
+    compiled = compile_forest(model, feature_cols)
+    if compiled is None:
+        return model
+    if COMPILED_MODEL_DIR:
+        # Sürüm başına dizin: doğrulamada reddedilen aday yayındaki modelin dosyasına
+        # dokunmaz (Windows'ta mmap'li dosya zaten değiştirilemez)
+        path = compiled.save(Path(COMPILED_MODEL_DIR) / version / f"{category_name}.forest")
+        compiled = CompiledForest.load(path, mmap=True)
+    logger.info(f"[MODEL] {category_name} derlendi -> {compiled!r}, {compiled.nbytes / 1024:.0f} KB")
+    return compiled
+
+
+def warmup_order() -> List[str]:
+    """Birincil kategori önce, sonra MODEL_WARMUP_ORDER, sonra kalanlar"""
+    order = [PRIMARY_CATEGORY] + [c.strip() for c in MODEL_WARMUP_ORDER.split(",")] + list(CONSUMPTION_CATEGORIES)
+    return [c for c in dict.fromkeys(order) if c in CONSUMPTION_CATEGORIES]
+
+
+def data_fingerprint(*frames: pd.DataFrame) -> str:
+    """Çerçevelerin içeriğinden kısa özet (veri sürümü)"""
+    h = hashlib.sha1()
+    for df in frames:
+        h.update(str(df.shape).encode())
+        h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()[:12]
+
+
+class ModelSet:
+    """
+    Bir veri anlık görüntüsü ve onunla eğitilmiş modeller.
+    Yayınlandıktan sonra çerçeveler değiştirilmez; sadece henüz yüklenmemiş
+    kategoriler doldurulur. Kategori durumu: pending -> loading -> ready | failed.
+    """
+
+    def __init__(self, df_train: pd.DataFrame, df_test: pd.DataFrame, version: Optional[str] = None,
+                 data_version: Optional[str] = None):
+        self.df_train = df_train
+        self.df_test = df_test
+        self.data_version = data_version or data_fingerprint(df_train, df_test)
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        self.version = version or f"{datetime.now():%Y%m%d%H%M%S}-{self.data_version[:8]}"
+        self.models: Dict[str, Optional[dict]] = {}
+        self.states: Dict[str, str] = {cat: "pending" for cat in CONSUMPTION_CATEGORIES}
+        self._locks = {cat: threading.Lock() for cat in CONSUMPTION_CATEGORIES}
+        self._xy: Dict[str, Tuple] = {}
+        self._xy_lock = threading.Lock()
+        self._scorer: Optional[OnlineScorer] = None
+        self._scorer_lock = threading.Lock()
+        self._cubes: Dict[str, ConsumptionCube] = {}
+        self._cube_errors: Dict[str, ValueError] = {}
+        self._cube_lock = threading.Lock()
+
+    @classmethod
+    def build(cls, version: Optional[str] = None) -> "ModelSet":
+        """Veriyi bir kez çekip işle (kategori başına tekrar çekilmez)"""
+        df_train, df_test = get_processed_frames()
+        return cls(df_train, df_test, version)
+
+    # ----------------- Veri -----------------
+    def frames(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        return self.df_train, self.df_test
+
+    def train_test(self, target_col: str):
+        """Hedef başına X/y (get_train_test ile aynı), set ömrü boyunca önbellekte"""
+        xy = self._xy.get(target_col)
+        if xy is None:
+            with self._xy_lock:
+                xy = self._xy.get(target_col)
+                if xy is None:
+                    xy = self._xy[target_col] = finalize_xy(self.df_train, self.df_test, target_col)
+        return xy
+
+    def set_train_test(self, target_col: str, xy: Tuple):
+        """Önceden hazırlanmış X/y'yi kullan (ör. paylaşılan mmap matrisleri)"""
+        with self._xy_lock:
+            self._xy[target_col] = xy
+
+    def scorer(self) -> OnlineScorer:
+        """Bu setin şehir geçmişinden kurulan online skorlama önbelleği"""
+        if self._scorer is None:
+            with self._scorer_lock:
+                if self._scorer is None:
+                    self._scorer = OnlineScorer(self.df_train, self.df_test, CONSUMPTION_CATEGORIES.values(),
+                                                catalog=self.catalog())
+        return self._scorer
+
+    def cube(self, part: str = "train") -> ConsumptionCube:
+        """
+        train / test çerçevesinin şehir x ay x kategori küpü (set ömrü boyunca bir kez).
+        Tekrar eden (şehir, dönem) veya eksik şehir/tarih varsa ValueError; hata da saklanır.
+        """
+        cube = self._cubes.get(part)
+        if cube is None:
+            with self._cube_lock:
+                cube = self._cubes.get(part)
+                if cube is None:
+                    if part in self._cube_errors:
+                        raise self._cube_errors[part]
+                    frame = self.df_train if part == "train" else self.df_test
+                    try:
+                        cube = self._cubes[part] = ConsumptionCube.from_frame(frame)
+                    except ValueError as e:
+                        self._cube_errors[part] = e
+                        raise
+        return cube
+
+    def seasonal_baseline(self, df_test: pd.DataFrame, target_col: str) -> np.ndarray:
+        """
+        df_test satırlarının ("ay" kolonu) şehir x takvim ayı train ortalaması; train'de
+        olmayan şehir -> NaN. Train küpünden okunur, küp kurulamıyorsa groupby yoluna düşülür.
+        """
+        months = df_test["ay"].to_numpy()
+        try:
+            train_cube = self.cube("train")
+        except ValueError as e:
+            logger.warning(f"[BASELINE] Küp kurulamadı ({e}); groupby baseline kullanılıyor")
+            means = (
+                self.df_train.assign(ay=pd.to_datetime(self.df_train[DATE_COL]).dt.month)
+                .groupby([CITY_COL, "ay"], observed=True)[target_col]
+                .mean()
+            )
+            means.index = pd.MultiIndex.from_arrays([means.index.get_level_values(0).astype(str),
+                                                     means.index.get_level_values(1)])
+            keys = pd.MultiIndex.from_arrays([df_test[CITY_COL].astype(str), months])
+            return means.reindex(keys).to_numpy(dtype=np.float32)
+        city_pos = train_cube.city_positions(df_test[CITY_COL].astype(str))
+        baseline = train_cube.seasonal_baseline(target_col)[np.maximum(city_pos, 0), months - 1]
+        return np.where(city_pos >= 0, baseline, np.nan).astype(np.float32)
+
+    def catalog(self) -> CityCatalog:
+        """Şehir kataloğu (veri sürümü başına bir kez kurulur)"""
+        return catalog_for(self.df_train, self.df_test, CONSUMPTION_CATEGORIES, self.data_version)
+
+    # ----------------- Modeller -----------------
+    def load(self, category_name: str) -> Optional[dict]:
+        """Tek kategori için modeli eğit; başarısızsa None"""
+        target_col = CONSUMPTION_CATEGORIES[category_name]
+        self.states[category_name] = "loading"
+        try:
+            logger.info(f"[MODEL] {category_name} için model yükleniyor ({self.version})...")
+            logger.info(f"[MODEL] Target column: {target_col}")
+
+            # Veri kontrolü
+            Xtr, Xte, ytr, yte = self.train_test(target_col)
+            logger.info(f"[MODEL] Veri boyutları - Xtr: {Xtr.shape}, Xte: {Xte.shape}")
+
+            if len(Xtr) == 0 or len(Xte) == 0:
+                logger.warning(f"[UYARI] {category_name} için yeterli veri yok, atlanıyor...")
+                self.models[category_name] = None
+                self.states[category_name] = "failed"
+                return None
+
+            # Arka uç MODEL_BACKEND ile seçilir (rf / xgb / hgb)
+            with stage_timer("fit"):
+                model, report = train_and_evaluate(MODEL_BACKEND, Xtr, ytr, Xte, yte)
+
+            self.models[category_name] = {
+                'model': compile_model(category_name, model, list(Xtr.columns), self.version),
+                'target_col': target_col,
+                'train_score': report.train_r2,
+                'test_score': report.test_r2,
+                'feature_cols': list(Xtr.columns),
+                'backend': report.backend,
+                'fit_report': report
+            }
+            self.states[category_name] = "ready"
+
+            logger.info(
+                f"[OK] {category_name} modeli yüklendi ({report.backend}, {report.n_estimators} tur) - "
+                f"Train R²: {report.train_r2:.3f}, Test R²: {report.test_r2:.3f}, "
+                f"fit {report.fit_s:.2f}s, predict {report.predict_s * 1000:.1f}ms"
+            )
+
+            # 🔹 Model sonucunu Supabase'e kaydet
+            try:
+                save_model_result(
+                    model_name=category_name,
+                    target=target_col,
+                    train_score=report.train_r2,
+                    test_score=report.test_r2
+                )
+            except Exception as e:
+                logger.warning(f"[WARN] {category_name} sonucu DB'ye kaydedilemedi: {e}")
+            return self.models[category_name]
+
+        except Exception as e:
+            logger.error(f"[ERROR] {category_name} modeli yüklenemedi: {str(e)}")
+            self.models[category_name] = None
+            self.states[category_name] = "failed"
+            return None
+
+    def adopt(self, category_name: str, info: dict):
+        """Başka yerde eğitilmiş (ör. paylaşılan dizinden bağlanan) modeli hazır olarak ekle"""
+        self.models[category_name] = info
+        self.states[category_name] = "ready"
+
+    def ensure(self, category_name: str) -> Optional[dict]:
+        """Model hazırsa döndür, değilse şimdi yükle (aynı kategori için tek yükleme)"""
+        if self.states.get(category_name) in ("ready", "failed"):
+            return self.models.get(category_name)
+        with self._locks[category_name]:
+            if self.states[category_name] in ("ready", "failed"):
+                return self.models.get(category_name)
+            return self.load(category_name)
+
+    def load_all(self) -> "ModelSet":
+        for category_name in warmup_order():
+            self.ensure(category_name)
+        return self
+
+    def ready_models(self) -> Dict[str, dict]:
+        return {cat: m for cat, m in self.models.items() if m is not None}
+
+    def summary(self) -> Dict:
+        return {
+            "version": self.version,
+            "data_version": self.data_version,
+            "created_at": self.created_at,
+            "categories": dict(self.states),
+        }
+
+
+# ===================== YAYINLANMIŞ SET =====================
+_current: Optional[ModelSet] = None
+_current_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_scheduler_stop = threading.Event()      # lifespan başına yenilenir (_scheduler_event)
+RELOAD_STATUS: Dict = {"status": "idle"}
+
+
+def current_model_set() -> ModelSet:
+    """Yayındaki set; ilk çağrıda veri anlık görüntüsü kurulur (modeller tembel)"""
+    global _current
+    if _current is None:
+        with _current_lock:
+            if _current is None:
+                if SHARED_MODEL_DIR:
+                    from shared_snapshot import attach_or_build
+                    # Paylaşımlı modda kurucu süreç tüm modelleri yükleyip yazar
+                    _current = attach_or_build(SHARED_MODEL_DIR, lambda: ModelSet.build().load_all())
+                else:
+                    _current = ModelSet.build()
+                logger.info(f"[REGISTRY] İlk model seti -> {_current.version}")
+    return _current
+
+
+def peek_model_set() -> Optional[ModelSet]:
+    """Yayındaki set; henüz kurulmadıysa None (veri çekmeyi tetiklemez)"""
+    return _current
+
+
+def publish(model_set: ModelSet):
+    """Seti atomik olarak yayına al (tek referans ataması)"""
+    global _current
+    previous = _current
+    _current = model_set
+    logger.info(
+        f"[REGISTRY] Yayında: {model_set.version}"
+        + (f" (önceki: {previous.version})" if previous is not None else "")
+    )
+    _prune_compiled({model_set.version} | ({previous.version} if previous is not None else set()))
+
+
+def _prune_compiled(keep: Set[str]):
+    """Yayındaki ve bir önceki set dışındaki derlenmiş model dizinlerini sil
+    (reddedilen adaylar dahil); silinemeyenler (ör. Windows'ta açık mmap) sonraki yayında denenir"""
+    if not COMPILED_MODEL_DIR or not Path(COMPILED_MODEL_DIR).is_dir():
+        return
+    for folder in Path(COMPILED_MODEL_DIR).iterdir():
+        if folder.is_dir() and folder.name not in keep:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+def validate(candidate: ModelSet, previous: Optional[ModelSet]) -> List[str]:
+    """Yayın öncesi kontroller; sorun listesi boşsa set yayınlanabilir"""
+    problems = []
+    if candidate.states.get(PRIMARY_CATEGORY) != "ready":
+        problems.append(f"birincil kategori '{PRIMARY_CATEGORY}' yüklenemedi")
+    if previous is None:
+        return problems
+    for cat, old in previous.ready_models().items():
+        new = candidate.models.get(cat)
+        if new is None:
+            problems.append(f"'{cat}' önceki sürümde hazırdı, yenisinde yüklenemedi")
+        elif old["test_score"] - new["test_score"] > RELOAD_MAX_R2_DROP:
+            problems.append(
+                f"'{cat}' test R² {old['test_score']:.3f} -> {new['test_score']:.3f} "
+                f"(izin verilen düşüş {RELOAD_MAX_R2_DROP})"
+            )
+    return problems
+
+
+def reload_models(force: bool = False) -> Dict:
+    """
+    Veriyi yeniden çek, tüm modelleri eğit, doğrula ve yayınla.
+    Aynı anda tek yeniden yükleme çalışır; ikincisi 'in_progress' döner.
+    force=True doğrulama sorunlarını yok sayar.
+    """
+    if not _reload_lock.acquire(blocking=False):
+        return {**RELOAD_STATUS, "status": "in_progress"}
+    t0 = time.perf_counter()
+    try:
+        RELOAD_STATUS.update(status="running", started_at=datetime.now().isoformat(timespec="seconds"))
+        previous = _current
+        with stage_timer("reload"):
+            if SHARED_MODEL_DIR:
+                result = _reload_shared(previous, force)
+            else:
+                result = _reload_local(previous, force)
+    except Exception as e:
+        logger.exception(f"[REGISTRY] Yeniden yükleme başarısız: {e}")
+        result = {"status": "failed", "error": str(e)}
+    finally:
+        _reload_lock.release()
+    result["seconds"] = round(time.perf_counter() - t0, 2)
+    result["finished_at"] = datetime.now().isoformat(timespec="seconds")
+    RELOAD_STATUS.clear()
+    RELOAD_STATUS.update(result)
+    return result
+
+
+def _reload_local(previous: Optional[ModelSet], force: bool) -> Dict:
+    candidate = ModelSet.build().load_all()
+    problems = validate(candidate, previous)
+    if problems and not force:
+        logger.warning(f"[REGISTRY] {candidate.version} reddedildi: {problems}")
+        return {"status": "rejected", "version": candidate.version, "problems": problems}
+    # Skorlayıcı da yayından önce kurulur; ilk istek beklemez
+    candidate.scorer()
+    publish(candidate)
+    return {"status": "swapped", "version": candidate.version,
+            "previous_version": previous.version if previous else None,
+            "problems": problems}
+
+
+def _reload_shared(previous: Optional[ModelSet], force: bool) -> Dict:
+    """
+    Paylaşımlı mod: kilit altında kur ve dosyalara yaz, sonra mmap'li sürüme bağlan.
+    Kilidi beklerken başka bir işçi daha yeni bir sürüm yayınladıysa yeniden
+    kurmak yerine ona bağlanılır (periyodik yükleme işçi sayısı kadar tekrarlanmaz).
+    """
+    from shared_snapshot import _exclusive_lock, attach_snapshot, current_version, write_snapshot
+
+    root = Path(SHARED_MODEL_DIR)
+    with _exclusive_lock(root / ".build.lock"):
+        published = current_version(root)
+        if published is not None and previous is not None and published != previous.version:
+            version = published
+            problems = []
+        else:
+            candidate = ModelSet.build().load_all()
+            problems = validate(candidate, previous)
+            if problems and not force:
+                logger.warning(f"[REGISTRY] {candidate.version} reddedildi: {problems}")
+                return {"status": "rejected", "version": candidate.version, "problems": problems}
+            write_snapshot(candidate, root)
+            version = candidate.version
+    attached = attach_snapshot(root, version)
+    attached.scorer()
+    publish(attached)
+    return {"status": "swapped", "version": version,
+            "previous_version": previous.version if previous else None,
+            "problems": problems}
+
+
+def start_snapshot_watcher(poll_s: float = SHARED_POLL_S) -> Optional[threading.Thread]:
+    """Paylaşımlı modda CURRENT'i izle; başka işçinin yayınladığı sürüme geç"""
+    if not SHARED_MODEL_DIR or poll_s <= 0:
+        return None
+    from shared_snapshot import attach_snapshot, current_version
+
+    stop = _scheduler_event()
+
+    def loop():
+        while not stop.wait(poll_s):
+            try:
+                version = current_version(SHARED_MODEL_DIR)
+                if version and (_current is None or _current.version != version) and not _reload_lock.locked():
+                    attached = attach_snapshot(SHARED_MODEL_DIR, version)
+                    attached.scorer()
+                    publish(attached)
+            except Exception as e:
+                logger.warning(f"[REGISTRY] Paylaşılan sürüme geçilemedi: {e}")
+
+    thread = threading.Thread(target=loop, name="model-snapshot-watcher", daemon=True)
+    thread.start()
+    return thread
+
+
+def _scheduler_event() -> threading.Event:
+    """
+    Başlatılan thread'lerin durdurma olayı. Önceki lifespan durdurduysa yenisi açılır
+    (aynı süreçte ikinci lifespan: TestClient, gateway yeniden kullanımı); clear()
+    yerine yeni olay, böylece durdurulan eski thread'ler yeniden çalışmaya başlamaz.
+    """
+    global _scheduler_stop
+    if _scheduler_stop.is_set():
+        _scheduler_stop = threading.Event()
+    return _scheduler_stop
+
+
+def reload_in_background(force: bool = False) -> bool:
+    """Yeniden yüklemeyi ayrı thread'de başlat; zaten çalışıyorsa False"""
+    if _reload_lock.locked():
+        return False
+    threading.Thread(target=reload_models, kwargs={"force": force}, name="model-reload", daemon=True).start()
+    return True
+
+
+def start_reload_scheduler(interval_s: float = MODEL_RELOAD_INTERVAL_S) -> Optional[threading.Thread]:
+    """interval_s > 0 ise periyodik yeniden yükleme thread'ini başlat"""
+    if interval_s <= 0:
+        return None
+
+    stop = _scheduler_event()
+
+    def loop():
+        while not stop.wait(interval_s):
+            reload_models()
+
+    thread = threading.Thread(target=loop, name="model-reload-scheduler", daemon=True)
+    thread.start()
+    logger.info(f"[REGISTRY] Periyodik yeniden yükleme: her {interval_s:.0f}s")
+    return thread
+
+
+def stop_reload_scheduler():
+    _scheduler_stop.set()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+online_scoring.py - Yeni aylık okumaların bellekten anlık skorlanması
+- Şehir başına son özellik satırı (hava, nüfus, hizmet...) şablon olarak tutulur
+- Her tüketim kategorisinin geçmişi bir FeatureState halka tamponundadır;
+  lag/rolling özellikleri okumanın kendi ayından (month_key) hesaplanır:
+  atlanan aylar boş kalır, tampondaki geçmiş bir ay yeniden skorlanabilir,
+  aynı partideki okumalar (önceki aylar, diğer kategoriler) geçmişin yerine geçer
+- Okumanın ayındaki diğer kategori kolonları partideki okumadan, yoksa geçmişten,
+  yoksa şehir x ay baseline'ından gelir (eski ayın şablon değeri kullanılmaz)
+- Mevsimsel baseline (şehir x ay ortalaması) kategori başına dizi olarak hazırdır
+Tam veri yüklemesi / Supabase turu yapılmaz; skorlama milisaniyeler sürer.
+"""
+
+import os
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from veri_cek import DATE_COL, CITY_COL, TARGET, CONSUMPTION_CATEGORIES, _numeric_columns, month_key
+from incremental_features import WINDOW, FeatureState
+from city_catalog import CityCatalog, fold_city
+
+logger = logging.getLogger(__name__)
+
+# Tamponda tutulan ek ay: son SCORE_RESCORE_MONTHS ay (lag12 dahil) yeniden skorlanabilir
+SCORE_RESCORE_MONTHS = int(os.getenv("SCORE_RESCORE_MONTHS", "24"))
+
+
+class UnknownCityError(KeyError):
+    """Önbellekte olmayan şehir(ler) için skorlama istendi"""
+
+    def __init__(self, cities: List[str]):
+        super().__init__(cities)
+        self.cities = cities
+
+
+class InvalidReadingsError(ValueError):
+    """Skorlanamayan okumalar (tekrar eden şehir/kategori/ay, tampondan eski ay)"""
+
+
+class OnlineScorer:
+    """İşlenmiş train/test çerçevelerinden bir kez kurulan skorlama önbelleği"""
+
+    def __init__(self, df_train: pd.DataFrame, df_test: pd.DataFrame, target_cols: Iterable[str],
+                 catalog: Optional[CityCatalog] = None):
+        history = pd.concat([df_train, df_test], ignore_index=True)
+        history[CITY_COL] = history[CITY_COL].astype(str)
+        history = history.sort_values([CITY_COL, DATE_COL], ignore_index=True)
+
+        # Şehir başına en güncel özellik satırı
+        last = history.groupby(CITY_COL, sort=False).tail(1)
+        self.cities: List[str] = last[CITY_COL].tolist()
+        self.city_pos = {city: i for i, city in enumerate(self.cities)}
+        self.catalog = catalog
+        self.city_keys = {fold_city(city): city for city in self.cities}
+        self.columns = _numeric_columns(last)
+        self.col_pos = {col: i for i, col in enumerate(self.columns)}
+        self.templates = last[self.columns].to_numpy(dtype=np.float64)
+        # Eksik özellikler finalize_xy gibi kolon ortalamasıyla doldurulur
+        self.fill_values = np.nan_to_num(np.nanmean(history[self.columns].to_numpy(dtype=np.float64), axis=0))
+
+        # Kategori başına tüketim geçmişi (lag/rolling ve aynı ayın kategori değerleri için)
+        target_cols = [col for col in target_cols if col in history.columns]
+        window = WINDOW + SCORE_RESCORE_MONTHS
+        self.states: Dict[str, FeatureState] = {
+            col: FeatureState.from_history(history[[DATE_COL, CITY_COL, col]], target=col, window=window)
+            for col in target_cols
+        }
+        self.state = self.states.get(TARGET)
+
+        # Mevsimsel baseline: /anomalies ile aynı tanım (train, şehir x ay ortalaması)
+        month = df_train[DATE_COL].dt.month.to_numpy()
+        city_idx = df_train[CITY_COL].astype(str).map(self.city_pos).to_numpy()
+        valid = ~pd.isna(city_idx)
+        city_idx = city_idx[valid].astype(np.intp)
+        month = month[valid]
+        self.baselines: Dict[str, np.ndarray] = {}
+        for col in target_cols:
+            if col not in df_train.columns:
+                continue
+            values = df_train[col].to_numpy(dtype=np.float64)[valid]
+            ok = ~np.isnan(values)
+            sums = np.zeros((len(self.cities), 13))
+            counts = np.zeros((len(self.cities), 13))
+            np.add.at(sums, (city_idx[ok], month[ok]), values[ok])
+            np.add.at(counts, (city_idx[ok], month[ok]), 1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                self.baselines[col] = sums / counts
+
+        logger.info(f"[SCORE] Online skorlama önbelleği hazır -> {len(self.cities)} şehir, {len(self.columns)} özellik")
+
+    def resolve_city(self, name: str):
+        """Şehir kataloğuyla kanonik ad ("istanbul", "İstanbul" -> aynı şehir)"""
+        if self.catalog is not None:
+            city = self.catalog.resolve(name)
+            if city in self.city_pos:
+                return city
+        name = name.strip()
+        if name in self.city_pos:
+            return name
+        return self.city_keys.get(fold_city(name))
+
+    def score(self, readings: pd.DataFrame, models: Dict[str, dict]) -> pd.DataFrame:
+        """
+        readings: sehir, donem, category, value kolonları.
+        models: kategori -> {'model', 'target_col', 'feature_cols'}
+        Dönüş: okumalar + tahmin ve baseline kolonları (giriş sırasıyla).
+        """
+        resolved = [self.resolve_city(name) for name in readings["sehir"]]
+        unknown = sorted({name for name, city in zip(readings["sehir"], resolved) if city is None})
+        if unknown:
+            raise UnknownCityError(unknown)
+
+        dates = pd.to_datetime(readings["donem"], format="mixed")
+        months = month_key(dates).to_numpy().astype(np.int64)
+        names = np.array(resolved, dtype=object)
+        pos = np.array([self.city_pos[city] for city in resolved], dtype=np.intp)
+        categories = readings["category"].to_numpy()
+        values = readings["value"].to_numpy(dtype=np.float64)
+        targets = np.array([
+            models[c]["target_col"] if c in models else CONSUMPTION_CATEGORIES.get(c) for c in categories
+        ], dtype=object)
+        self._validate(readings, names, categories, months)
+
+        # Şablon satırları + okumanın ayına ait zaman/kategori/lag/rolling özellikleri
+        X = self.templates[pos].copy()
+        month = dates.dt.month.to_numpy()
+        overrides = {
+            "year": dates.dt.year.to_numpy(),
+            "month": month,
+            "quarter": dates.dt.quarter.to_numpy(),
+        }
+        for col, state in self.states.items():
+            own = targets == col
+            features = state.peek(names, months, batch=(names[own], months[own], values[own]))
+            current = features.pop("current")
+            if col in self.baselines:
+                current = np.where(np.isnan(current), self.baselines[col][pos, month], current)
+            if col in self.col_pos:
+                current = np.where(np.isnan(current), X[:, self.col_pos[col]], current)
+            overrides[col] = current
+            overrides.update(features)
+        for col, arr in overrides.items():
+            if col in self.col_pos:
+                X[:, self.col_pos[col]] = arr
+        X = np.where(np.isnan(X), self.fill_values, X)
+
+        tahmin = np.full(len(readings), np.nan)
+        baseline = np.full(len(readings), np.nan)
+        for category in pd.unique(categories):
+            info = models[category]
+            rows = np.flatnonzero(categories == category)
+            feature_idx = [self.col_pos[col] for col in info["feature_cols"]]
+            features = pd.DataFrame(X[np.ix_(rows, feature_idx)], columns=info["feature_cols"])
+            tahmin[rows] = info["model"].predict(features)
+            if info["target_col"] in self.baselines:
+                baseline[rows] = self.baselines[info["target_col"]][pos[rows], month[rows]]
+
+        out = readings.copy()
+        out["sehir"] = resolved
+        out["donem"] = dates.dt.strftime("%Y-%m-%d")
+        out["tahmin"] = tahmin
+        out["baseline"] = baseline
+        return out
+
+    def _validate(self, readings: pd.DataFrame, names: np.ndarray, categories: np.ndarray, months: np.ndarray):
+        """Aynı (şehir, kategori, ay) iki kez ve lag geçmişi tampondan eski aylar reddedilir"""
+        keys = pd.DataFrame({"sehir": names, "category": categories, "month": months})
+        repeated = keys.duplicated(keep=False).to_numpy()
+        if repeated.any():
+            dup = sorted({(n, c, d) for n, c, d in zip(names[repeated], categories[repeated],
+                                                       readings["donem"].to_numpy()[repeated])})
+            raise InvalidReadingsError(f"Aynı şehir/kategori/dönem için birden fazla okuma: {dup}")
+        if self.state is not None:
+            covered = self.state.covers(names, months)
+            if not covered.all():
+                stale = sorted({(n, d) for n, d in zip(names[~covered], readings["donem"].to_numpy()[~covered])})
+                raise InvalidReadingsError(
+                    f"Dönem(ler) skorlama geçmişinden eski (son {SCORE_RESCORE_MONTHS} ay yeniden skorlanabilir): {stale}"
+                )
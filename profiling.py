@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+profiling.py - Aşama bazlı süre / tepe bellek ölçümü
+- tracemalloc ile her aşamanın tepe (peak) bellek kullanımı
+- Bütçe (MB) kontrolü ile bellek regresyonlarını yakalama
+- Süreler profiler kapalıyken de /metrics histogramına yazılır
+"""
+
+import time
+import tracemalloc
+import logging
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+from metrics import STAGE_SECONDS, stage_timer
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 ** 2
+
+
+@dataclass
+class StageStats:
+    name: str
+    seconds: float
+    peak_mb: float      # aşama sırasında ulaşılan tepe bellek (aşama başına göre)
+    retained_mb: float  # aşama bittiğinde hâlâ tutulan ek bellek
+
+
+class StageProfiler:
+    """Pipeline aşamalarını sırayla ölçer.
+
+    Aşamalar iç içe kullanılmamalıdır: her aşama tracemalloc tepe değerini
+    sıfırlar.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages: List[StageStats] = []
+        self._started_tracing = False
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            with stage_timer(name):
+                yield
+            return
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            STAGE_SECONDS.observe(elapsed, stage=name)
+            current, peak = tracemalloc.get_traced_memory()
+            self.stages.append(StageStats(
+                name=name,
+                seconds=elapsed,
+                peak_mb=(peak - base) / _MB,
+                retained_mb=(current - base) / _MB,
+            ))
+
+    def stop(self):
+        """Profiler tracemalloc'u kendisi başlattıysa durdur"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def report(self) -> List[Dict]:
+        return [asdict(s) for s in self.stages]
+
+    def log(self, title: str = "Pipeline profili"):
+        logger.info(f"[PROFIL] {title}")
+        for s in self.stages:
+            logger.info(
+                f"[PROFIL]   {s.name:<24} {s.seconds * 1000:9.1f} ms  "
+                f"peak {s.peak_mb:8.2f} MB  kalan {s.retained_mb:8.2f} MB"
+            )
+
+    def over_budget(self, budgets_mb: Dict[str, float]) -> List[str]:
+        """Tepe belleği bütçeyi aşan aşamaların adlarını döndür"""
+        return [
+            s.name for s in self.stages
+            if s.name in budgets_mb and s.peak_mb > budgets_mb[s.name]
+        ]
+
+
+class _NullProfiler(StageProfiler):
+    """Ölçüm kapalıyken kullanılan, hiçbir şey yapmayan profiler"""
+
+    def __init__(self):
+        super().__init__(enabled=False)
+
+
+NULL_PROFILER = _NullProfiler()
+
+
+def get_profiler(profiler: Optional[StageProfiler]) -> StageProfiler:
+    return profiler if profiler is not None else NULL_PROFILER
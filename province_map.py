@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+province_map.py - Harita için sunucu tarafı il geometrisi ve anomali özeti
+- frontend/public/tr-cities.json (81 il, ~240 KB) Douglas-Peucker ile
+  MAP_TOLERANCES'taki her tolerans (derece) için bir kez sadeleştirilir
+- Sadeleştirilmiş GeoJSON baytları, gzip (ve kuruluysa brotli) halleri ve
+  içerik özetinden ETag bir kez hazırlanır; istekte sadece kopyasız gönderilir
+- province_summary(): /anomalies satırlarını il başına sayı / oran / son sapmaya indirger
+İl eşleştirmesi city_catalog.fold_city anahtarıyla yapılır ("Afyon" -> AFYONKARAHISAR).
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from city_catalog import fold_city
+from http_cache import accepted_encodings
+
+logger = logging.getLogger(__name__)
+
+MAP_GEOJSON_PATH = os.getenv(
+    "MAP_GEOJSON_PATH", str(Path(__file__).resolve().parent / "frontend" / "public" / "tr-cities.json")
+)
+_DEFAULT_TOLERANCES = [0.005, 0.02, 0.05]
+
+
+def _parse_tolerances(raw: Optional[str]) -> List[float]:
+    """MAP_TOLERANCES: virgüllü pozitif sayılar; geçersizse uyarı ve varsayılan liste"""
+    if not raw:
+        return list(_DEFAULT_TOLERANCES)
+    try:
+        values = [float(t) for t in raw.split(",") if t.strip()]
+    except ValueError:
+        values = []
+    if not values or any(not np.isfinite(v) or v <= 0 for v in values):
+        logger.warning(f"[MAP] Geçersiz MAP_TOLERANCES={raw!r}, varsayılan kullanılıyor: {_DEFAULT_TOLERANCES}")
+        return list(_DEFAULT_TOLERANCES)
+    return values
+
+
+def _parse_default_tolerance(raw: Optional[str], tolerances: List[float]) -> float:
+    """MAP_DEFAULT_TOLERANCE: tolerans listesinden biri olmalı; değilse uyarı ve listenin ortancası"""
+    fallback = tolerances[1] if len(tolerances) > 1 else tolerances[0]
+    if not raw:
+        return fallback
+    try:
+        value = float(raw)
+    except ValueError:
+        value = None
+    if value not in tolerances:
+        logger.warning(f"[MAP] Geçersiz MAP_DEFAULT_TOLERANCE={raw!r} (seçenekler: {tolerances}), {fallback} kullanılıyor")
+        return fallback
+    return value
+
+
+MAP_TOLERANCES = _parse_tolerances(os.getenv("MAP_TOLERANCES"))
+MAP_DEFAULT_TOLERANCE = _parse_default_tolerance(os.getenv("MAP_DEFAULT_TOLERANCE"), MAP_TOLERANCES)
+_COORD_DECIMALS = 4   # ~10 m; sadeleştirme toleransının çok altında
+
+# Geometri dosyasındaki kısa adlar -> veri setindeki il adı (katlanmış)
+_ALIASES = {"AFYON": "AFYONKARAHISAR", "ICEL": "MERSIN"}
+
+
+def province_key(name) -> str:
+    key = fold_city(name)
+    return _ALIASES.get(key, key)
+
+
+# ----------------- Sadeleştirme -----------------
+def _perpendicular_distance(points: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    seg = end - start
+    norm = float(np.hypot(*seg))
+    if norm == 0.0:
+        return np.hypot(*(points - start).T)
+    return np.abs(seg[0] * (points[:, 1] - start[1]) - seg[1] * (points[:, 0] - start[0])) / norm
+
+
+def douglas_peucker(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Yinelemeli (özyinelemesiz) Douglas-Peucker; uç noktalar her zaman korunur"""
+    n = len(points)
+    if n <= 2 or tolerance <= 0:
+        return points
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dist = _perpendicular_distance(points[first + 1:last], points[first], points[last])
+        idx = int(dist.argmax())
+        if dist[idx] > tolerance:
+            split = first + 1 + idx
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def _simplify_ring(ring, tolerance: float) -> Optional[list]:
+    """Kapalı halka: ilk nokta sonda tekrar eder; 4 noktadan aza düşen halka atılır"""
+    points = np.asarray(ring, dtype=np.float64)
+    if len(points) < 4:
+        return None
+    # Kapalı halkada başlangıç = bitiş olduğundan en uzak noktadan ikiye bölünür
+    far = int(np.hypot(*(points - points[0]).T).argmax())
+    simplified = np.vstack([douglas_peucker(points[:far + 1], tolerance)[:-1],
+                            douglas_peucker(points[far:], tolerance)])
+    if len(simplified) < 4:
+        return None
+    return np.round(simplified, _COORD_DECIMALS).tolist()
+
+
+def _simplify_polygon(polygon: list, tolerance: float) -> Optional[list]:
+    rings = [_simplify_ring(ring, tolerance) for ring in polygon]
+    if rings[0] is None:
+        return None
+    return [r for r in rings if r is not None]
+
+
+def simplify_geometry(geometry: dict, tolerance: float) -> Optional[dict]:
+    """Polygon / MultiPolygon sadeleştir; küçük adacıklar düşer, en büyük parça hep kalır"""
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return geometry
+    kept = [p for p in (_simplify_polygon(poly, tolerance) for poly in polygons) if p is not None]
+    if not kept:
+        largest = max(polygons, key=lambda poly: len(poly[0]))
+        kept = [[np.round(np.asarray(largest[0]), _COORD_DECIMALS).tolist()]]
+    if len(kept) == 1:
+        return {"type": "Polygon", "coordinates": kept[0]}
+    return {"type": "MultiPolygon", "coordinates": kept}
+
+
+# ----------------- Önceden hazırlanmış yükler -----------------
+@dataclass(frozen=True)
+class MapPayload:
+    tolerance: float
+    body: bytes
+    gzip: bytes
+    brotli: Optional[bytes]
+    etag: str
+    n_points: int
+
+    def encoded(self, accept_encoding: str):
+        """İstemcinin kabul ettiği en küçük gövde: (bayt, Content-Encoding | None)"""
+        accepted = accepted_encodings(accept_encoding)
+        if self.brotli is not None and "br" in accepted:
+            return self.brotli, "br"
+        if "gzip" in accepted:
+            return self.gzip, "gzip"
+        return self.body, None
+
+
+def _count_points(geometry: dict) -> int:
+    coords = geometry["coordinates"]
+    polygons = [coords] if geometry["type"] == "Polygon" else coords
+    return sum(len(ring) for poly in polygons for ring in poly)
+
+
+def build_payload(collection: dict, tolerance: float) -> MapPayload:
+    features = []
+    for feature in collection["features"]:
+        props = feature.get("properties") or {}
+        name = props.get("name", "")
+        features.append({
+            "type": "Feature",
+            "properties": {"name": name, "number": props.get("number"), "key": province_key(name)},
+            "geometry": simplify_geometry(feature["geometry"], tolerance),
+        })
+    body = json.dumps({"type": "FeatureCollection", "tolerance": tolerance, "features": features},
+                      ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    try:
+        import brotli    # opsiyonel bağımlılık
+        compressed_br = brotli.compress(body, quality=11)
+    except ImportError:
+        compressed_br = None
+    return MapPayload(
+        tolerance=tolerance,
+        body=body,
+        gzip=gzip.compress(body, compresslevel=9, mtime=0),
+        brotli=compressed_br,
+        etag=f'"geo-{hashlib.sha1(body).hexdigest()[:16]}"',
+        n_points=sum(_count_points(f["geometry"]) for f in features),
+    )
+
+
+_payloads: Dict[float, MapPayload] = {}
+_payloads_lock = threading.Lock()
+
+
+def map_payload(tolerance: float = MAP_DEFAULT_TOLERANCE) -> MapPayload:
+    """Toleransa ait hazır yük; ilk çağrıda tüm toleranslar birlikte hazırlanır"""
+    if tolerance not in MAP_TOLERANCES:
+        raise ValueError(f"Desteklenmeyen tolerans {tolerance}. Seçenekler: {MAP_TOLERANCES}")
+    payload = _payloads.get(tolerance)
+    if payload is None:
+        with _payloads_lock:
+            if not _payloads:
+                collection = json.loads(Path(MAP_GEOJSON_PATH).read_text(encoding="utf-8"))
+                for tol in MAP_TOLERANCES:
+                    _payloads[tol] = p = build_payload(collection, tol)
+                    logger.info(
+                        f"[HARITA] tolerans {tol}: {p.n_points} nokta, {len(p.body) / 1024:.0f} KB "
+                        f"(gzip {len(p.gzip) / 1024:.0f} KB)"
+                    )
+            payload = _payloads[tolerance]
+    return payload
+
+
+# ----------------- Anomali özeti -----------------
+def province_summary(out: pd.DataFrame) -> List[Dict]:
+    """
+    /anomalies satırlarından (sehir, donem, anomali, dev_pct) il başına:
+    kayıt, anomali sayısı, oran ve en son dönemin sapması / bayrağı
+    """
+    if out.empty:
+        return []
+    ordered = out.sort_values(["sehir", "donem"], kind="stable")
+    grouped = ordered.groupby("sehir", sort=True, observed=True)
+    counts = grouped["anomali"].agg(["size", "sum"])
+    last = grouped[["donem", "dev_pct", "anomali"]].last()
+    summary = pd.DataFrame({
+        "sehir": counts.index,
+        "key": [province_key(c) for c in counts.index],
+        "records": counts["size"].astype(int).to_numpy(),
+        "anomalies": counts["sum"].astype(int).to_numpy(),
+        "ratio": (counts["sum"] / counts["size"]).round(4).to_numpy(),
+        "latest_donem": last["donem"].to_numpy(),
+        "latest_dev_pct": last["dev_pct"].astype(float).round(4).to_numpy(),
+        "latest_anomali": last["anomali"].astype(bool).to_numpy(),
+    })
+    summary = summary.astype(object).where(summary.notna(), None)
+    return summary.to_dict(orient="records")
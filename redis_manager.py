@@ -1,5 +1,11 @@
+import logging
+
 import redis.asyncio as redis
 
+from metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
 # Redis istemcisi oluşturuluyor
 redis_client = redis.Redis(
     host="localhost",
@@ -11,11 +17,11 @@ async def test_connection():
     try:
         pong = await redis_client.ping()
         if pong:
-            print("[REDIS] Bağlantı başarılı ✅")
+            logger.info("[REDIS] Bağlantı başarılı ✅")
         else:
-            print("[REDIS] Bağlantı başarısız ❌")
+            logger.warning("[REDIS] Bağlantı başarısız ❌")
     except Exception as e:
-        print(f"[REDIS] Hata: {e}")
+        logger.error(f"[REDIS] Hata: {e}")
 # --------------------------------------------------
 # Önbellekleme (cache) işlemleri
 # --------------------------------------------------
@@ -27,9 +33,9 @@ async def set_cache(key: str, value: str, expire_seconds: int = 60):
     """
     try:
         await redis_client.set(key, value, ex=expire_seconds)
-        print(f"[CACHE] '{key}' anahtarı Redis'e kaydedildi ✅")
+        logger.debug(f"[CACHE] '{key}' anahtarı Redis'e kaydedildi ✅")
     except Exception as e:
-        print(f"[CACHE-ERROR] Veri kaydedilemedi: {e}")
+        logger.error(f"[CACHE-ERROR] Veri kaydedilemedi: {e}")
 
 async def get_cache(key: str):
     """
@@ -37,11 +43,18 @@ async def get_cache(key: str):
     """
     try:
         value = await redis_client.get(key)
+        record_cache("redis", bool(value))
         if value:
-            print(f"[CACHE] '{key}' için veri bulundu: {value}")
+            logger.debug(f"[CACHE] '{key}' için veri bulundu")
         else:
-            print(f"[CACHE] '{key}' anahtarı bulunamadı 🚫")
+            logger.debug(f"[CACHE] '{key}' anahtarı bulunamadı 🚫")
         return value
     except Exception as e:
-        print(f"[CACHE-ERROR] Veri okunamadı: {e}")
-        return None
\ No newline at end of file
+        logger.error(f"[CACHE-ERROR] Veri okunamadı: {e}")
+        return None
+async def close_connection():
+    """Kapanışta bağlantı havuzunu boşalt"""
+    try:
+        await redis_client.aclose()
+    except Exception as e:
+        logger.warning(f"[REDIS] Kapatılamadı: {e}")
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+robust_detector.py - Grup bazlı vektörel MAD (robust z) anomali tespiti
+- Medyan ve MAD tüm şehirler (isteğe bağlı şehir x ay) için tek groupby
+  transform'uyla hesaplanır; şehir başına Python döngüsü yoktur
+- robust_z = 0.6745 * (x - medyan) / MAD,  |z| > eşik -> anomali
+- MAD = 0 / NaN olan gruplarda bayrak kalkmaz (anomali_pipeline ile aynı kural)
+- Şehir x ay gruplarında değer sayısı min_count'un altındaysa şehir düzeyi
+  medyan/MAD kullanılır (2-3 yıllık veride ay grupları çok küçük kalır)
+"""
+
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAD_SCALE = 0.6745
+DEFAULT_THR = 3.5
+MIN_GROUP_COUNT = 6
+
+
+def groupwise_median_mad(values: pd.Series, keys: Sequence) -> Tuple[pd.Series, pd.Series, pd.Series]:
+    """Satıra hizalı (medyan, MAD, grup_sayısı); NaN değerler hesaba katılmaz"""
+    grouped = values.groupby(list(keys), observed=True, sort=False)
+    med = grouped.transform("median")
+    count = grouped.transform("count")
+    mad = (values - med).abs().groupby(list(keys), observed=True, sort=False).transform("median")
+    return med, mad, count
+
+
+def median_mad(values: pd.Series, city: Optional[pd.Series] = None, month: Optional[pd.Series] = None,
+               min_count: int = MIN_GROUP_COUNT) -> Tuple[pd.Series, pd.Series]:
+    """
+    Şehir (city verilirse) veya şehir x ay (month da verilirse) medyan / MAD.
+    İkisi de yoksa tüm seri tek grup sayılır.
+    """
+    if city is None:
+        city = pd.Series(0, index=values.index)
+    med, mad, _ = groupwise_median_mad(values, [city])
+    if month is not None:
+        med_m, mad_m, count_m = groupwise_median_mad(values, [city, month])
+        use_month = count_m >= min_count
+        med = med_m.where(use_month, med)
+        mad = mad_m.where(use_month, mad)
+    return med, mad
+
+
+def robust_z(values: pd.Series, city: Optional[pd.Series] = None, month: Optional[pd.Series] = None,
+             min_count: int = MIN_GROUP_COUNT) -> pd.Series:
+    """MAD'i 0 / NaN olan satırlarda NaN"""
+    med, mad = median_mad(values, city, month, min_count)
+    return MAD_SCALE * (values - med) / mad.where(mad > 0)
+
+
+def mad_anomalies(values: pd.Series, city: Optional[pd.Series] = None, month: Optional[pd.Series] = None,
+                  thr: float = DEFAULT_THR, min_count: int = MIN_GROUP_COUNT):
+    """
+    detect_anomalies ile aynı biçim: (bayraklar, alt_limit, ust_limit).
+    Limitler değerin kendi ölçeğindedir: medyan ± eşik * MAD / 0.6745
+    """
+    med, mad = median_mad(values, city, month, min_count)
+    mad = mad.where(mad > 0)
+    half_width = thr * mad / MAD_SCALE
+    alt_limit = med - half_width
+    ust_limit = med + half_width
+    flags = ((values < alt_limit) | (values > ust_limit)) & mad.notna()
+    return flags, alt_limit, ust_limit
+
+
+def mad_anomaly_flags(values: pd.Series, city: Optional[pd.Series] = None, month: Optional[pd.Series] = None,
+                      thr: float = DEFAULT_THR, min_count: int = MIN_GROUP_COUNT) -> pd.Series:
+    z = robust_z(values, city, month, min_count)
+    return (np.abs(z) > thr).fillna(False).astype(bool)
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+shared_snapshot.py - Model setini uvicorn işçileri arasında paylaşma
+- Bir süreç işlenmiş çerçeveleri, hedef başına X/y matrislerini ve derlenmiş
+  ormanları SHARED_MODEL_DIR/<sürüm>/ altına .npy / .forest dosyaları olarak yazar
+- Diğer işçiler aynı dosyaları np.load(mmap_mode="r") ile salt-okunur bağlar;
+  sayfa önbelleği tek kopyadır, işçi sayısı arttıkça bellek sabit kalır
+- Kurulumu dosya kilidi sıralar: ilk işçi kurar, kalanlar hazır sürüme bağlanır
+- CURRENT dosyası yayındaki sürümü gösterir; atomik olarak değiştirilir
+
+Dizin düzeni:
+    <kök>/CURRENT
+    <kök>/<sürüm>/manifest.json
+    <kök>/<sürüm>/frames/{train,test}/<kolon>.npy
+    <kök>/<sürüm>/xy/<hedef>/{Xtr,Xte,ytr,yte}.npy
+    <kök>/<sürüm>/models/<kategori>.forest   (sklearn dışı arka uçlar: .joblib)
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from forest_engine import CompiledForest
+from model_backends import FitReport
+
+logger = logging.getLogger(__name__)
+
+SHARED_KEEP_VERSIONS = int(os.getenv("SHARED_KEEP_VERSIONS", "2"))
+_FRAMES = ("train", "test")
+_XY = ("Xtr", "Xte", "ytr", "yte")
+
+
+@contextmanager
+def _exclusive_lock(path: Path):
+    """Süreçler arası kilit (POSIX: fcntl, Windows: msvcrt)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        try:
+            import fcntl
+            fcntl.flock(f, fcntl.LOCK_EX)
+            unlock = lambda: fcntl.flock(f, fcntl.LOCK_UN)
+        except ImportError:
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.1)
+            unlock = lambda: msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        try:
+            yield
+        finally:
+            unlock()
+
+
+def _safe_name(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else f"_{ord(c):x}_" for c in str(name))
+
+
+# ----------------- Yazma -----------------
+def _write_frame(df: pd.DataFrame, folder: Path) -> Dict:
+    folder.mkdir(parents=True, exist_ok=True)
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        entry = {"name": col, "file": f"{i:03d}_{_safe_name(col)}.npy"}
+        if isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == object:
+            cat = series.astype("category")
+            entry["kind"] = "category" if isinstance(series.dtype, pd.CategoricalDtype) else "object"
+            entry["categories"] = [str(c) for c in cat.cat.categories]
+            values = cat.cat.codes.to_numpy()
+        else:
+            entry["kind"] = "array"
+            values = series.to_numpy()
+        np.save(folder / entry["file"], np.ascontiguousarray(values), allow_pickle=False)
+        columns.append(entry)
+    return {"columns": columns, "rows": len(df)}
+
+
+def _write_model(info: dict, folder: Path, category: str) -> Dict:
+    folder.mkdir(parents=True, exist_ok=True)
+    model = info["model"]
+    meta = {k: v for k, v in info.items() if k not in ("model", "fit_report")}
+    meta["fit_report"] = asdict(info["fit_report"]) if info.get("fit_report") else None
+    if isinstance(model, CompiledForest):
+        meta["file"] = f"{category}.forest"
+        model.save(folder / meta["file"])
+    else:
+        import joblib
+        meta["file"] = f"{category}.joblib"
+        joblib.dump(model, folder / meta["file"])
+    return meta
+
+
+def write_snapshot(model_set, root) -> Path:
+    """ModelSet'i <kök>/<sürüm>/ altına yaz ve CURRENT'i ona çevir"""
+    root = Path(root)
+    final = root / model_set.version
+    staging = root / f".{model_set.version}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+
+    manifest = {
+        "version": model_set.version,
+        "data_version": model_set.data_version,
+        "created_at": model_set.created_at,
+        "frames": {},
+        "xy": {},
+        "models": {},
+    }
+    for name, df in zip(_FRAMES, model_set.frames()):
+        manifest["frames"][name] = _write_frame(df, staging / "frames" / name)
+
+    for category, info in model_set.ready_models().items():
+        target = info["target_col"]
+        Xtr, Xte, ytr, yte = model_set.train_test(target)
+        folder = staging / "xy" / _safe_name(target)
+        folder.mkdir(parents=True, exist_ok=True)
+        for key, value in zip(_XY, (Xtr, Xte, ytr, yte)):
+            np.save(folder / f"{key}.npy", np.ascontiguousarray(value.to_numpy(dtype=np.float32)), allow_pickle=False)
+        manifest["xy"][target] = {"folder": _safe_name(target), "feature_cols": list(Xtr.columns)}
+        manifest["models"][category] = _write_model(info, staging / "models", category)
+
+    (staging / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, default=str), encoding="utf-8")
+    shutil.rmtree(final, ignore_errors=True)
+    staging.replace(final)
+
+    pointer = root / "CURRENT.tmp"
+    pointer.write_text(model_set.version, encoding="utf-8")
+    pointer.replace(root / "CURRENT")
+    logger.info(f"[SHARED] {model_set.version} yayınlandı -> {final}")
+    _prune(root, keep=SHARED_KEEP_VERSIONS)
+    return final
+
+
+def _prune(root: Path, keep: int):
+    """Eski sürümleri sil (bağlı işçilerin mmap'leri silinen inode'ları okumaya devam eder)"""
+    versions = sorted((p for p in root.iterdir() if p.is_dir() and not p.name.startswith(".")),
+                      key=lambda p: p.stat().st_mtime, reverse=True)
+    for old in versions[keep:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+# ----------------- Bağlanma -----------------
+def current_version(root) -> Optional[str]:
+    pointer = Path(root) / "CURRENT"
+    return pointer.read_text(encoding="utf-8").strip() if pointer.exists() else None
+
+
+def _read_frame(meta: Dict, folder: Path) -> pd.DataFrame:
+    data = {}
+    for entry in meta["columns"]:
+        values = np.load(folder / entry["file"], mmap_mode="r")
+        if entry["kind"] == "array":
+            data[entry["name"]] = values
+        else:
+            col = pd.Categorical.from_codes(np.asarray(values), categories=entry["categories"])
+            data[entry["name"]] = col if entry["kind"] == "category" else col.astype(object)
+    # copy=False: kolonlar mmap görünümü olarak kalır, blok birleştirme yapılmaz
+    return pd.DataFrame(data, copy=False)
+
+
+def attach_snapshot(root, version: Optional[str] = None):
+    """Yayındaki (veya verilen) sürüme salt-okunur bağlan ve ModelSet döndür"""
+    from model_registry import ModelSet
+
+    root = Path(root)
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"{root} altında yayınlanmış model seti yok")
+    base = root / version
+    manifest = json.loads((base / "manifest.json").read_text(encoding="utf-8"))
+
+    frames = [_read_frame(manifest["frames"][name], base / "frames" / name) for name in _FRAMES]
+    model_set = ModelSet(*frames, version=manifest["version"], data_version=manifest["data_version"])
+    model_set.created_at = manifest["created_at"]
+
+    for target, spec in manifest["xy"].items():
+        folder = base / "xy" / spec["folder"]
+        arrays = {key: np.load(folder / f"{key}.npy", mmap_mode="r") for key in _XY}
+        model_set.set_train_test(target, (
+            pd.DataFrame(arrays["Xtr"], columns=spec["feature_cols"], copy=False),
+            pd.DataFrame(arrays["Xte"], columns=spec["feature_cols"], copy=False),
+            pd.Series(arrays["ytr"], name=target, copy=False),
+            pd.Series(arrays["yte"], name=target, copy=False),
+        ))
+
+    for category, meta in manifest["models"].items():
+        path = base / "models" / meta["file"]
+        if path.suffix == ".forest":
+            model = CompiledForest.load(path, mmap=True)
+        else:
+            import joblib
+            model = joblib.load(path, mmap_mode="r")
+        info = {k: v for k, v in meta.items() if k not in ("file", "fit_report")}
+        info["model"] = model
+        info["fit_report"] = FitReport(**meta["fit_report"]) if meta.get("fit_report") else None
+        model_set.adopt(category, info)
+
+    logger.info(f"[SHARED] {version} bağlandı ({len(manifest['models'])} model, mmap)")
+    return model_set
+
+
+def attach_or_build(root, build):
+    """
+    Kilit altında: yayınlanmış sürüm varsa ona bağlan, yoksa build() ile kur,
+    yaz ve bağlan. Aynı anda başlayan işçilerden sadece ilki kurar.
+    """
+    root = Path(root)
+    with _exclusive_lock(root / ".build.lock"):
+        if current_version(root) is None:
+            write_snapshot(build(), root)
+    return attach_snapshot(root)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+single_flight.py - Aynı hesaplamanın eşzamanlı isteklerini tek çalıştırmaya bağlama
+- Anahtar: normalize edilmiş istek parametreleri + model seti sürümü (veri sürümünü içerir)
+- İlk gelen (leader) hesaplar, aynı anahtarla gelenler sonucu bekler ve paylaşır;
+  hata tüm bekleyenlere aynen iletilir
+- Sonuç saklanmaz: hesaplama bitince anahtar düşer, sonraki istek yeniden hesaplar
+  (sürüm bazlı önbellek / 304 ayrı katmanlarda)
+FastAPI senkron handler'ları threadpool'da çalıştığından threading tabanlıdır.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from metrics import SINGLE_FLIGHT_CALLS
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """flight.do(key, fn): key için devam eden çağrı varsa onun sonucunu döndür"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            SINGLE_FLIGHT_CALLS.inc(flight=self.name, role="shared")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        SINGLE_FLIGHT_CALLS.inc(flight=self.name, role="leader")
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+            if call.waiters:
+                logger.debug(f"[FLIGHT] {self.name} {key}: {call.waiters} istek paylaştı")
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
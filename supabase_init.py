@@ -1,13 +1,10 @@
-from supabase import create_client
-import os
 from dotenv import load_dotenv
 
+from data_source import SupabaseManager
+
 # .env dosyasındaki değişkenleri yükle
 load_dotenv()
 
-# Ortam değişkenlerini al
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-# Supabase istemcisini oluştur
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Tek Supabase istemcisi: data_source.SupabaseManager ile aynı nesne,
+# bağlantılar http_client'taki paylaşılan havuzdan geçer
+supabase = SupabaseManager().client
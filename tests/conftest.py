@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Modüller depo kökünde düz yerleşimli
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
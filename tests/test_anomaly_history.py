@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+import anomaly_history
+
+
+def test_history_is_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("ANOMALY_HISTORY_DB", raising=False)
+    import importlib
+    module = importlib.reload(anomaly_history)
+    try:
+        assert module.ANOMALY_HISTORY_DB == ""
+        assert module.get_history() is None
+    finally:
+        importlib.reload(anomaly_history)
+
+
+def test_history_records_once_under_configured_path(tmp_path):
+    history = anomaly_history.AnomalyHistory(tmp_path / "h.db")
+    frame = pd.DataFrame({
+        "sehir": ["ADANA", "ADANA"], "donem": ["2024-01-01", "2024-02-01"],
+        "gercek": [1.0, 2.0], "tahmin": [1.0, 1.0], "residual": [0.0, 1.0], "anomali": [False, True],
+        "baseline": [1.0, 1.0], "dev_pct": [0.0, 100.0], "alt_limit": [0.0, 0.0], "ust_limit": [2.0, 2.0],
+    })
+    try:
+        assert history.record("genel", "v1", None, "iqr", {"k": 1.5}, frame)
+        assert not history.record("genel", "v1", None, "iqr", {"k": 1.5}, frame)
+        history.flush()
+        assert len(history.runs("genel")) == 1
+        assert history.rows("genel", only_anomalies=True)["donem"].tolist() == ["2024-02-01"]
+    finally:
+        history.close()
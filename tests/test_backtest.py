@@ -0,0 +1,30 @@
+import numpy as np
+import pandas as pd
+
+import backtest
+from veri_cek import CITY_COL, DATE_COL, TARGET, add_time_features
+
+MONTHS = pd.date_range("2022-01-01", periods=30, freq="MS")
+
+
+def _frames():
+    rows = [{DATE_COL: date, CITY_COL: city, TARGET: 1000.0 * (c + 1) + i, "sicaklik": 15.0}
+            for c, city in enumerate(["ANKARA", "İSTANBUL"]) for i, date in enumerate(MONTHS)]
+    df = pd.DataFrame(rows)
+    train = add_time_features(df[df[DATE_COL] < MONTHS[24]].reset_index(drop=True))
+    test = add_time_features(df[df[DATE_COL] >= MONTHS[24]].reset_index(drop=True))
+    return train, test
+
+
+def test_cache_is_keyed_by_feature_schema(tmp_path, monkeypatch):
+    train, test = _frames()
+    root = backtest.cache_matrices(train, test, ["genel"], tmp_path, data_version="data1")
+    assert root == tmp_path / "data1" / backtest.feature_schema()
+    assert (root / "genel" / "columns.json").exists()
+    assert np.load(root / "genel" / "X.npy").shape[0] == len(train) + len(test)
+
+    # özellik sürümü artınca eski matrisler kullanılmaz, yeni dizine yeniden üretilir
+    monkeypatch.setattr(backtest, "FEATURE_SCHEMA_VERSION", backtest.FEATURE_SCHEMA_VERSION + 1)
+    bumped = backtest.cache_matrices(train, test, ["genel"], tmp_path, data_version="data1")
+    assert bumped != root and bumped.parent == root.parent
+    assert (bumped / "genel" / "columns.json").exists()
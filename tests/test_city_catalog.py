@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+
+import city_catalog
+from city_catalog import CityCatalog, catalog_for, fold_city
+from veri_cek import CITY_COL, DATE_COL, TARGET
+
+CITIES = ["İZMİR", "İSTANBUL", "KAHRAMANMARAŞ", "MARDİN", "AFYONKARAHİSAR", "ŞANLIURFA", "VAN"]
+MONTHS = pd.date_range("2023-01-01", periods=12, freq="MS")
+
+
+def _frames():
+    df = pd.DataFrame([{DATE_COL: d, CITY_COL: c, TARGET: 100.0 + i}
+                       for c in CITIES for i, d in enumerate(MONTHS)])
+    df[CITY_COL] = df[CITY_COL].astype("category")
+    test = df[df[DATE_COL] >= MONTHS[9]].reset_index(drop=True)
+    train = df[(df[DATE_COL] < MONTHS[9]) & (df[CITY_COL] != "VAN")].reset_index(drop=True)
+    return train, test
+
+
+@pytest.fixture
+def catalog():
+    train, test = _frames()
+    return CityCatalog(train, test, {"genel": TARGET}, "test")
+
+
+@pytest.mark.parametrize("spelling", ["İZMİR", "izmir", "IZMIR", "İzmir", " izmir ", "Izmır"])
+def test_fold_city_turkish_case_and_accents(spelling):
+    assert fold_city(spelling) == "IZMIR"
+
+
+def test_fold_city_normalizes_separators():
+    assert fold_city("afyon-karahisar") == fold_city("AFYON  KARAHİSAR") == "AFYON KARAHISAR"
+    assert fold_city("Şanlıurfa") == fold_city("SANLIURFA") == "SANLIURFA"
+
+
+@pytest.mark.parametrize("spelling", ["İZMİR", "izmir", "IZMIR"])
+def test_resolve_folds_to_canonical_name(catalog, spelling):
+    assert catalog.resolve(spelling) == "İZMİR"
+
+
+def test_resolve_unknown_city(catalog):
+    assert catalog.resolve("Kahramanmars") is None
+    assert catalog.resolve("") is None
+
+
+def test_suggest_fuzzy_match(catalog):
+    assert catalog.suggest("Kahramanmars")[0] == "KAHRAMANMARAŞ"
+    assert catalog.suggest("istanbu")[0] == "İSTANBUL"          # alt dizi önce gelir
+    assert catalog.suggest("sanliurfa")[0] == "ŞANLIURFA"
+
+
+def test_suggest_limits_and_filters(catalog):
+    assert catalog.suggest("") == []
+    assert catalog.suggest("QQQQ") == []
+    assert len(catalog.suggest("a", limit=2)) == 2
+
+
+def test_city_report_counts_and_suggestions(catalog):
+    report = catalog.city_report("izmir")
+    assert report["resolved_city"] == "İZMİR" and report["suggestions"] == []
+    genel = report["results"]["genel"]
+    assert (genel["train_records"], genel["test_records"]) == (9, 3)
+    assert genel["test_range"] == ["2023-10-01", "2023-12-01"]
+
+    missing = catalog.city_report("Kahramanmars")
+    assert missing["resolved_city"] is None
+    assert missing["suggestions"][0] == "KAHRAMANMARAŞ"
+    assert missing["summary"]["total_test_records"] == 0
+
+
+def test_all_cities_marks_test_only_cities(catalog):
+    details = catalog.all_cities()["city_details"]
+    assert details["VAN"]["in_both"] is False and details["VAN"]["test_records"] == 3
+    assert details["İZMİR"]["in_both"] is True
+
+
+def test_catalog_for_reuses_by_data_version(monkeypatch):
+    monkeypatch.setattr(city_catalog, "_catalogs", type(city_catalog._catalogs)())
+    train, test = _frames()
+    first = catalog_for(train, test, {"genel": TARGET}, "d1")
+    assert catalog_for(train, test, {"genel": TARGET}, "d1") is first
+    for version in ("d2", "d3"):
+        catalog_for(train, test, {"genel": TARGET}, version)
+    assert catalog_for(train, test, {"genel": TARGET}, "d1") is not first     # taşan sürüm atıldı
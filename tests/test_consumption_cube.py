@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import veri_cek
+from consumption_cube import ConsumptionCube
+from veri_cek import CITY_COL, DATE_COL, TARGET, impute_city_month
+
+MESKEN = "Mesken_MWh"
+MONTHS = pd.date_range("2021-01-01", periods=30, freq="MS")
+
+
+def _frame(seed: int = 0, holes: float = 0.15) -> pd.DataFrame:
+    """3 şehir x 30 ay, karışık satır sırası ve rastgele eksik değerler"""
+    rng = np.random.default_rng(seed)
+    rows = [{CITY_COL: city, DATE_COL: date, TARGET: rng.uniform(100, 1000), MESKEN: rng.uniform(10, 100)}
+            for city in ("ANKARA", "İZMİR", "VAN") for date in MONTHS]
+    df = pd.DataFrame(rows).sample(frac=1.0, random_state=seed).reset_index(drop=True)
+    for col in (TARGET, MESKEN):
+        df.loc[rng.random(len(df)) < holes, col] = np.nan
+    df[CITY_COL] = df[CITY_COL].astype("category")
+    return df
+
+
+def test_lag_and_rolling_match_groupby():
+    df = _frame().sort_values([CITY_COL, DATE_COL], ignore_index=True)
+    cube = ConsumptionCube.from_frame(df, [TARGET])
+    assert cube.is_contiguous()
+    grouped = df.groupby(CITY_COL, observed=True)[TARGET]
+    for k in (1, 2, 3, 12):
+        np.testing.assert_array_equal(cube.take(cube.lag(k, TARGET)), grouped.shift(k).to_numpy())
+    for w in (3, 12):
+        expected = grouped.rolling(w, min_periods=1).mean().reset_index(level=0, drop=True)
+        np.testing.assert_allclose(cube.take(cube.rolling_mean(w, TARGET)), expected.to_numpy(), rtol=1e-12)
+
+
+def _groupby_impute(df, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(veri_cek, "_impute_cube", lambda *_: None)
+        return impute_city_month(df.copy())
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_imputed_matches_groupby(dtype, monkeypatch):
+    df = _frame(seed=1, holes=0.3).astype({TARGET: dtype, MESKEN: dtype})
+    df.loc[df[CITY_COL] == "VAN", MESKEN] = np.nan           # şehir-ay ve şehir ortalaması yok: genel ortalama
+
+    expected = _groupby_impute(df, monkeypatch)
+    out = impute_city_month(df.copy())
+
+    assert not out[[TARGET, MESKEN]].isna().any().any()
+    assert out[TARGET].dtype == dtype
+    pd.testing.assert_frame_equal(out, expected, check_exact=False, rtol=1e-6)
+
+
+def test_impute_falls_back_to_groupby_on_duplicates(monkeypatch):
+    df = _frame(seed=2)
+    df = pd.concat([df, df.iloc[:5]], ignore_index=True)
+    with pytest.raises(ValueError):
+        ConsumptionCube.from_frame(df, [TARGET])
+
+    out = impute_city_month(df.copy())
+    pd.testing.assert_frame_equal(out, _groupby_impute(df, monkeypatch))
+
+
+def test_to_frame_round_trip():
+    df = _frame(seed=3)
+    cube = ConsumptionCube.from_frame(df, [TARGET, MESKEN])
+    lag1 = cube.lag(1, TARGET)
+
+    out = cube.to_frame({"lag1": lag1}, dtype=np.float64)
+    expected = df.sort_values([CITY_COL, DATE_COL], ignore_index=True)
+
+    pd.testing.assert_frame_equal(out[[CITY_COL, DATE_COL, TARGET, MESKEN]], expected, check_categorical=False)
+    grouped = expected.groupby(CITY_COL, observed=True)[TARGET].shift(1)
+    np.testing.assert_array_equal(out["lag1"].to_numpy(), grouped.to_numpy())
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+import pytest
+
+import data_source
+
+
+class _Query:
+    """PostgREST sorgu kurucusunun küçük taklidi: olmayan kolona .order() hata verir"""
+
+    def __init__(self, rows, calls):
+        self.rows, self.calls, self.orders = rows, calls, []
+
+    def select(self, _cols):
+        return self
+
+    def eq(self, col, value):
+        self.rows = [r for r in self.rows if r[col] == value]
+        return self
+
+    def order(self, col):
+        if self.rows and col not in self.rows[0]:
+            raise RuntimeError(f"column {col} does not exist")
+        self.orders.append(col)
+        return self
+
+    def range(self, start, end):
+        self.calls.append(("range", tuple(self.orders), start, end))
+        self.bounds = (start, end)
+        return self
+
+    def execute(self):
+        # Sırasız sorgu her seferinde farklı sırada dönebilir: ters çevirerek taklit et
+        rows = sorted(self.rows, key=lambda r: tuple(r[c] for c in self.orders)) if self.orders else self.rows[::-1]
+        if not self.orders:
+            self.rows.reverse()
+        start, end = self.bounds
+        return type("Res", (), {"data": rows[start:end + 1]})()
+
+
+class _Client:
+    def __init__(self, tables):
+        self.tables, self.calls = tables, []
+
+    def table(self, name):
+        return _Query(list(self.tables[name]), self.calls)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    tables = {
+        "genel_elektrik": [{"Sehir": s, "Donem": f"2024-{m:02d}-01", "v": float(i)}
+                           for i, (s, m) in enumerate((s, m) for m in range(12, 0, -1) for s in ("B", "A", "C"))],
+        # Şehir kolonu olmayan (ülke geneli) yardımcı tablo
+        "kur": [{"Donem": f"2024-{m:02d}-01", "usd": float(m)} for m in range(12, 0, -1)],
+        "hizmet": [{"id": i, "Sehir": "A", "Donem": "2024-01-01"} for i in range(11, -1, -1)],
+    }
+    fake = _Client(tables)
+    monkeypatch.setattr(data_source, "SupabaseManager", lambda: type("M", (), {"client": fake})())
+    return fake
+
+
+def test_supabase_pages_are_ordered(client):
+    df = data_source.SupabaseSource(page_size=5).fetch_table("genel_elektrik")
+
+    rows = client.tables["genel_elektrik"]
+    assert len(df) == len(rows) and not df.duplicated(["Sehir", "Donem"]).any()
+    assert all(call[1] == ("Sehir", "Donem") for call in client.calls[1:])
+    expected = pd.DataFrame(rows).sort_values(["Sehir", "Donem"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_table_without_city_orders_by_its_own_columns(client):
+    df = data_source.SupabaseSource(page_size=5).fetch_table("kur")
+
+    assert len(df) == 12 and not df.duplicated("Donem").any()
+    assert all(call[1] == ("Donem",) for call in client.calls[1:])
+
+
+def test_primary_key_wins_and_single_page_is_unordered(client):
+    source = data_source.SupabaseSource(page_size=5)
+    df = source.fetch_table("hizmet")
+    assert df["id"].tolist() == list(range(12))
+    assert all(call[1] == ("id",) for call in client.calls[1:])
+
+    client.calls.clear()
+    assert len(data_source.SupabaseSource(page_size=100).fetch_table("kur")) == 12
+    assert client.calls == [("range", (), 0, 99)]
+
+
+def test_fetch_tables_keeps_tables_without_city(client):
+    dfs = data_source.SupabaseSource(page_size=5).fetch_tables({"kur": "kur", "genel": "genel_elektrik"})
+    assert len(dfs["kur"]) == 12 and len(dfs["genel"]) == 36
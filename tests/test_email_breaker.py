@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+import email_service
+import http_client
+import identity_stub
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """identity_stub'ı ASGI üzerinden upstream olarak bağla; devre 2 hatada açılır"""
+    identity_stub.reset()
+    url = email_service.IDENTITY_TOOLKIT_URL
+    monkeypatch.setitem(http_client._async_clients, http_client._host_key(url),
+                        httpx.AsyncClient(transport=httpx.ASGITransport(app=identity_stub.app)))
+    monkeypatch.setattr(email_service, "_semaphore", None)
+    monkeypatch.setattr(email_service, "breaker", email_service.CircuitBreaker(failure_threshold=2, reset_after_s=0.05))
+    yield identity_stub
+    identity_stub.reset()
+
+
+async def _send(token: str = "token"):
+    return await email_service._post_send_oob(token, "k")
+
+
+async def _status(token: str = "token") -> int:
+    try:
+        await _send(token)
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def test_breaker_closed_open_half_open_closed(stub):
+    breaker = email_service.breaker
+
+    async def scenario():
+        stub.STATE.update(mode="error")
+        assert [await _status(), await _status()] == [502, 502]
+        assert breaker.state == "open"
+        calls = stub.CALLS["total"]
+        assert await _status() == 503                     # açıkken upstream'e gidilmez
+        assert stub.CALLS["total"] == calls
+
+        await asyncio.sleep(0.06)
+        assert breaker.state == "half_open"
+        assert await _status() == 502                     # başarısız deneme devreyi yeniden açar
+        assert breaker.state == "open"
+
+        await asyncio.sleep(0.06)
+        stub.STATE.update(mode="ok")
+        assert await _status() == 200
+        assert breaker.state == "closed" and breaker.failures == 0
+
+    asyncio.run(scenario())
+
+
+def _open_then_half_open(stub):
+    stub.STATE.update(mode="error")
+    breaker = email_service.breaker
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    stub.STATE.update(mode="ok")
+
+
+def test_cancelled_probe_releases_half_open(stub):
+    _open_then_half_open(stub)
+
+    async def scenario():
+        await asyncio.sleep(0.06)
+        stub.STATE.update(delay_s=5)
+        probe = asyncio.create_task(_send())
+        await asyncio.sleep(0.05)                         # deneme upstream'de bekliyor
+        assert await _status("other") == 503              # tek deneme kuralı
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        stub.STATE.update(delay_s=0)
+        assert await _status() == 200
+
+    asyncio.run(scenario())
+    assert email_service.breaker.state == "closed"
+
+
+def test_probe_cancelled_while_queued_releases_half_open(stub, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_MAX_CONCURRENCY", 1)
+    _open_then_half_open(stub)
+
+    async def scenario():
+        await asyncio.sleep(0.06)
+        semaphore = email_service._get_semaphore()
+        await semaphore.acquire()                         # tek yuva dolu: deneme sırada bekler
+        probe = asyncio.create_task(_send())
+        await asyncio.sleep(0.02)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        semaphore.release()
+        assert await _status() == 200
+
+    asyncio.run(scenario())
+
+
+def test_semaphore_limits_concurrent_upstream_calls(stub, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(email_service, "EMAIL_QUEUE_TIMEOUT_S", 0.05)
+    stub.STATE.update(delay_s=0.3)
+
+    async def scenario():
+        return await asyncio.gather(*(_status(f"t{i}") for i in range(5)))
+
+    statuses = asyncio.run(scenario())
+    assert sorted(statuses) == [200, 200, 503, 503, 503]
+    assert stub.CALLS["total"] == 2
+    assert email_service.breaker.state == "closed"        # sıra doluluğu devreyi açmaz
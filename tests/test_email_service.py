@@ -0,0 +1,98 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+import email_service
+import http_client
+
+VICTIM_EMAIL = "victim@example.com"
+VICTIM_TOKEN = "victim-token-1"
+REFRESHED_TOKEN = "victim-token-2"          # aynı kullanıcı, yenilenmiş token
+OTHER_TOKEN = "other-token"
+FORGED_TOKEN = "forged-token"              # gövdesinde victim uid'i olan imzasız token
+
+VERIFIED = {VICTIM_TOKEN: "victim-uid", REFRESHED_TOKEN: "victim-uid", OTHER_TOKEN: "other-uid"}
+
+
+def _verify_id_token(token):
+    if token not in VERIFIED:
+        raise email_service.auth.InvalidIdTokenError("Could not verify token signature.")
+    return {"uid": VERIFIED[token]}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Sahte Identity Toolkit + sahte firebase_admin doğrulaması"""
+    calls = []
+    app = FastAPI()
+
+    @app.post("/v1/accounts:sendOobCode")
+    async def send_oob_code(request: Request):
+        token = (await request.json())["idToken"]
+        calls.append(token)
+        if token not in VERIFIED:
+            return JSONResponse({"error": {"code": 400, "message": "INVALID_ID_TOKEN"}}, status_code=400)
+        return {"email": VICTIM_EMAIL if VERIFIED[token] == "victim-uid" else "other@example.com"}
+
+    url = email_service.IDENTITY_TOOLKIT_URL
+    monkeypatch.setitem(http_client._async_clients, http_client._host_key(url),
+                        httpx.AsyncClient(transport=httpx.ASGITransport(app=app)))
+    monkeypatch.setattr(email_service.auth, "verify_id_token", _verify_id_token)
+    monkeypatch.setattr(email_service, "_semaphore", None)
+    monkeypatch.setattr(email_service, "breaker", email_service.CircuitBreaker())
+    monkeypatch.setattr(email_service, "_recent", {})
+    monkeypatch.setattr(email_service, "_in_flight", {})
+    return calls
+
+
+def test_forged_token_is_rejected_before_cache_or_upstream(upstream):
+    async def scenario():
+        data, duplicate = await email_service.request_verification(VICTIM_TOKEN, api_key="k")
+        assert data["email"] == VICTIM_EMAIL and not duplicate
+        with pytest.raises(HTTPException) as err:
+            await email_service.request_verification(FORGED_TOKEN, api_key="k")
+        return err.value
+
+    err = asyncio.run(scenario())
+    assert err.status_code == 401
+    assert VICTIM_EMAIL not in str(err.detail)
+    assert upstream == [VICTIM_TOKEN]
+
+
+def test_forged_token_does_not_join_victim_in_flight_call(upstream):
+    async def scenario():
+        victim = asyncio.create_task(email_service.request_verification(VICTIM_TOKEN, api_key="k"))
+        forged = asyncio.create_task(email_service.request_verification(FORGED_TOKEN, api_key="k"))
+        return await asyncio.gather(victim, forged, return_exceptions=True)
+
+    victim, forged = asyncio.run(scenario())
+    assert victim == ({"email": VICTIM_EMAIL}, False)
+    assert isinstance(forged, HTTPException) and forged.status_code == 401
+    assert upstream == [VICTIM_TOKEN]
+
+
+def test_same_user_is_deduplicated_across_token_refresh(upstream):
+    async def scenario():
+        first = await email_service.request_verification(VICTIM_TOKEN, api_key="k")
+        second = await email_service.request_verification(VICTIM_TOKEN, api_key="k")
+        refreshed = await email_service.request_verification(REFRESHED_TOKEN, api_key="k")
+        return first, second, refreshed
+
+    first, second, refreshed = asyncio.run(scenario())
+    assert first == ({"email": VICTIM_EMAIL}, False)
+    assert second == refreshed == ({"email": VICTIM_EMAIL}, True)
+    assert upstream == [VICTIM_TOKEN]
+
+
+def test_different_users_are_not_deduplicated(upstream):
+    async def scenario():
+        return await asyncio.gather(email_service.request_verification(VICTIM_TOKEN, api_key="k"),
+                                    email_service.request_verification(OTHER_TOKEN, api_key="k"))
+
+    victim, other = asyncio.run(scenario())
+    assert victim == ({"email": VICTIM_EMAIL}, False)
+    assert other == ({"email": "other@example.com"}, False)
+    assert sorted(upstream) == sorted([VICTIM_TOKEN, OTHER_TOKEN])
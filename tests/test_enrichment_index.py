@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+from veri_cek import CITY_COL, DATE_COL, EnrichmentIndex, build_train_test_frames
+
+CITIES = ("ANKARA", "İZMİR", "VAN")
+MONTHS = pd.date_range("2022-01-01", periods=24, freq="MS")
+
+
+def _tables(seed: int = 0) -> dict:
+    """Küçük fikstür: aylık şehirli weather, şehirsiz hizmet, yıllık nufus"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame([{CITY_COL: c, DATE_COL: d, "Genel_Toplam_MWh": rng.uniform(100, 200)}
+                          for c in CITIES for d in MONTHS])
+    weather = pd.DataFrame([{CITY_COL: c, DATE_COL: d, "sicaklik": rng.uniform(-5, 35)}
+                            for c in CITIES for d in MONTHS[:-2]])      # son iki ay eksik
+    hizmet = pd.DataFrame({DATE_COL: MONTHS, "tufe": rng.uniform(1, 2, len(MONTHS))})
+    nufus = pd.DataFrame([{CITY_COL: c, DATE_COL: pd.Timestamp(f"{y}-12-31"), "nufus": 1000 * i + y}
+                          for i, c in enumerate(CITIES) for y in (2020, 2022)])
+    return {"train": frame[frame[DATE_COL].dt.year == 2022].reset_index(drop=True),
+            "test": frame[frame[DATE_COL].dt.year == 2023].reset_index(drop=True),
+            "weather": weather, "hizmet": hizmet, "nufus": nufus}
+
+
+def _old_merge(frame: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    """Eski _smart_merge: Donem (+ Sehir) üzerinde sol merge"""
+    keys = [DATE_COL] + ([CITY_COL] if CITY_COL in right.columns else [])
+    return frame.merge(right, on=keys, how="left")
+
+
+def test_monthly_tables_match_old_merge():
+    dfs = _tables()
+    train, test = build_train_test_frames(dfs)
+    for got, original in ((train, dfs["train"]), (test, dfs["test"])):
+        expected = _old_merge(_old_merge(original, dfs["weather"]), dfs["hizmet"])
+        pd.testing.assert_frame_equal(got.drop(columns="nufus"), expected)
+    assert test[test[DATE_COL] >= MONTHS[-2]]["sicaklik"].isna().all()
+    assert "nufus" not in dfs["train"].columns                  # girdi çerçeve değişmez
+
+
+def test_yearly_table_is_aligned_as_of():
+    dfs = _tables()
+    frame = pd.DataFrame({CITY_COL: ["VAN", "VAN", "VAN", "ANKARA", "MUŞ"],
+                          DATE_COL: pd.to_datetime(["2019-06-01", "2021-03-01", "2023-05-01",
+                                                    "2022-01-01", "2022-01-01"])})
+    got = EnrichmentIndex({"nufus": dfs["nufus"]}).enrich(frame)
+    # 2019: ilk kayıttan önce -> en yakın (2020); 2021 -> 2020; 2023 -> 2022; bilinmeyen şehir NaN
+    np.testing.assert_array_equal(got["nufus"].to_numpy(), [4020, 4020, 4022, 2022, np.nan])
+
+
+def test_duplicate_keys_keep_last_without_multiplying_rows():
+    dfs = _tables()
+    dup = dfs["weather"].iloc[[0]].assign(sicaklik=99.0)
+    weather = pd.concat([dfs["weather"], dup], ignore_index=True)
+    train, _ = build_train_test_frames({**dfs, "weather": weather})
+
+    assert len(train) == len(dfs["train"])
+    row = (train[CITY_COL] == dup[CITY_COL].iat[0]) & (train[DATE_COL] == dup[DATE_COL].iat[0])
+    assert train.loc[row, "sicaklik"].tolist() == [99.0]
+
+
+def test_table_without_city_column_broadcasts_to_all_cities():
+    dfs = _tables()
+    train, _ = build_train_test_frames(dfs)
+    per_month = train.groupby(DATE_COL)["tufe"].nunique()
+    assert (per_month == 1).all()
+    expected = dfs["hizmet"].set_index(DATE_COL)["tufe"].reindex(train[DATE_COL]).to_numpy()
+    np.testing.assert_array_equal(train["tufe"].to_numpy(), expected)
+
+
+def test_table_without_date_column_is_skipped():
+    dfs = _tables()
+    index = EnrichmentIndex({"hizmet": dfs["hizmet"].drop(columns=DATE_COL)})
+    assert index.tables == []
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from forest_engine import CompiledForest, compile_forest
+
+FEATURES = ["a", "b", "c", "d"]
+
+
+def _data(n=400, seed=0, missing=0.0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, len(FEATURES))) * [1.0, 1e3, 1e-3, 1e6]
+    y = X[:, 0] * 2 + np.sin(X[:, 1] / 1e3) + rng.normal(scale=0.1, size=n)
+    if missing:
+        X[rng.random(X.shape) < missing] = np.nan
+    return pd.DataFrame(X, columns=FEATURES), y
+
+
+def _edge_rows(model, n_features):
+    """Her eşiğin float32 komşuları: tam eşit, bir ulp altı / üstü ve float64 eşiğin kendisi"""
+    rows = []
+    for est in getattr(model, "estimators_", [model]):
+        t = est.tree_
+        for node in np.flatnonzero(t.children_left >= 0)[:40]:
+            thr = t.threshold[node]
+            t32 = np.float32(thr)
+            for v in (thr, t32, np.nextafter(t32, np.float32(np.inf)), np.nextafter(t32, np.float32(-np.inf))):
+                row = np.zeros(n_features)
+                row[t.feature[node]] = v
+                rows.append(row)
+    return np.asarray(rows)
+
+
+def _assert_matches(compiled, model, X):
+    np.testing.assert_allclose(compiled.predict(X), model.predict(X), rtol=1e-12, atol=1e-12)
+
+
+@pytest.mark.parametrize("model", [
+    DecisionTreeRegressor(random_state=0),
+    RandomForestRegressor(n_estimators=20, random_state=0),
+    ExtraTreesRegressor(n_estimators=10, random_state=0),
+])
+def test_compiled_matches_sklearn(model):
+    X, y = _data()
+    model.fit(X, y)
+    compiled = compile_forest(model, FEATURES)
+
+    X_test, _ = _data(seed=1)
+    _assert_matches(compiled, model, X_test)
+    edges = pd.DataFrame(_edge_rows(model, len(FEATURES)), columns=FEATURES)
+    _assert_matches(compiled, model, edges)
+    if isinstance(model, DecisionTreeRegressor):
+        # Tek ağaç: ortalama yok, yaprak değeri birebir aynı olmalı
+        np.testing.assert_array_equal(compiled.predict(edges), model.predict(edges))
+
+
+@pytest.mark.parametrize("model", [
+    DecisionTreeRegressor(random_state=0),
+    RandomForestRegressor(n_estimators=20, random_state=0),
+])
+def test_compiled_matches_sklearn_with_missing_values(model):
+    X, y = _data(missing=0.2)
+    model.fit(X, y)
+    compiled = compile_forest(model, FEATURES)
+
+    X_test, _ = _data(seed=2, missing=0.3)
+    X_test.iloc[:5] = np.nan                                  # tamamen eksik satırlar
+    _assert_matches(compiled, model, X_test)
+
+
+def test_column_order_and_shape_checks():
+    X, y = _data()
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    compiled = compile_forest(model)
+    assert compiled.feature_names == FEATURES
+    _assert_matches(compiled, model, X)
+    np.testing.assert_array_equal(compiled.predict(X[FEATURES[::-1]]), compiled.predict(X))
+    with pytest.raises(ValueError):
+        compiled.predict(X.to_numpy()[:, :2])
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_load_round_trip(tmp_path, mmap):
+    X, y = _data(missing=0.1)
+    model = RandomForestRegressor(n_estimators=10, random_state=0).fit(X, y)
+    compiled = compile_forest(model, FEATURES)
+
+    path = compiled.save(tmp_path / "genel.forest")
+    loaded = CompiledForest.load(path, mmap=mmap)
+
+    assert isinstance(loaded.feature, np.memmap) == mmap
+    assert loaded.feature_names == FEATURES and loaded.max_depth == compiled.max_depth
+    for name in ("feature", "threshold", "child", "value", "missing_left", "roots"):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(compiled, name))
+    X_test, _ = _data(seed=3, missing=0.2)
+    np.testing.assert_array_equal(loaded.predict(X_test), compiled.predict(X_test))
+    _assert_matches(loaded, model, X_test)
+
+
+def test_non_tree_models_are_not_compiled():
+    from sklearn.linear_model import LinearRegression
+    X, y = _data()
+    assert compile_forest(LinearRegression().fit(X, y)) is None
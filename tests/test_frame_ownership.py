@@ -0,0 +1,31 @@
+import pandas as pd
+
+from incremental_features import FeatureState
+from veri_cek import CITY_COL, DATE_COL, TARGET, build_train_test_frames
+
+
+def _table(cols):
+    return pd.DataFrame({DATE_COL: ["2024-01-01", "2024-02-01"], CITY_COL: ["ANKARA", "ANKARA"],
+                         **{c: [1.0, 2.0] for c in cols}})
+
+
+def test_build_train_test_frames_leaves_dfs_untouched():
+    dfs = {"train": _table([TARGET]), "test": _table([TARGET]), "weather": _table(["sicaklik"])}
+    before = {name: df.copy() for name, df in dfs.items()}
+
+    train, test = build_train_test_frames(dfs)
+
+    assert "sicaklik" in train.columns and "sicaklik" in test.columns
+    for name, df in dfs.items():
+        pd.testing.assert_frame_equal(df, before[name])
+
+
+def test_feature_state_append_leaves_rows_untouched():
+    state = FeatureState.from_history(_table([TARGET]))
+    rows = pd.DataFrame({DATE_COL: ["2024-03-01"], CITY_COL: ["ANKARA"], TARGET: [3.0]})
+    before = rows.copy()
+
+    out = state.append(rows)
+
+    pd.testing.assert_frame_equal(rows, before)
+    assert out[f"{TARGET}_lag1"].tolist() == [2.0]
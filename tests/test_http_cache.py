@@ -0,0 +1,24 @@
+import pytest
+
+import http_cache
+from http_cache import _choose_encoding
+
+
+@pytest.fixture(autouse=True)
+def no_brotli(monkeypatch):
+    monkeypatch.setattr(http_cache, "brotli", None)
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", "gzip"),
+    ("GZIP ; Q=0.5", "gzip"),
+    ("gzip;level=9", "gzip"),
+    ("gzip;foo=bar;q=0.8", "gzip"),
+    ("gzip;q=0", None),
+    ("gzip;foo=bar;q=0", None),
+    ("gzip;q=abc", None),
+    ("deflate, gzip;q=0.1", "gzip"),
+    ("", None),
+])
+def test_choose_encoding(header, expected):
+    assert _choose_encoding(header) == expected
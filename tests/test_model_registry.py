@@ -0,0 +1,50 @@
+import threading
+import time
+
+import model_registry
+
+
+def test_reload_scheduler_restarts_after_stop(monkeypatch):
+    calls = []
+    monkeypatch.setattr(model_registry, "reload_models", lambda: calls.append(threading.current_thread()))
+    monkeypatch.setattr(model_registry, "_scheduler_stop", threading.Event())
+
+    first = model_registry.start_reload_scheduler(interval_s=0.01)
+    time.sleep(0.05)
+    model_registry.stop_reload_scheduler()
+    first.join(timeout=1)
+    assert calls and not first.is_alive()
+
+    # Aynı süreçte ikinci lifespan: zamanlayıcı hemen çıkmamalı
+    calls.clear()
+    second = model_registry.start_reload_scheduler(interval_s=0.01)
+    time.sleep(0.05)
+    try:
+        assert second.is_alive() and calls
+        assert all(t is second for t in calls)
+    finally:
+        model_registry.stop_reload_scheduler()
+        second.join(timeout=1)
+    assert not second.is_alive()
+
+
+def test_compiled_models_are_written_per_version(tmp_path, monkeypatch):
+    import numpy as np
+    from sklearn.ensemble import RandomForestRegressor
+
+    monkeypatch.setattr(model_registry, "FOREST_ENGINE", "compiled")
+    monkeypatch.setattr(model_registry, "COMPILED_MODEL_DIR", str(tmp_path))
+    rng = np.random.default_rng(0)
+    X, y = rng.random((50, 3)), rng.random(50)
+    live = RandomForestRegressor(n_estimators=3, random_state=0).fit(X, y)
+    candidate = RandomForestRegressor(n_estimators=3, random_state=1).fit(X, y)
+
+    compiled = model_registry.compile_model("genel", live, ["a", "b", "c"], "v1")
+    expected = compiled.predict(X)
+    # Reddedilecek bir aday aynı kategoriyi derler: yayındaki dosya değişmez
+    model_registry.compile_model("genel", candidate, ["a", "b", "c"], "v2")
+    assert (tmp_path / "v1" / "genel.forest").exists() and (tmp_path / "v2" / "genel.forest").exists()
+    np.testing.assert_array_equal(compiled.predict(X), expected)
+
+    model_registry._prune_compiled({"v1"})
+    assert [p.name for p in tmp_path.iterdir()] == ["v1"]
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from city_catalog import CityCatalog
+from incremental_features import FeatureState
+from online_scoring import InvalidReadingsError, OnlineScorer
+from veri_cek import CITY_COL, DATE_COL, TARGET, add_time_features, month_key
+
+MESKEN = "Mesken_MWh"
+CITIES = ["İSTANBUL", "ANKARA"]
+MONTHS = pd.date_range("2022-01-01", periods=30, freq="MS")
+FEATURES = [f"{TARGET}_lag{k}" for k in (1, 2, 3, 12)] + [f"{TARGET}_roll{w}" for w in (3, 12)] + [
+    TARGET, MESKEN, "sicaklik", "month"]
+
+
+def _value(city_idx: int, i: int) -> float:
+    return 1000.0 * (city_idx + 1) + i
+
+
+def _frames():
+    rows = []
+    for c, city in enumerate(CITIES):
+        for i, date in enumerate(MONTHS):
+            rows.append({DATE_COL: date, CITY_COL: city, TARGET: _value(c, i),
+                         MESKEN: 10.0 * (c + 1) + i, "sicaklik": 15.0})
+    df = pd.DataFrame(rows)
+    train = add_time_features(df[df[DATE_COL] < MONTHS[24]].reset_index(drop=True))
+    test = add_time_features(df[df[DATE_COL] >= MONTHS[24]].reset_index(drop=True))
+    return train, test
+
+
+class Recorder:
+    """Özellikleri kaydedip 0 tahmin eden sahte model"""
+
+    def __init__(self):
+        self.X = None
+
+    def predict(self, X):
+        self.X = X.reset_index(drop=True)
+        return np.zeros(len(X))
+
+
+@pytest.fixture
+def scorer():
+    train, test = _frames()
+    catalog = CityCatalog(train, test, {"genel": TARGET, "mesken": MESKEN}, "test")
+    return OnlineScorer(train, test, [TARGET, MESKEN], catalog=catalog)
+
+
+@pytest.fixture
+def models():
+    return {
+        "genel": {"model": Recorder(), "target_col": TARGET, "feature_cols": [f for f in FEATURES if f != TARGET]},
+        "mesken": {"model": Recorder(), "target_col": MESKEN, "feature_cols": [f for f in FEATURES if f != MESKEN]},
+    }
+
+
+def _score(scorer, models, readings):
+    return scorer.score(pd.DataFrame(readings, columns=["sehir", "donem", "category", "value"]), models)
+
+
+def hist(i):
+    """ANKARA'nın i. ayı (MONTHS[i]) genel değeri"""
+    return _value(1, i)
+
+
+def test_next_month_matches_history(scorer, models):
+    _score(scorer, models, [("ANKARA", "2024-07", "genel", 5000.0)])
+    X = models["genel"]["model"].X.iloc[0]
+    assert X[f"{TARGET}_lag1"] == hist(29)
+    assert X[f"{TARGET}_lag12"] == hist(18)
+    assert X[f"{TARGET}_roll3"] == pytest.approx((hist(28) + hist(29) + 5000.0) / 3)
+
+
+def test_skipped_months_use_calendar_offsets(scorer, models):
+    # Son ay 2024-06; 2024-09 okumasında 07 ve 08 yok
+    _score(scorer, models, [("ANKARA", "2024-09", "genel", 5000.0)])
+    X = models["genel"]["model"].X.iloc[0]
+    assert X[f"{TARGET}_lag3"] == hist(29)
+    assert X[f"{TARGET}_lag12"] == hist(20)
+    # Eksik lag'ler geçmiş değerle değil kolon ortalamasıyla doldurulur
+    assert X[f"{TARGET}_lag1"] != hist(29)
+    assert X[f"{TARGET}_roll3"] == pytest.approx(5000.0)
+
+
+def test_multi_month_batch_chains_readings(scorer, models):
+    _score(scorer, models, [
+        ("ANKARA", "2024-08", "genel", 6000.0),
+        ("ANKARA", "2024-07", "genel", 5000.0),
+    ])
+    X = models["genel"]["model"].X
+    aug = X.iloc[0]
+    assert aug[f"{TARGET}_lag1"] == 5000.0
+    assert aug[f"{TARGET}_lag2"] == hist(29)
+    assert aug[f"{TARGET}_roll3"] == pytest.approx((hist(29) + 5000.0 + 6000.0) / 3)
+    jul = X.iloc[1]
+    assert jul[f"{TARGET}_lag1"] == hist(29)
+
+
+def test_rescoring_past_month(scorer, models):
+    # 2024-04 (MONTHS[27]) yeni değerle yeniden skorlanır
+    _score(scorer, models, [("ANKARA", "2024-04", "genel", 7777.0)])
+    X = models["genel"]["model"].X.iloc[0]
+    assert X[f"{TARGET}_lag1"] == hist(26)
+    assert X[f"{TARGET}_lag12"] == hist(15)
+    assert X[f"{TARGET}_roll3"] == pytest.approx((hist(25) + hist(26) + 7777.0) / 3)
+
+
+def test_month_older_than_buffer_is_rejected(scorer, models):
+    with pytest.raises(InvalidReadingsError):
+        _score(scorer, models, [("ANKARA", "2022-03", "genel", 1.0)])
+
+
+def test_duplicate_readings_are_rejected(scorer, models):
+    with pytest.raises(InvalidReadingsError):
+        _score(scorer, models, [("ANKARA", "2024-07", "genel", 1.0), ("ankara", "2024-07-01", "genel", 2.0)])
+
+
+def test_non_genel_reading_uses_same_month_values(scorer, models):
+    _score(scorer, models, [
+        ("ANKARA", "2024-07", "mesken", 99.0),
+        ("ANKARA", "2024-07", "genel", 5000.0),
+    ])
+    X = models["mesken"]["model"].X.iloc[0]
+    assert X[TARGET] == 5000.0
+    assert X[f"{TARGET}_roll3"] == pytest.approx((hist(28) + hist(29) + 5000.0) / 3)
+    G = models["genel"]["model"].X.iloc[0]
+    assert G[MESKEN] == 99.0
+
+
+def test_non_genel_reading_without_genel_uses_seasonal_baseline(scorer, models):
+    _score(scorer, models, [("ANKARA", "2024-07", "mesken", 99.0)])
+    X = models["mesken"]["model"].X.iloc[0]
+    july_train = [hist(6), hist(18)]      # 2022-07, 2023-07
+    assert X[TARGET] == pytest.approx(np.mean(july_train))
+    assert X[TARGET] != hist(29)          # son ayın şablon değeri değil
+    assert X[f"{TARGET}_roll3"] == pytest.approx((hist(28) + hist(29)) / 2)
+
+
+def test_city_names_resolve_through_catalog(scorer, models):
+    out = _score(scorer, models, [
+        ("istanbul", "2024-07", "genel", 1.0),
+        ("İstanbul", "2024-08", "genel", 2.0),
+        ("ISTANBUL", "2024-09", "genel", 3.0),
+    ])
+    assert out["sehir"].tolist() == ["İSTANBUL"] * 3
+
+
+def test_feature_state_append_with_gap():
+    train, _ = _frames()
+    history = train[[DATE_COL, CITY_COL, TARGET]]
+    state = FeatureState.from_history(history[history[DATE_COL] < MONTHS[20]])
+    rows = history[history[DATE_COL].isin([MONTHS[21], MONTHS[22]])].copy()   # MONTHS[20] atlandı
+    out = state.append(rows)
+    ank = out[out[CITY_COL] == "ANKARA"].reset_index(drop=True)
+    assert np.isnan(ank.loc[0, f"{TARGET}_lag1"])
+    assert ank.loc[0, f"{TARGET}_lag2"] == hist(19)
+    assert ank.loc[1, f"{TARGET}_lag1"] == hist(21)
+    assert ank.loc[1, f"{TARGET}_lag12"] == hist(10)
+    assert state.last_month[state.cities["ANKARA"]] == month_key(pd.Series([MONTHS[22]]))[0]
@@ -0,0 +1,39 @@
+import logging
+
+from province_map import _parse_default_tolerance, _parse_tolerances
+
+TOLERANCES = [0.005, 0.02, 0.05]
+
+
+def test_tolerances_parse_and_fall_back(caplog):
+    assert _parse_tolerances(None) == TOLERANCES
+    assert _parse_tolerances("0.01, 0.1") == [0.01, 0.1]
+    with caplog.at_level(logging.WARNING, logger="province_map"):
+        assert _parse_tolerances("0.01,abc") == TOLERANCES
+        assert _parse_tolerances("0,-1") == TOLERANCES
+    assert "MAP_TOLERANCES" in caplog.text
+
+
+def test_default_tolerance_must_be_an_option(caplog):
+    assert _parse_default_tolerance(None, TOLERANCES) == 0.02
+    assert _parse_default_tolerance("0.05", TOLERANCES) == 0.05
+    with caplog.at_level(logging.WARNING, logger="province_map"):
+        assert _parse_default_tolerance("abc", TOLERANCES) == 0.02
+        assert _parse_default_tolerance("0.03", TOLERANCES) == 0.02
+        assert _parse_default_tolerance("nan", [0.1]) == 0.1
+    assert caplog.text.count("MAP_DEFAULT_TOLERANCE") == 3
+
+
+def _payload():
+    from province_map import MapPayload
+    return MapPayload(tolerance=0.02, body=b"raw", gzip=b"gz", brotli=b"br", etag='"e"', n_points=0)
+
+
+def test_payload_encoding_respects_q_zero():
+    payload = _payload()
+    assert payload.encoded("br, gzip") == (b"br", "br")
+    assert payload.encoded("br;q=0, gzip") == (b"gz", "gzip")
+    assert payload.encoded("gzip;q=0") == (b"raw", None)
+    assert payload.encoded("br;q=0, gzip;q=0") == (b"raw", None)
+    assert payload.encoded("gzip;level=9") == (b"gz", "gzip")
+    assert payload.encoded("") == (b"raw", None)
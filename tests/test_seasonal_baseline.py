@@ -0,0 +1,65 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_registry import ModelSet
+from veri_cek import CITY_COL, DATE_COL, TARGET
+
+
+def _frames(duplicate: bool):
+    months = pd.date_range("2022-01-01", periods=24, freq="MS")
+    train = pd.DataFrame({
+        DATE_COL: np.tile(months, 2),
+        CITY_COL: np.repeat(["ANKARA", "IZMIR"], len(months)),
+        TARGET: np.arange(2 * len(months), dtype=np.float32) * 10,
+    })
+    if duplicate:
+        # Aynı şehir-ay için ikinci satır (ör. kaynakta tekrarlanan kayıt)
+        train = pd.concat([train, train.iloc[[3]].assign(**{TARGET: 999.0})], ignore_index=True)
+    train[CITY_COL] = train[CITY_COL].astype("category")
+    test = pd.DataFrame({
+        DATE_COL: pd.to_datetime(["2024-01-01", "2024-04-01", "2024-04-01"]),
+        CITY_COL: pd.Categorical(["ANKARA", "ANKARA", "BURSA"]),
+        TARGET: [1.0, 2.0, 3.0],
+    })
+    return train, test
+
+
+def _expected(train, test):
+    t = train.assign(ay=train[DATE_COL].dt.month)
+    means = t.groupby([CITY_COL, "ay"], observed=True)[TARGET].mean().rename("baseline").reset_index()
+    means[CITY_COL] = means[CITY_COL].astype(str)
+    probe = pd.DataFrame({CITY_COL: test[CITY_COL].astype(str), "ay": test[DATE_COL].dt.month})
+    return probe.merge(means, on=[CITY_COL, "ay"], how="left")["baseline"].to_numpy(dtype=np.float32)
+
+
+@pytest.mark.parametrize("duplicate", [False, True])
+def test_seasonal_baseline_matches_groupby(duplicate):
+    train, test = _frames(duplicate)
+    ms = ModelSet(train, test)
+    probe = test.assign(ay=test[DATE_COL].dt.month)
+    got = ms.seasonal_baseline(probe, TARGET)
+    np.testing.assert_allclose(got, _expected(train, test), rtol=1e-6)
+    assert np.isnan(got[2])          # train'de olmayan şehir
+
+
+def test_duplicate_city_month_rows_fall_back_without_error():
+    train, test = _frames(duplicate=True)
+    ms = ModelSet(train, test)
+    with pytest.raises(ValueError):
+        ms.cube("train")
+    probe = test.assign(ay=test[DATE_COL].dt.month)
+    # Aynı hata ikinci çağrıda da yakalanır; küp yeniden kurulmaya çalışılmaz
+    assert ms.seasonal_baseline(probe, TARGET).shape == (3,)
+    assert ms.seasonal_baseline(probe, TARGET)[1] == pytest.approx((30 + 150 + 999) / 3)
+
+
+def test_cube_does_not_wait_on_scorer_lock():
+    train, test = _frames(duplicate=False)
+    ms = ModelSet(train, test)
+    done = threading.Event()
+    with ms._scorer_lock:
+        threading.Thread(target=lambda: (ms.cube("train"), done.set()), daemon=True).start()
+        assert done.wait(5)
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+import shared_snapshot
+from forest_engine import CompiledForest, compile_forest
+from model_backends import FitReport
+from model_registry import ModelSet
+from veri_cek import CITY_COL, DATE_COL, TARGET
+
+MESKEN = "Mesken_MWh"
+MONTHS = pd.date_range("2022-01-01", periods=24, freq="MS")
+
+
+def _frames():
+    rng = np.random.default_rng(0)
+    rows = [{DATE_COL: d, CITY_COL: city, TARGET: rng.uniform(100, 200), MESKEN: rng.uniform(10, 20),
+             "bolge": "İç Anadolu" if city == "ANKARA" else "Ege", "month": d.month}
+            for city in ("ANKARA", "İZMİR") for d in MONTHS]
+    df = pd.DataFrame(rows).astype({TARGET: np.float32, MESKEN: np.float32, "month": np.int8})
+    df[CITY_COL] = df[CITY_COL].astype("category")
+    return df[df[DATE_COL] < MONTHS[18]].reset_index(drop=True), df[df[DATE_COL] >= MONTHS[18]].reset_index(drop=True)
+
+
+def _model_set(version="v1"):
+    train, test = _frames()
+    ms = ModelSet(train, test, version=version)
+    report = FitReport("rf", 0.1, 0.01, 0.9, 0.8, 5)
+    for category, target, estimator in (("genel", TARGET, RandomForestRegressor(n_estimators=5, random_state=0)),
+                                        ("mesken", MESKEN, LinearRegression())):
+        Xtr, _, ytr, _ = ms.train_test(target)
+        estimator.fit(Xtr, ytr)
+        model = compile_forest(estimator, list(Xtr.columns)) or estimator
+        ms.adopt(category, {"model": model, "target_col": target, "feature_cols": list(Xtr.columns),
+                            "train_score": 0.9, "test_score": 0.8, "backend": "rf", "fit_report": report})
+    return ms
+
+
+def test_snapshot_round_trip(tmp_path):
+    ms = _model_set()
+    shared_snapshot.write_snapshot(ms, tmp_path)
+    assert shared_snapshot.current_version(tmp_path) == "v1"
+    attached = shared_snapshot.attach_snapshot(tmp_path)
+
+    assert attached.version == ms.version and attached.data_version == ms.data_version
+    for original, loaded in zip(ms.frames(), attached.frames()):
+        pd.testing.assert_frame_equal(loaded.copy(), original)  # memmap -> ndarray
+        assert isinstance(loaded[CITY_COL].dtype, pd.CategoricalDtype)
+        assert loaded["bolge"].dtype == object
+        assert pd.api.types.is_datetime64_any_dtype(loaded[DATE_COL])
+
+    for category, info in ms.ready_models().items():
+        target = info["target_col"]
+        Xtr, Xte, ytr, yte = ms.train_test(target)
+        aXtr, aXte, aytr, ayte = attached.train_test(target)
+        pd.testing.assert_frame_equal(aXte.copy(), Xte.astype(np.float32))
+        np.testing.assert_array_equal(aytr.to_numpy(), ytr.to_numpy(dtype=np.float32))
+        assert isinstance(aXtr.to_numpy(), np.ndarray)
+
+        loaded = attached.ready_models()[category]
+        assert loaded["fit_report"] == info["fit_report"] and loaded["feature_cols"] == info["feature_cols"]
+        np.testing.assert_allclose(loaded["model"].predict(Xte), info["model"].predict(Xte), rtol=1e-6)
+
+    models = attached.ready_models()
+    assert isinstance(models["genel"]["model"], CompiledForest)
+    assert isinstance(models["genel"]["model"].feature, np.memmap)
+    assert isinstance(models["mesken"]["model"], LinearRegression)
+    assert sorted(p.name for p in (tmp_path / "v1" / "models").iterdir()) == ["genel.forest", "mesken.joblib"]
+
+
+def test_attach_without_snapshot_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        shared_snapshot.attach_snapshot(tmp_path)
+
+
+def test_attach_or_build_builds_once_across_workers(tmp_path):
+    builds = []
+
+    def build():
+        builds.append(threading.current_thread().name)
+        return _model_set()
+
+    results = [None] * 4
+
+    def worker(i):
+        results[i] = shared_snapshot.attach_or_build(tmp_path, build)
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"worker-{i}") for i in range(4)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+
+    assert len(builds) == 1                                     # ilk işçi kurar
+    assert all(r is not None and r.version == "v1" for r in results)
+    # Sonraki işçi kurmadan bağlanır
+    later = shared_snapshot.attach_or_build(tmp_path, build)
+    assert len(builds) == 1 and later.version == "v1"
+    assert isinstance(later.ready_models()["genel"]["model"].feature, np.memmap)
+
+
+def test_prune_keeps_latest_versions(tmp_path):
+    for i, version in enumerate(("v1", "v2", "v3")):
+        shared_snapshot.write_snapshot(_model_set(version), tmp_path)
+        os.utime(tmp_path / version, (time.time() + i, time.time() + i))
+    shared_snapshot._prune(tmp_path, keep=2)
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_dir()) == ["v2", "v3"]
+    assert shared_snapshot.current_version(tmp_path) == "v3"
@@ -11,15 +11,32 @@ import numpy as np
 import pandas as pd
 from pathlib import Path
 from dotenv import load_dotenv
-from supabase import create_client
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 import logging
 
+from profiling import StageProfiler, get_profiler
+from data_source import DataSource, SupabaseManager, get_data_source
+from metrics import supabase_write
+
 # ===================== KONFİGÜRASYON =====================
 DATE_COL = "Donem"
 CITY_COL = "Sehir"
 TARGET = "Genel_Toplam_MWh"
 LAGS = [1, 2, 3, 12]
+# Özellik üretimi (add_time_features / finalize_xy) anlamca değiştiğinde artırılır;
+# özellik matrisi önbellekleri (backtest) bu sürümle anahtarlanır
+FEATURE_SCHEMA_VERSION = 1
+
+# Tüm tüketim kategorileri - BOŞLUKSUZ ve DOĞRU
+CONSUMPTION_CATEGORIES = {
+    "genel": "Genel_Toplam_MWh",
+    "aydinlatma": "Aydinlatma_MWh", 
+    "mesken": "Mesken_MWh",
+    "sanayi": "Sanayi_MWh",
+    "tarimsal": "Tarımsal_Sulama_MWh",
+    "ticarethane": "Ticarethane_MWh",
+    "diger": "Diger_MWh"
+}
 
 # Tablo konfigürasyonu
 TABLES = {
@@ -31,63 +48,92 @@ TABLES = {
     "test": "test_2024_2025",
 }
 
+# Yardımcı tablolar (zenginleştirme sırası) ve yıllık hizalanan yavaş değişen tablolar
+ENRICH_TABLES = ["weather", "nufus", "hizmet"]
+YEARLY_TABLES = {"nufus"}
+
 # Logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Kompakt şema: ölçümler/özellikler float32, tam sayılar en küçük int tipi.
+# sklearn ağaçları X'i zaten float32'ye çevirdiği için tahminler değişmez.
+FLOAT_DTYPE = np.float32
+
 # ===================== OPTIMIZE YARDIMCILAR =====================
+# Not: Yardımcılar çerçeveyi YERİNDE günceller (kopya almaz). Pipeline tek bir
+# sahipli çerçeve üzerinde sıralı aşamalar olarak çalışır; çağıran taraf
+# girdiyi korumak istiyorsa kopyayı kendisi almalıdır. Dışarıdan çerçeve alan
+# giriş noktaları (EnrichmentIndex, build_train_test_frames) sığ kopya üzerinde
+# çalışır: yalnızca kolon atanır, çağıranın çerçevesi değişmez.
 def _to_datetime(df: pd.DataFrame) -> pd.DataFrame:
-    """Daha hızlı datetime dönüşümü"""
-    if DATE_COL not in df.columns:
-        return df.copy()
-    
-    df = df.copy()
-    # Daha hızlı datetime parsing
-    df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors='coerce', infer_datetime_format=True)
+    """Daha hızlı datetime dönüşümü (yerinde)"""
+    if DATE_COL in df.columns and not pd.api.types.is_datetime64_any_dtype(df[DATE_COL]):
+        df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors='coerce')
     return df
 
+def _numeric_columns(df: pd.DataFrame) -> List[str]:
+    """Sayısal kolon adları (select_dtypes gibi alt çerçeve kopyası üretmez)"""
+    return [
+        col for col, dtype in df.dtypes.items()
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+    ]
+
 def _numericize(df: pd.DataFrame) -> pd.DataFrame:
-    """Tüm sayısal kolonları optimize şekilde dönüştür"""
-    df = df.copy()
-    numeric_cols = df.select_dtypes(include=[np.number, 'object']).columns
-    
-    for col in numeric_cols:
-        if col not in [DATE_COL, CITY_COL]:
-            # Sadece gerçekten sayısal olması gereken kolonları dönüştür
-            if col == TARGET or col.endswith(('_MWh', '_lag', '_roll', 'sayi', 'deger', 'oran')):
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+    """Tüm sayısal kolonları optimize şekilde dönüştür (yerinde)"""
+    for col in df.columns:
+        if col in (DATE_COL, CITY_COL) or pd.api.types.is_numeric_dtype(df[col].dtype):
+            continue
+        # Sadece gerçekten sayısal olması gereken kolonları dönüştür
+        if col == TARGET or col.endswith(('_MWh', '_lag', '_roll', 'sayi', 'deger', 'oran')):
+            df[col] = pd.to_numeric(df[col], errors='coerce')
     
     return df
 
-def _smart_merge(left: pd.DataFrame, right: pd.DataFrame, how: str = "left") -> pd.DataFrame:
-    """Daha optimize merge işlemi"""
-    if left.empty:
-        return right.copy()
-    if right.empty:
-        return left.copy()
-        
-    left = _to_datetime(left.copy())
-    right = _to_datetime(right.copy())
+def _frame_mb(df: pd.DataFrame) -> float:
+    """Çerçevenin gerçek bellek kullanımı (MB)"""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
 
-    # Merge key'lerini belirle
-    merge_keys = [DATE_COL]
-    if CITY_COL in left.columns and CITY_COL in right.columns:
-        merge_keys.append(CITY_COL)
-    
-    # Gereksiz kolonları temizle (hız için)
-    common_cols = set(left.columns).intersection(set(right.columns)) - set(merge_keys)
-    if common_cols:
-        right = right.drop(columns=common_cols, errors='ignore')
-    
-    return left.merge(right, on=merge_keys, how=how, suffixes=('', '_right'))
+def month_key(dates: pd.Series) -> pd.Series:
+    """Aylık tarihleri int32 ay koduna çevir (yıl*12 + ay-1).
+    Join ve indeksleme için datetime64'ün yarı boyutunda anahtar."""
+    key = dates.dt.year * 12 + dates.dt.month - 1
+    # NaT tarihler hiçbir ay ile eşleşmesin
+    return key.fillna(-1).astype("int32")
+
+def compact_dtypes(df: pd.DataFrame, stage: Optional[str] = None) -> pd.DataFrame:
+    """Şema aşaması: kategorik Sehir, datetime Donem, float32 ölçüm/özellik kolonları.
+    Çerçeveyi yerinde günceller; stage verilirse önce/sonra bellek raporlanır."""
+    if df.empty:
+        return df
+    before = _frame_mb(df) if stage else 0.0
+
+    if CITY_COL in df.columns and not isinstance(df[CITY_COL].dtype, pd.CategoricalDtype):
+        df[CITY_COL] = df[CITY_COL].astype("category")
+    if DATE_COL in df.columns and not pd.api.types.is_datetime64_any_dtype(df[DATE_COL]):
+        df[DATE_COL] = pd.to_datetime(df[DATE_COL], errors="coerce")
+
+    for col in df.columns:
+        dtype = df[col].dtype
+        if pd.api.types.is_bool_dtype(dtype) or not pd.api.types.is_numeric_dtype(dtype):
+            continue
+        if pd.api.types.is_float_dtype(dtype):
+            if dtype != FLOAT_DTYPE:
+                df[col] = df[col].astype(FLOAT_DTYPE)
+        else:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+
+    if stage:
+        logger.info(f"[MEM] {stage}: {before:.2f} MB -> {_frame_mb(df):.2f} MB")
+    return df
 
 def impute_city_month(df: pd.DataFrame) -> pd.DataFrame:
     """Daha hızlı eksik veri doldurma"""
     if df.empty:
         return df
         
-    df = _numericize(_to_datetime(df.copy()))
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+    df = _numericize(_to_datetime(df))
+    numeric_cols = _numeric_columns(df)
     
     if not numeric_cols:
         return df
@@ -97,18 +143,33 @@ def impute_city_month(df: pd.DataFrame) -> pd.DataFrame:
         df["month"] = df[DATE_COL].dt.month
 
     # Grup bazlı doldurma - daha optimize
+    # Eksik değeri olmayan kolonlara hiç dokunma
+    na_cols = [col for col in numeric_cols if df[col].hasnans]
+
+    if not na_cols:
+        return df
+
+    # Şehir x ay küpünde tek vektörel doldurma (aynı sıra: şehir-ay, şehir, genel);
+    # tekrar eden (şehir, dönem) ya da eksik şehir / dönem varsa groupby yolu
+    cube = _impute_cube(df, na_cols)
+    if cube is not None:
+        filled = cube.imputed()
+        for col in na_cols:
+            df[col] = cube.take(filled.category(col)).astype(df[col].dtype)
+        return df
+
     if CITY_COL in df.columns and "month" in df.columns:
-        for col in numeric_cols:
+        for col in na_cols:
             # Şehir+ay bazında doldur
-            city_month_mean = df.groupby([CITY_COL, "month"])[col].transform("mean")
+            city_month_mean = df.groupby([CITY_COL, "month"], observed=True)[col].transform("mean")
             df[col] = df[col].fillna(city_month_mean)
             
             # Şehir bazında doldur
-            city_mean = df.groupby(CITY_COL)[col].transform("mean")
+            city_mean = df.groupby(CITY_COL, observed=True)[col].transform("mean")
             df[col] = df[col].fillna(city_mean)
     
     # Genel ortalama ile doldur
-    for col in numeric_cols:
+    for col in na_cols:
         df[col] = df[col].fillna(df[col].mean())
     
     return df
@@ -118,7 +179,7 @@ def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty or TARGET not in df.columns:
         return df
         
-    df = _to_datetime(df.copy())
+    df = _to_datetime(df)
     
     # Temel zaman özellikleri
     if DATE_COL in df.columns:
@@ -128,48 +189,82 @@ def add_time_features(df: pd.DataFrame) -> pd.DataFrame:
 
     # Lag ve rolling features - sadece şehir bazında
     if CITY_COL in df.columns and DATE_COL in df.columns:
-        df = df.sort_values([CITY_COL, DATE_COL]).reset_index(drop=True)
+        # Zaten sıralıysa yeniden sıralama (tam kopya) yapma
+        keys = df[[CITY_COL, DATE_COL]]
+        if not pd.MultiIndex.from_frame(keys).is_monotonic_increasing:
+            df = df.sort_values([CITY_COL, DATE_COL], ignore_index=True)
+        elif not isinstance(df.index, pd.RangeIndex) or df.index.start != 0 or df.index.step != 1:
+            df.reset_index(drop=True, inplace=True)
         
+        # Şehir x ay küpü: her şehrin ayları boşluksuz ve tekilse lag / rolling
+        # küp üzerinde dizi işlemi olur (groupby.shift ile birebir aynı sonuç)
+        cube = _target_cube(df)
+        if cube is not None:
+            for lag in LAGS:
+                df[f"{TARGET}_lag{lag}"] = cube.take(cube.lag(lag, TARGET)).astype(df[TARGET].dtype)
+            df[f"{TARGET}_roll3"] = cube.take(cube.rolling_mean(3, TARGET))
+            df[f"{TARGET}_roll12"] = cube.take(cube.rolling_mean(12, TARGET))
+            return df
+
         # Lag features
         for lag in LAGS:
-            df[f"{TARGET}_lag{lag}"] = df.groupby(CITY_COL)[TARGET].shift(lag)
+            df[f"{TARGET}_lag{lag}"] = df.groupby(CITY_COL, observed=True)[TARGET].shift(lag)
         
         # Rolling features - daha hızlı hesaplama
-        rolling_3 = df.groupby(CITY_COL)[TARGET].rolling(3, min_periods=1).mean()
-        rolling_12 = df.groupby(CITY_COL)[TARGET].rolling(12, min_periods=1).mean()
+        rolling_3 = df.groupby(CITY_COL, observed=True)[TARGET].rolling(3, min_periods=1).mean()
+        rolling_12 = df.groupby(CITY_COL, observed=True)[TARGET].rolling(12, min_periods=1).mean()
         
         df[f"{TARGET}_roll3"] = rolling_3.reset_index(level=0, drop=True)
         df[f"{TARGET}_roll12"] = rolling_12.reset_index(level=0, drop=True)
     
     return df
 
+def _impute_cube(df: pd.DataFrame, columns: List[str]):
+    """Doldurulacak kolonların küpü; kurulamıyorsa None (groupby yolu)"""
+    from consumption_cube import ConsumptionCube
+
+    if CITY_COL not in df.columns or DATE_COL not in df.columns:
+        return None
+    try:
+        return ConsumptionCube.from_frame(df, columns)
+    except ValueError:
+        return None
+
+def _target_cube(df: pd.DataFrame):
+    """Hedef kolonun küpü; tekrar eden (şehir, dönem) veya boşluklu seride None (groupby yolu)"""
+    from consumption_cube import ConsumptionCube
+
+    try:
+        cube = ConsumptionCube.from_frame(df, [TARGET])
+    except ValueError:
+        return None
+    return cube if cube.is_contiguous() else None
+
 def finalize_xy(train_df: pd.DataFrame, test_df: pd.DataFrame, target_col: str = TARGET) -> Tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
     """Optimize feature seçimi ve hazırlığı"""
     
     # Ortak sayısal kolonları bul
-    num_train = train_df.select_dtypes(include=[np.number])
-    num_test = test_df.select_dtypes(include=[np.number])
+    common_cols = sorted(set(_numeric_columns(train_df)).intersection(_numeric_columns(test_df)))
     
-    common_cols = sorted(set(num_train.columns).intersection(set(num_test.columns)))
-    
-    # Target'ı emin olarak ekle
-    if target_col not in common_cols and target_col in train_df.columns:
-        common_cols.append(target_col)
-    
-    # Gereksiz kolonları temizle
+    # Gereksiz kolonları temizle (target X'e girmez)
     exclude_patterns = ['_right', 'index', 'level_0']
-    common_cols = [col for col in common_cols if not any(pattern in str(col) for pattern in exclude_patterns)]
+    feature_cols = [
+        col for col in common_cols
+        if col != target_col and not any(pattern in str(col) for pattern in exclude_patterns)
+    ]
     
-    # Feature ve target'ları ayır
-    X_train = train_df[common_cols].drop(columns=[target_col], errors='ignore')
-    X_test = test_df[common_cols].drop(columns=[target_col], errors='ignore')
+    # Feature ve target'ları ayır - target ayrıca drop edilmez, tek seçim
+    X_train = train_df[feature_cols]
+    X_test = test_df[feature_cols]
     
     y_train = pd.to_numeric(train_df[target_col], errors='coerce')
     y_test = pd.to_numeric(test_df[target_col], errors='coerce')
     
-    # NaN değerleri optimize doldur
-    X_train = X_train.fillna(X_train.mean(numeric_only=True))
-    X_test = X_test.fillna(X_test.mean(numeric_only=True))
+    # NaN değerleri optimize doldur - eksik yoksa ikinci kopyayı alma
+    if X_train.isna().values.any():
+        X_train = X_train.fillna(X_train.mean(numeric_only=True))
+    if X_test.isna().values.any():
+        X_test = X_test.fillna(X_test.mean(numeric_only=True))
     
     y_train = y_train.fillna(y_train.mean())
     y_test = y_test.fillna(y_test.mean())
@@ -189,93 +284,151 @@ def _to_bool_series(s: pd.Series) -> pd.Series:
     return s.astype(str).str.lower().isin(["1", "true", "t", "yes", "y", "evet"])
 
 # ===================== VERİ ÇEKME =====================
-class SupabaseManager:
-    """Supabase bağlantı yöneticisi"""
-    _instance = None
-    
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialize()
-        return cls._instance
-    
-    def _initialize(self):
-        """Bağlantıyı başlat"""
-        from dotenv import load_dotenv
-        from pathlib import Path
-        import os
-
-        env_path = Path(__file__).resolve().parent / ".env"
-        load_dotenv(dotenv_path=env_path)
-
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+def fetch_tables(source: Optional[DataSource] = None) -> Dict[str, pd.DataFrame]:
+    """Tüm tabloları yapılandırılmış veri kaynağından çek (Supabase, Parquet, CSV, SQLite)"""
+    source = source if source is not None else get_data_source()
+    return source.fetch_tables(TABLES)
+
+# ===================== ZENGİNLEŞTİRME =====================
+class _IndexedTable:
+    """(ay/yıl, Sehir) üzerinde bir kez indekslenmiş yardımcı tablo.
+    values'ın son satırı tamamen NaN'dır: eşleşmeyen anahtarlar (-1) oraya düşer."""
+
+    def __init__(self, name: str, df: pd.DataFrame, yearly: bool, exclude: set):
+        self.name = name
+        self.yearly = yearly
+        self.by_city = CITY_COL in df.columns
+
+        df = _to_datetime(df.copy(deep=False))     # dfs'teki tablo değişmesin
+        df = df[df[DATE_COL].notna()]
+        key = df[DATE_COL].dt.year.astype("int32") if yearly else month_key(df[DATE_COL])
+        keys = [CITY_COL, "_key"] if self.by_city else ["_key"]
+        self.columns = [c for c in df.columns if c not in (DATE_COL, CITY_COL) and c not in exclude]
+
+        table = df[[CITY_COL] + self.columns] if self.by_city else df[self.columns]
+        table = table.assign(_key=key.to_numpy())
+        if self.by_city:
+            table[CITY_COL] = table[CITY_COL].astype(str)
+        # Aynı anahtara birden fazla satır: sonuncusu geçerli (merge satır çoğaltıyordu)
+        table = table.drop_duplicates(keys, keep="last")
+        if yearly:
+            table = table.sort_values("_key", kind="stable")
+        table = table.reset_index(drop=True)
+
+        self.keys = table[keys]
+        self.index = pd.MultiIndex.from_frame(self.keys) if self.by_city else pd.Index(table["_key"])
+        self.values = pd.concat(
+            [table[self.columns], pd.DataFrame(np.nan, index=[len(table)], columns=self.columns)],
+        )
+
+    def positions(self, cities: Optional[pd.Series], months: pd.Series, years: pd.Series) -> np.ndarray:
+        """Çerçevenin her satırı için values içindeki satır numarası (-1: eşleşme yok)"""
+        key = years if self.yearly else months
+        if not self.yearly:
+            if self.by_city:
+                return self.index.get_indexer(pd.MultiIndex.from_arrays([cities, key]))
+            return self.index.get_indexer(key)
+
+        # As-of: her (şehir, yıl) için o yıl veya önceki en yakın yılın kaydı
+        uniq = pd.DataFrame({CITY_COL: cities, "_key": key}) if self.by_city else pd.DataFrame({"_key": key})
+        uniq = uniq.drop_duplicates().sort_values("_key", kind="stable")
+        right = self.keys.assign(_pos=np.arange(len(self.keys)))
+        by = CITY_COL if self.by_city else None
+        aligned = pd.merge_asof(uniq, right, on="_key", by=by, direction="backward")
+        if aligned["_pos"].isna().any():
+            # Tablonun ilk yılından önceki yıllar için en yakın (ilk) kayıt
+            nearest = pd.merge_asof(uniq, right, on="_key", by=by, direction="nearest")
+            aligned["_pos"] = aligned["_pos"].fillna(nearest["_pos"])
+        aligned["_pos"] = aligned["_pos"].fillna(-1).astype(np.intp)
+
+        if self.by_city:
+            lookup = pd.MultiIndex.from_frame(aligned[[CITY_COL, "_key"]])
+            where = lookup.get_indexer(pd.MultiIndex.from_arrays([cities, key]))
+        else:
+            where = pd.Index(aligned["_key"]).get_indexer(key)
+        return aligned["_pos"].to_numpy().take(where)
 
-        if not url or not key:
-            raise EnvironmentError("SUPABASE_URL veya SUPABASE_KEY eksik.")
 
-        self.client = create_client(url, key)
-        logger.info("Supabase bağlantısı başarılı.")
+class EnrichmentIndex:
+    """
+    weather/nufus/hizmet tablolarını bir kez hazırlayıp indeksler.
+    Train ve test aynı indeksleri paylaşır; her çerçeve tek geçişte zenginleştirilir.
+    """
 
-    
-    def fetch_table(self, table_name: str) -> pd.DataFrame:
-        """Tek bir tablo çek"""
-        try:
-            res = self.client.table(table_name).select("*").execute()
-            return pd.DataFrame(res.data) if res.data else pd.DataFrame()
-        except Exception as e:
-            logger.error(f"{table_name} çekilemedi: {e}")
-            return pd.DataFrame()
-
-def fetch_tables() -> Dict[str, pd.DataFrame]:
-    """Tüm tabloları paralel olarak çek (optimize)"""
-    sb = SupabaseManager()
-    dfs = {}
-    
-    for nick, table in TABLES.items():
-        try:
-            df = sb.fetch_table(table)
-            dfs[nick] = df
-            logger.info(f"[OK] {table} -> {df.shape}")
-        except Exception as e:
-            logger.warning(f"[WARN] {table} çekilemedi: {e}")
-            dfs[nick] = pd.DataFrame()
-    
-    return dfs
+    def __init__(self, dfs: Dict[str, pd.DataFrame]):
+        self.tables: List[_IndexedTable] = []
+        taken: set = set()
+        for name in ENRICH_TABLES:
+            df = dfs.get(name)
+            if df is None or df.empty:
+                continue
+            if DATE_COL not in df.columns:
+                logger.warning(f"[WARN] {name} tablosunda {DATE_COL} yok, zenginleştirmeye alınmadı")
+                continue
+            table = _IndexedTable(name, df, yearly=name in YEARLY_TABLES, exclude=taken)
+            taken.update(table.columns)
+            self.tables.append(table)
+            logger.debug(f"{name} indekslendi -> {len(table.keys)} anahtar")
+
+    def enrich(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Tüm yardımcı kolonları tek indeksli geçişte çerçeveye ekle (yerinde)"""
+        if frame.empty or not self.tables or DATE_COL not in frame.columns:
+            return frame
+
+        # Anahtarlar çerçeve başına bir kez türetilir, tüm tablolar paylaşır
+        dates = _to_datetime(frame)[DATE_COL]
+        months = month_key(dates).to_numpy()
+        years = dates.dt.year.fillna(-1).astype("int32").to_numpy()
+        cities = frame[CITY_COL].astype(str).to_numpy() if CITY_COL in frame.columns else None
+
+        for table in self.tables:
+            cols = [c for c in table.columns if c not in frame.columns]
+            if not cols:
+                continue
+            pos = table.positions(cities if table.by_city else None, months, years)
+            taken = table.values[cols].take(pos)
+            for col in cols:
+                frame[col] = taken[col].to_numpy()
+        return frame
 
 # ===================== ANA PIPELINE =====================
-def build_train_test_frames(dfs: dict) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Optimize merge pipeline"""
-    train = dfs.get("train", pd.DataFrame()).copy()
-    test = dfs.get("test", pd.DataFrame()).copy()
+def build_train_test_frames(dfs: dict, index: Optional[EnrichmentIndex] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Train/test çerçevelerini yardımcı tablolarla zenginleştir.
+    index verilmezse dfs'ten bir kez kurulur ve iki çerçeve tarafından paylaşılır.
+    dfs'teki tablolar değişmez; zenginleştirme sığ kopyalara yapılır (veri kopyalanmaz)."""
+    train = dfs.get("train", pd.DataFrame())
+    test = dfs.get("test", pd.DataFrame())
     
     if train.empty or test.empty:
         logger.error("Train veya test verisi boş!")
         return train, test
 
-    # Yardımcı tablolar
-    weather = dfs.get("weather", pd.DataFrame())
-    nufus = dfs.get("nufus", pd.DataFrame())
-    hizmet = dfs.get("hizmet", pd.DataFrame())
-
-    # Sıralı merge - daha optimize
-    for right_df, name in [(weather, "weather"), (nufus, "nufus"), (hizmet, "hizmet")]:
-        if not right_df.empty:
-            train = _smart_merge(train, right_df)
-            test = _smart_merge(test, right_df)
-            logger.debug(f"{name} merge edildi")
+    # Yardımcı tablolar bir kez indekslenir, tek geçişli çoklu join
+    if index is None:
+        index = EnrichmentIndex(dfs)
+    train = index.enrich(train.copy(deep=False))
+    test = index.enrich(test.copy(deep=False))
 
     logger.info(f"Merge bitti -> Train: {train.shape}, Test: {test.shape}")
     return train, test
 
-def get_processed_data(target_col: str = TARGET, return_frames: bool = False):
+def get_processed_data(target_col: str = TARGET, return_frames: bool = False,
+                       profiler: Optional[StageProfiler] = None,
+                       source: Optional[DataSource] = None):
     """
     Ana veri işleme pipeline'ı
+    profiler verilirse her aşamanın süresi ve tepe belleği ölçülür.
+    source verilmezse DATA_SOURCE ile yapılandırılan kaynak kullanılır.
     """
+    prof = get_profiler(profiler)
     try:
         # Veriyi çek
-        dfs = fetch_tables()
-        df_train, df_test = build_train_test_frames(dfs)
+        with prof.stage("fetch"):
+            dfs = fetch_tables(source)
+        with prof.stage("merge"):
+            df_train, df_test = build_train_test_frames(dfs)
+            # Ham tablolara referans bırakma; merge sonrası çerçeveler tek sahip
+            dfs.clear()
         
         if df_train.empty or df_test.empty:
             raise ValueError("Eğitim veya test verisi boş!")
@@ -285,26 +438,52 @@ def get_processed_data(target_col: str = TARGET, return_frames: bool = False):
             if "Temiz" in df.columns:
                 df = df[_to_bool_series(df["Temiz"])]
         
+        # Kompakt şema (merge sonrası tüm kolonlar float64/object gelir)
+        with prof.stage("compact"):
+            df_train = compact_dtypes(df_train, stage="train/merge")
+            df_test = compact_dtypes(df_test, stage="test/merge")
+
         # Özellik mühendisliği
-        df_train = add_time_features(impute_city_month(df_train))
-        df_test = add_time_features(impute_city_month(df_test))
+        with prof.stage("impute"):
+            df_train = impute_city_month(df_train)
+            df_test = impute_city_month(df_test)
+        with prof.stage("features"):
+            df_train = compact_dtypes(add_time_features(df_train), stage="train/features")
+            df_test = compact_dtypes(add_time_features(df_test), stage="test/features")
         
         if return_frames:
             return df_train, df_test
         else:
-            return finalize_xy(df_train, df_test, target_col)
+            with prof.stage("finalize_xy"):
+                return finalize_xy(df_train, df_test, target_col)
             
     except Exception as e:
         logger.error(f"Veri işleme hatası: {e}")
         raise
 
-def get_train_test(target_col: str = TARGET):
+def profile_pipeline(target_col: str = TARGET, budgets_mb: Optional[Dict[str, float]] = None) -> List[Dict]:
+    """
+    Pipeline'ı tracemalloc ile çalıştırıp aşama bazlı süre/tepe bellek raporu döndür.
+    budgets_mb: {"aşama": MB} - aşılan bütçeler uyarı olarak loglanır.
+    """
+    profiler = StageProfiler()
+    try:
+        get_processed_data(target_col, return_frames=False, profiler=profiler)
+    finally:
+        profiler.stop()
+    profiler.log(f"get_processed_data({target_col})")
+
+    for name in profiler.over_budget(budgets_mb or {}):
+        logger.warning(f"[PROFIL] '{name}' aşaması bellek bütçesini aştı ({budgets_mb[name]:.1f} MB)")
+    return profiler.report()
+
+def get_train_test(target_col: str = TARGET, source: Optional[DataSource] = None):
     """Model için X,y train/test döndür"""
-    return get_processed_data(target_col, return_frames=False)
+    return get_processed_data(target_col, return_frames=False, source=source)
 
-def get_processed_frames(target_col: str = TARGET):
+def get_processed_frames(target_col: str = TARGET, source: Optional[DataSource] = None):
     """İşlenmiş DataFrame'ler döndür"""
-    return get_processed_data(target_col, return_frames=True)
+    return get_processed_data(target_col, return_frames=True, source=source)
 
 # ===================== TEST =====================
 if __name__ == "__main__":
@@ -319,6 +498,10 @@ if __name__ == "__main__":
         # İşlenmiş frame'leri de test et
         df_tr, df_te = get_processed_frames()
         print(f"✓ İşlenmiş Train: {df_tr.shape}, Test: {df_te.shape}")
+
+        # Aşama bazlı tepe bellek raporu
+        for st in profile_pipeline():
+            print(f"✓ {st['name']:<12} {st['seconds']*1000:8.1f} ms  peak {st['peak_mb']:.2f} MB")
         print("✓ Tüm testler başarılı!")
         
     except Exception as e:
@@ -340,7 +523,8 @@ def save_model_result(model_name: str, target: str, train_score: float, test_sco
     }
 
     try:
-        res = sb.client.table("model_results").insert(data).execute()
+        with supabase_write("model_results"):
+            res = sb.client.table("model_results").insert(data).execute()
         if hasattr(res, "data") and res.data:
             logger.info(f"[DB] Model sonucu kaydedildi: {model_name} ({target})")
         else: